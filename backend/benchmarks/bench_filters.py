@@ -0,0 +1,90 @@
+"""Benchmark: single-mask filter compiler vs. the old copy-per-filter apply_filters
+
+Run from the backend directory:
+    python benchmarks/bench_filters.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.schemas import FilterCondition
+from utils.validators import apply_filters
+
+ROWS = 1_000_000
+
+
+def legacy_apply_filters(df, filters):
+    """The previous implementation: one full copy, then one new frame per condition"""
+    filtered_df = df.copy()
+    for f in filters:
+        column, operator, value = f.column, f.operator, f.value
+        if operator == "eq":
+            filtered_df = filtered_df[filtered_df[column] == value]
+        elif operator == "ne":
+            filtered_df = filtered_df[filtered_df[column] != value]
+        elif operator == "gt":
+            filtered_df = filtered_df[filtered_df[column] > value]
+        elif operator == "lt":
+            filtered_df = filtered_df[filtered_df[column] < value]
+        elif operator == "gte":
+            filtered_df = filtered_df[filtered_df[column] >= value]
+        elif operator == "lte":
+            filtered_df = filtered_df[filtered_df[column] <= value]
+        elif operator == "in":
+            filtered_df = filtered_df[filtered_df[column].isin(value)]
+        elif operator == "between":
+            filtered_df = filtered_df[(filtered_df[column] >= value[0]) & (filtered_df[column] <= value[1])]
+    return filtered_df
+
+
+def build_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    frame = {
+        "branch": rng.choice([f"B{i:03d}" for i in range(200)], rows),
+        "region": rng.choice(["North", "South", "East", "West", "Central"], rows),
+        "product": rng.choice(["Savings", "Loan", "Card", "Lease", "FD"], rows),
+        "amount": rng.gamma(2.0, 5000.0, rows),
+        "tenure": rng.integers(0, 40, rows),
+        "balance": rng.normal(100000, 25000, rows),
+    }
+    for i in range(10):
+        frame[f"metric_{i}"] = rng.random(rows)
+    return pd.DataFrame(frame)
+
+
+def measure(fn, df, filters, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df, filters)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(df, filters)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, len(result)
+
+
+def main():
+    df = build_frame(ROWS)
+    filters = [
+        FilterCondition(column="region", operator="in", value=["North", "East", "Central"]),
+        FilterCondition(column="product", operator="ne", value="Lease"),
+        FilterCondition(column="amount", operator="between", value=[1000, 30000]),
+        FilterCondition(column="tenure", operator="gte", value=2),
+        FilterCondition(column="balance", operator="gt", value=80000),
+    ]
+
+    print(f"{ROWS:,} rows x {len(df.columns)} columns, {len(filters)} filters")
+    for name, fn in (("legacy", legacy_apply_filters), ("compiled", apply_filters)):
+        seconds, peak, rows = measure(fn, df, filters)
+        print(f"{name:>9}: {seconds * 1000:8.1f} ms  peak {peak / 1024 / 1024:8.1f} MiB  -> {rows:,} rows")
+
+
+if __name__ == "__main__":
+    main()
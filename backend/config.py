@@ -25,6 +25,65 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = "uploads"
     REPORT_DIR: str = "reports"
     MAX_UPLOAD_SIZE: int = 50 * 1024 * 1024  # 50 MB
+    INGEST_BUFFER_BYTES: int = 1024 * 1024  # Bytes read from an upload at a time while it is ingested
+    
+    # Caching
+    DATAFRAME_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 512 MB of loaded datasets
+    PREPARED_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 512 MB of transformed/measured datasets
+    QUERY_CACHE_MAX_BYTES: int = 128 * 1024 * 1024  # 128 MB of query results
+    QUERY_CACHE_MAX_ENTRIES: int = 1000
+    QUERY_CACHE_TTL_SECONDS: int = 300
+    PREVIEW_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # 256 MB of data-prep preview checkpoints
+    
+    # NDJSON / Arrow query responses are encoded and sent this many rows at a time
+    RESPONSE_CHUNK_ROWS: int = 10_000
+    
+    # Rollup cubes: pre-aggregated tables for query shapes seen at least ROLLUP_MIN_HITS times
+    ROLLUP_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # 256 MB of cubes
+    ROLLUP_MIN_HITS: int = 3
+    ROLLUP_MAX_CELLS_RATIO: float = 0.2  # Cubes with more cells than this share of the base rows aren't kept
+    
+    # Text columns with few distinct values are dictionary-encoded (pandas categorical) on load
+    CATEGORICAL_MAX_UNIQUE: int = 1000
+    CATEGORICAL_MAX_UNIQUE_RATIO: float = 0.5  # distinct values / rows
+    
+    # Secondary indexes built at ingest
+    INDEX_MAX_CARDINALITY: int = 1000  # Columns with at most this many distinct values get a dictionary index
+    INDEX_MAX_RANGE_COLUMNS: int = 10  # Numeric/date columns that get a sorted range index
+    
+    # Out-of-core execution: aggregation queries whose input columns would take more
+    # memory than this are streamed through the file in chunks instead of loaded whole
+    STREAMING_THRESHOLD_BYTES: int = 256 * 1024 * 1024  # 256 MB
+    STREAMING_CHUNK_ROWS: int = 250_000
+    PARQUET_ROW_GROUP_ROWS: int = 250_000  # Row group size of stored columnar files; bounds the memory of one chunk read
+    
+    # Partitioned execution: aggregation queries over at least PARALLEL_MIN_ROWS rows are
+    # filtered and aggregated by QUERY_WORKERS processes (1 disables the pool)
+    QUERY_WORKERS: int = min(4, os.cpu_count() or 1)
+    PARALLEL_MIN_ROWS: int = 1_000_000
+    
+    # Blocking pandas work of API handlers runs on a bounded thread pool
+    WORKER_THREADS: int = min(8, (os.cpu_count() or 1) + 2)
+    WORKER_QUEUE_MAX: int = 32  # Jobs waiting for a thread before new requests get 503 + Retry-After
+    WORKER_MAX_PER_USER: int = 4  # Concurrent jobs per user; further requests wait their turn
+    
+    # Approximate queries are answered from a uniform sample of each dataset kept at ingest
+    SAMPLE_ROWS: int = 100_000  # Rows in the stored reservoir sample
+    APPROX_MIN_STRATUM_ROWS: int = 30  # Smallest sample taken per group_by stratum (or the whole stratum)
+    
+    # Profiles of datasets with at least PROFILE_SKETCH_MIN_ROWS rows estimate distinct counts and
+    # top values with mergeable sketches instead of exact hash tables over whole columns
+    PROFILE_SKETCH_MIN_ROWS: int = 1_000_000
+    PROFILE_HLL_PRECISION: int = 14  # 2^14 HyperLogLog registers, about 0.8% standard error
+    PROFILE_TOP_CAPACITY: int = 200  # Space-Saving counters kept per column for its top values
+    
+    # Column types (numeric, datetime with format, boolean, categorical) are detected once at ingest
+    # from at most this many distinct values per column, then verified against the whole column
+    TYPE_INFERENCE_SAMPLE_ROWS: int = 1000
+    
+    # Ingest, profiling, index building and report generation run as background jobs, tracked
+    # in the jobs table so clients can poll their progress, on this many worker threads
+    JOB_WORKERS: int = 2
     
     class Config:
         env_file = ".env"
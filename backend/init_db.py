@@ -1,7 +1,7 @@
 
 from database import engine, Base
 from database import engine, Base
-from models.db_models import User, Dataset, Report, DashboardShare, Dashboard
+from models.db_models import User, Dataset, Report, DashboardShare, Dashboard, Job
 
 def init_db():
     """Initialize database tables"""
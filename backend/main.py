@@ -4,6 +4,10 @@ from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from database import engine, Base
 from config import settings
+from utils.dataset_manager import DatasetManager
+from services.query_engine import QueryEngine
+from utils.worker_pool import worker_pool
+from utils.job_queue import job_queue
 
 
 from routers import (
@@ -14,7 +18,8 @@ from routers import (
     reports_router,
     dashboard_router,
     data_preparation_router,
-    data_modeling_router
+    data_modeling_router,
+    jobs_router
 )
 from api import export
 from api import sharing
@@ -24,9 +29,10 @@ from api import sharing
 async def lifespan(app: FastAPI):
     # Startup
     Base.metadata.create_all(bind=engine)
+    job_queue.start()
     yield
     # Shutdown
-    pass
+    job_queue.shutdown()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -43,6 +49,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Cache", "Retry-After", "X-Total-Rows"],
 )
 
 # Include routers
@@ -56,6 +63,7 @@ app.include_router(export.router)
 app.include_router(sharing.router)
 app.include_router(data_preparation_router)
 app.include_router(data_modeling_router)
+app.include_router(jobs_router)
 
 # Root endpoint
 @app.get("/")
@@ -69,5 +77,10 @@ def root():
 # Health check endpoint
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "caches": {**DatasetManager.get_cache_stats(), **QueryEngine.get_cache_stats()},
+        "workers": worker_pool.stats(),
+        "jobs": job_queue.stats()
+    }
 
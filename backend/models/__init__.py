@@ -1,3 +1,3 @@
 # Models package initialization
 from .schemas import *
-from .db_models import User, Dataset, Report, DashboardShare, Dashboard
+from .db_models import User, Dataset, Report, DashboardShare, Dashboard, Job
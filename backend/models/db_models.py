@@ -56,6 +56,22 @@ class Report(Base):
     file_path = Column(String, nullable=False)
     created_at = Column(DateTime, server_default=func.now())
 
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(UNIQUEIDENTIFIER, primary_key=True, server_default=func.newid())
+    user_id = Column(UNIQUEIDENTIFIER, ForeignKey("users.id"), nullable=True)
+    kind = Column(String, nullable=False)  # ingest, report
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    progress = Column(Float, nullable=False, default=0)  # percent complete
+    step = Column(String, nullable=True)  # what the job is currently doing
+    params = Column(Text, nullable=True)  # JSON arguments, so interrupted jobs can be rerun
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
 class DashboardShare(Base):
     __tablename__ = "dashboard_shares"
 
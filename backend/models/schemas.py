@@ -36,6 +36,7 @@ class DatasetUploadResponse(BaseModel):
     dataset_id: str
     name: str
     message: str
+    job_id: Optional[str] = None  # Ingest job; the dataset is listed once it succeeds
 
 class DatasetMetadata(BaseModel):
     id: UUID
@@ -75,6 +76,7 @@ class DataProfileResponse(BaseModel):
     numeric_columns: List[str]
     categorical_columns: List[str]
     date_columns: List[str]
+    approximate: bool = False  # Distinct counts / top values of some columns are sketch estimates
 
 # ============= Query Schemas =============
 class AggregationType(str, Enum):
@@ -112,11 +114,29 @@ class QueryRequest(BaseModel):
     # Add support for Histogram
     is_histogram: Optional[bool] = False
     histogram_bins: Optional[int] = 10
+    # Approximate mode: aggregate a sample stratified by group_by instead of every row
+    approximate: Optional[bool] = False
+    sample_rate: Optional[float] = Field(None, gt=0, le=1)  # Fraction of the rows to sample
+    max_relative_error: Optional[float] = Field(None, gt=0)  # Or: target interval half-width / estimate
+    confidence: Optional[float] = Field(0.95, gt=0, lt=1)
 
 class QueryResponse(BaseModel):
     data: List[Dict[str, Any]]
     total_rows: int
     columns: List[str]
+    metadata: Optional[Dict[str, Any]] = None  # e.g. sample size and confidence intervals of approximate results
+
+class BatchQueryItem(BaseModel):
+    tile_id: str
+    query: QueryRequest
+
+class BatchQueryRequest(BaseModel):
+    filters: Optional[List[FilterCondition]] = []  # Dashboard-level filters shared by every tile
+    queries: List[BatchQueryItem]
+
+class BatchQueryResponse(BaseModel):
+    results: Dict[str, QueryResponse]
+    errors: Dict[str, str] = {}
 
 # ============= Chart Schemas =============
 class ChartType(str, Enum):
@@ -132,6 +152,14 @@ class ChartType(str, Enum):
     DUAL_AXIS = "dual_axis"
     FUNNEL = "funnel"
 
+class DownsampleMethod(str, Enum):
+    LTTB = "lttb"
+    MINMAX = "minmax"
+
+class PointFormat(str, Enum):
+    OBJECTS = "objects"  # {"x": ..., "y": ...} per point
+    PAIRS = "pairs"  # [x, y] per point; more compact and faster to encode, also accepted by Chart.js
+
 class ChartRequest(BaseModel):
     x_column: Optional[str] = None
     y_column: Optional[str] = None
@@ -140,6 +168,10 @@ class ChartRequest(BaseModel):
     aggregation: Optional[AggregationType] = AggregationType.SUM
     filters: Optional[List[FilterCondition]] = []
     limit: Optional[int] = 20
+    # Line and scatter charts: reduce the whole series to about this many points instead of applying limit
+    max_points: Optional[int] = Field(None, ge=3)
+    downsample: Optional[DownsampleMethod] = DownsampleMethod.LTTB  # Line charts; scatter charts are grid-binned
+    point_format: Optional[PointFormat] = PointFormat.OBJECTS  # Scatter charts
 
 class ChartDataset(BaseModel):
     label: str
@@ -170,6 +202,7 @@ class ReportResponse(BaseModel):
     report_type: str
     file_path: str
     created_at: datetime
+    job_id: Optional[str] = None  # Job rendering the file
 
 
 class ChartConfig(BaseModel):
@@ -182,6 +215,7 @@ class ChartConfig(BaseModel):
     secondary_y_axis: Optional[str] = None
     is_stacked: Optional[bool] = False
     bins: Optional[int] = 10  # For Histogram
+    approximate: Optional[bool] = False  # Tile opted into estimates from the dataset sample
 
 class DashboardCreate(BaseModel):
     name: str
@@ -206,3 +240,16 @@ class MeasureDefinition(BaseModel):
 
 class DatasetMeasuresUpdate(BaseModel):
     measures: List[MeasureDefinition]
+
+# ============= Job Schemas =============
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str  # queued, running, succeeded, failed
+    progress: float  # percent complete
+    step: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -7,3 +7,4 @@ from .reports import router as reports_router
 from .dashboard import router as dashboard_router
 from .data_preparation import router as data_preparation_router
 from .data_modeling import router as data_modeling_router
+from .jobs import router as jobs_router
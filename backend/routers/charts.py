@@ -5,6 +5,8 @@ from models.db_models import User
 from models.schemas import ChartRequest, ChartResponse
 from utils.auth import get_current_user
 from utils.dataset_manager import DatasetManager
+from utils.worker_pool import worker_pool
+from utils.json_response import NumpyJSONResponse
 from services.chart_formatter import ChartFormatter
 
 router = APIRouter(prefix="/charts", tags=["Charts"])
@@ -20,8 +22,13 @@ async def get_bar_chart(
     dataset = DatasetManager.verify_dataset_access(db, dataset_id, current_user)
     
     try:
-        chart_data = ChartFormatter.prepare_bar_chart(dataset.file_path, request)
-        return chart_data
+        chart_data = await worker_pool.run(
+            current_user.id, DatasetManager.on_read_path, dataset.file_path,
+            ChartFormatter.prepare_bar_chart, request
+        )
+        return NumpyJSONResponse(chart_data)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -39,8 +46,13 @@ async def get_line_chart(
     dataset = DatasetManager.verify_dataset_access(db, dataset_id, current_user)
     
     try:
-        chart_data = ChartFormatter.prepare_line_chart(dataset.file_path, request)
-        return chart_data
+        chart_data = await worker_pool.run(
+            current_user.id, DatasetManager.on_read_path, dataset.file_path,
+            ChartFormatter.prepare_line_chart, request
+        )
+        return NumpyJSONResponse(chart_data)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -58,8 +70,13 @@ async def get_pie_chart(
     dataset = DatasetManager.verify_dataset_access(db, dataset_id, current_user)
     
     try:
-        chart_data = ChartFormatter.prepare_pie_chart(dataset.file_path, request)
-        return chart_data
+        chart_data = await worker_pool.run(
+            current_user.id, DatasetManager.on_read_path, dataset.file_path,
+            ChartFormatter.prepare_pie_chart, request
+        )
+        return NumpyJSONResponse(chart_data)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -77,8 +94,13 @@ async def get_scatter_chart(
     dataset = DatasetManager.verify_dataset_access(db, dataset_id, current_user)
     
     try:
-        chart_data = ChartFormatter.prepare_scatter_chart(dataset.file_path, request)
-        return chart_data
+        chart_data = await worker_pool.run(
+            current_user.id, DatasetManager.on_read_path, dataset.file_path,
+            ChartFormatter.prepare_scatter_chart, request
+        )
+        return NumpyJSONResponse(chart_data)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -96,8 +118,13 @@ async def get_heatmap(
     dataset = DatasetManager.verify_dataset_access(db, dataset_id, current_user)
     
     try:
-        chart_data = ChartFormatter.prepare_heatmap(dataset.file_path, request)
-        return chart_data
+        chart_data = await worker_pool.run(
+            current_user.id, DatasetManager.on_read_path, dataset.file_path,
+            ChartFormatter.prepare_heatmap, request
+        )
+        return NumpyJSONResponse(chart_data)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -5,6 +5,7 @@ from models.db_models import User, Dataset
 from models.schemas import DatasetMeasuresUpdate, QueryResponse
 from utils.auth import get_current_user
 from utils.dataset_manager import DatasetManager
+from utils.worker_pool import worker_pool
 from services.query_engine import QueryEngine
 import json
 
@@ -25,8 +26,13 @@ async def preview_measures(
     
     try:
         measures = [m.dict() for m in measures_update.measures]
-        result = QueryEngine.preview_data(dataset.file_path, 50, transformations, measures)
+        result = await worker_pool.run(
+            current_user.id, DatasetManager.on_read_path, dataset.file_path, QueryEngine.preview_data,
+            50, transformations, measures
+        )
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -47,6 +53,7 @@ async def save_measures(
         measures = [m.dict() for m in measures_update.measures]
         dataset.measures = json.dumps(measures)
         db.commit()
+        QueryEngine.invalidate_dataset(dataset_id)
         return {"message": "Measures saved successfully"}
     except Exception as e:
         db.rollback()
@@ -5,6 +5,7 @@ from models.db_models import User, Dataset
 from models.schemas import DatasetTransformUpdate, QueryResponse
 from utils.auth import get_current_user
 from utils.dataset_manager import DatasetManager
+from utils.worker_pool import worker_pool
 from services.query_engine import QueryEngine
 import json
 
@@ -26,8 +27,13 @@ async def preview_transformations(
     try:
         # Convert Pydantic objects to dicts for the service
         steps = [step.dict() for step in transform_update.transformations]
-        result = QueryEngine.preview_data(dataset.file_path, 50, steps, measures)
+        result = await worker_pool.run(
+            current_user.id, DatasetManager.on_read_path, dataset.file_path, QueryEngine.preview_data,
+            50, steps, measures
+        )
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -48,6 +54,7 @@ async def save_transformations(
         steps = [step.dict() for step in transform_update.transformations]
         dataset.transformations = json.dumps(steps)
         db.commit()
+        QueryEngine.invalidate_dataset(dataset_id)
         return {"message": "Transformations saved successfully"}
     except Exception as e:
         db.rollback()
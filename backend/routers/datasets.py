@@ -3,7 +3,6 @@ from sqlalchemy.orm import Session
 from typing import List
 import os
 import uuid
-import shutil
 from database import get_db
 
 
@@ -11,19 +10,22 @@ from models.db_models import User, Dataset
 from models.schemas import DatasetUploadResponse, DatasetMetadata, DataProfileResponse
 from utils.auth import get_current_user
 from utils.dataset_manager import DatasetManager
-from utils.validators import validate_csv_file
+from utils.worker_pool import worker_pool
+from utils.job_queue import job_queue
+from utils.ingest import CSVIngest
 from services.data_profiler import DataProfiler
+from services.query_engine import QueryEngine
 from config import settings
 
 router = APIRouter(prefix="/datasets", tags=["Datasets"])
 
-@router.post("/upload/", response_model=DatasetUploadResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/upload/", response_model=DatasetUploadResponse, status_code=status.HTTP_202_ACCEPTED)
 async def upload_dataset(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Upload a CSV dataset"""
+    """Upload a CSV dataset; conversion, indexing and profiling continue in a background job"""
     # Validate file type
     if not file.filename.endswith(".csv"):
         raise HTTPException(
@@ -35,40 +37,30 @@ async def upload_dataset(
     dataset_id = str(uuid.uuid4())
     file_path = os.path.join(settings.UPLOAD_DIR, f"{dataset_id}.csv")
     
-    # Save file
+    # Store the upload, enforcing the size limit while copying
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await worker_pool.run(current_user.id, CSVIngest.save_upload, file.file, file_path, settings.MAX_UPLOAD_SIZE)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error saving file: {str(e)}"
         )
     
-    # Validate CSV
-    validate_csv_file(file_path, settings.MAX_UPLOAD_SIZE // (1024 * 1024))
-    
-    # Get file size and row count
-    file_size = os.path.getsize(file_path)
-    row_count = DataProfiler.get_row_count(file_path)
-    
-    # Create database record
-    dataset = Dataset(
-        id=dataset_id,
-        user_id=str(current_user.id),
-        name=file.filename,
-        file_path=file_path,
-        schema_json=None  # Will be updated during profiling
-    )
-    
-    db.add(dataset)
-    db.commit()
-    db.refresh(dataset)
+    # Parse, type, index and profile in one streaming pass; the dataset record is created when it finishes
+    job = job_queue.submit(db, "ingest", current_user.id, {
+        "dataset_id": dataset_id,
+        "user_id": str(current_user.id),
+        "name": file.filename,
+        "file_path": file_path
+    })
     
     return DatasetUploadResponse(
         dataset_id=dataset_id,
         name=file.filename,
-        message="File uploaded successfully"
+        message="File uploaded; processing",
+        job_id=str(job.id)
     )
 
 @router.get("/", response_model=List[DatasetMetadata])
@@ -100,9 +92,17 @@ async def profile_dataset(
     dataset = DatasetManager.verify_dataset_access(db, dataset_id, current_user)
     
     try:
-        profile = DataProfiler.profile_dataset(dataset.file_path)
+        profile, schema_json = await worker_pool.run(
+            current_user.id, DatasetManager.on_read_path, dataset.file_path,
+            DataProfiler.get_profile, dataset.schema_json
+        )
+        if schema_json is not None:
+            dataset.schema_json = schema_json
+            db.commit()
         profile["dataset_id"] = dataset_id
         return profile
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -117,4 +117,5 @@ async def delete_dataset(
 ):
     """Delete a dataset"""
     DatasetManager.delete_dataset(db, dataset_id, current_user)
+    QueryEngine.invalidate_dataset(dataset_id)
     return None
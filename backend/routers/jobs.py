@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+import json
+from database import get_db
+from models.db_models import User, Job
+from models.schemas import JobResponse
+from utils.auth import get_current_user
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the status and percent complete of a background job"""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job or str(job.user_id) != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+
+    return JobResponse(
+        job_id=str(job.id),
+        kind=job.kind,
+        status=job.status,
+        progress=job.progress,
+        step=job.step,
+        result=json.loads(job.result) if job.result else None,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
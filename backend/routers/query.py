@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from typing import Optional
 from sqlalchemy.orm import Session
 from database import get_db
 from models.db_models import User
-from models.schemas import QueryRequest, QueryResponse
+from models.schemas import QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryResponse
 from utils.auth import get_current_user
 from utils.dataset_manager import DatasetManager
+from utils.worker_pool import worker_pool
+from utils.streaming import negotiate_format, stream_frame
+from utils.json_response import NumpyJSONResponse
 from services.query_engine import QueryEngine
 import json
 
@@ -14,40 +18,100 @@ router = APIRouter(prefix="/query", tags=["Query"])
 async def execute_query(
     dataset_id: str,
     query: QueryRequest,
+    accept: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Execute a query on a dataset with filters and aggregations"""
+    """Execute a query on a dataset with filters and aggregations
+    
+    Send `Accept: application/x-ndjson` or `application/vnd.apache.arrow.stream`
+    to stream large results instead of one JSON document.
+    """
     dataset = DatasetManager.verify_dataset_access(db, dataset_id, current_user)
     
     transformations = json.loads(dataset.transformations) if dataset.transformations else []
     measures = json.loads(dataset.measures) if dataset.measures else []
     
     try:
-        result = QueryEngine.execute_query(dataset.file_path, query, transformations, measures)
-        return result
+        media_type = negotiate_format(accept)
+        if media_type:
+            # Streamed straight from the result frame, bypassing the response model and result cache
+            df = await worker_pool.run(
+                current_user.id, DatasetManager.on_read_path, dataset.file_path, QueryEngine.execute_query_frame,
+                query, transformations, measures
+            )
+            return stream_frame(df, media_type)
+        
+        result, cache_hit = await worker_pool.run(
+            current_user.id, DatasetManager.on_read_path, dataset.file_path, QueryEngine.execute_cached_query,
+            query, transformations, measures
+        )
+        return NumpyJSONResponse(result, headers={"X-Cache": "hit" if cache_hit else "miss"})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error executing query: {str(e)}"
         )
 
+@router.post("/{dataset_id}/batch", response_model=BatchQueryResponse)
+async def execute_batch_query(
+    dataset_id: str,
+    batch: BatchQueryRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Execute every dashboard tile's query in one pass over the dataset"""
+    dataset = DatasetManager.verify_dataset_access(db, dataset_id, current_user)
+    
+    transformations = json.loads(dataset.transformations) if dataset.transformations else []
+    measures = json.loads(dataset.measures) if dataset.measures else []
+    
+    try:
+        result = await worker_pool.run(
+            current_user.id, DatasetManager.on_read_path, dataset.file_path, QueryEngine.execute_batch,
+            batch, transformations, measures
+        )
+        return NumpyJSONResponse(result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error executing batch query: {str(e)}"
+        )
+
 @router.post("/{dataset_id}/preview", response_model=QueryResponse)
 async def preview_data(
     dataset_id: str,
     limit: int = 100,
+    accept: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Preview first N rows of a dataset"""
+    """Preview first N rows of a dataset (streamed for NDJSON / Arrow Accept headers)"""
     dataset = DatasetManager.verify_dataset_access(db, dataset_id, current_user)
     
     transformations = json.loads(dataset.transformations) if dataset.transformations else []
     measures = json.loads(dataset.measures) if dataset.measures else []
     
     try:
-        result = QueryEngine.preview_data(dataset.file_path, limit, transformations, measures)
-        return result
+        media_type = negotiate_format(accept)
+        if media_type:
+            df = await worker_pool.run(
+                current_user.id, DatasetManager.on_read_path, dataset.file_path, QueryEngine.preview_frame,
+                limit, transformations, measures
+            )
+            return stream_frame(df, media_type)
+        
+        result = await worker_pool.run(
+            current_user.id, DatasetManager.on_read_path, dataset.file_path, QueryEngine.preview_data,
+            limit, transformations, measures
+        )
+        return NumpyJSONResponse(result)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -8,30 +8,37 @@ from models.db_models import User, Report
 from models.schemas import ReportRequest, ReportResponse
 from utils.auth import get_current_user
 from utils.dataset_manager import DatasetManager
+from utils.job_queue import job_queue
 from services.dashboard_service import get_dashboard
 from config import settings
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
-@router.post("/{dashboard_id}/pdf", response_model=ReportResponse)
+@router.post("/{dashboard_id}/pdf", response_model=ReportResponse, status_code=status.HTTP_202_ACCEPTED)
 async def generate_pdf_report(
     dashboard_id: str,
     request: ReportRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Generate PDF report of dashboard"""
-    dashboard = get_dashboard(dashboard_id, str(current_user.id))
+    """Generate a report of a dashboard in a background job; download it once the job succeeds"""
+    dashboard = get_dashboard(dashboard_id, {"id": str(current_user.id)})
     if not dashboard:
         raise HTTPException(status_code=404, detail="Dashboard not found")
     
     try:
         report_id = str(uuid.uuid4())
-        output_filename = f"{report_id}.pdf"
+        output_filename = f"{report_id}.{request.format.value}"
         
         file_path = os.path.join(settings.REPORT_DIR, output_filename)
-        # Generate PDF using dashboard data
-        # For now, placeholder
+        job = job_queue.submit(db, "report", current_user.id, {
+            "dataset_id": str(dashboard["dataset_id"]),
+            "output_filename": output_filename,
+            "format": request.format.value,
+            "title": dashboard["name"],
+            "chart_configs": [c.model_dump(mode="json") for c in request.chart_configs or []] if request.include_charts else [],
+            "filters": [f.model_dump(mode="json") for f in request.filters or []]
+        })
         
         # Save report metadata
         report = Report(
@@ -47,7 +54,8 @@ async def generate_pdf_report(
             report_id=report_id,
             report_type=request.report_type,
             file_path=file_path,
-            created_at=report.created_at
+            created_at=report.created_at,
+            job_id=str(job.id)
         )
     except Exception as e:
         raise HTTPException(
@@ -3,3 +3,4 @@ from .data_profiler import DataProfiler
 from .query_engine import QueryEngine
 from .chart_formatter import ChartFormatter
 from .report_generator import ReportGenerator
+from .jobs import JobHandlers
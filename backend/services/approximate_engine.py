@@ -0,0 +1,208 @@
+from statistics import NormalDist
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import pandas as pd
+from config import settings
+from models.schemas import QueryRequest, AggregationRequest
+
+# Group key used for aggregations without group_by
+_GLOBAL_KEY = "__all__"
+
+# Functions estimated by scaling the sample up; the others are read off the sample as is
+SCALED_FUNCTIONS = ("sum", "count", "avg")
+
+
+class ApproximateQueryEngine:
+    """Aggregate estimates with confidence intervals from a dataset's stored uniform sample
+
+    The (prepared and filtered) sample is split into strata by the group_by keys
+    and each stratum is subsampled separately, so small groups keep all their
+    sampled rows while large ones are cut down to the requested rate or error
+    bound. SUM and COUNT are scaled up to the full dataset, AVG is the stratum
+    mean; their intervals combine the variance of the stored sample and of the
+    subsample (two-phase sampling).
+    """
+
+    @staticmethod
+    def supports(aggregations: List[AggregationRequest]) -> bool:
+        """Whether every aggregation can be estimated by scaling up the sample"""
+        return all(agg.function.value in SCALED_FUNCTIONS for agg in aggregations)
+
+    @staticmethod
+    def estimate(
+        df: pd.DataFrame,
+        query: QueryRequest,
+        aggregations: List[AggregationRequest],
+        population_rows: int,
+        sample_rows: int
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any]]:
+        """Estimate aggregations per group
+
+        `df` is the stored sample of `sample_rows` rows (drawn from `population_rows`)
+        after the pipeline and filters, in random order. Returns the estimates and
+        their interval bounds (f"{column}_{function}_low"/"_high"), both indexed by
+        the group keys, and metadata about the sample used.
+        """
+        group_by = list(query.group_by or [])
+        keys = group_by or [_GLOBAL_KEY]
+        if not group_by:
+            df = df.assign(**{_GLOBAL_KEY: 0})
+
+        confidence = query.confidence or 0.95
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        scale = population_rows / max(1, sample_rows)
+
+        # Rows of each stratum in the stored sample, and how many of them to use
+        grouped = df.groupby(keys, observed=True, sort=True)
+        stratum_rows = grouped[keys[0]].transform("size").to_numpy()
+        take = ApproximateQueryEngine._stratum_sizes(df, grouped, stratum_rows, query, aggregations, scale, z)
+        # The sample is stored in random order, so the first rows of each stratum are a random subsample
+        subsample = df[grouped.cumcount().to_numpy() < take]
+
+        sub = subsample.groupby(keys, observed=True, sort=True)
+        n = sub[keys[0]].size().astype(float)
+        reservoir = grouped[keys[0]].size().astype(float).reindex(n.index)
+        share = reservoir / max(1, sample_rows)  # Share of all rows that fall in the stratum
+        # Finite population corrections of the stored sample and of the subsample
+        fpc_sample = max(0.0, 1 - sample_rows / max(1, population_rows))
+        fpc_sub = (1 - n / reservoir).clip(lower=0)
+
+        by = [subsample[k] for k in keys]
+        estimates = pd.DataFrame(index=n.index)
+        bounds = pd.DataFrame(index=n.index)
+        unscaled = []
+        for agg in aggregations:
+            column, function = agg.column, agg.function.value
+            name = f"{column}_{function}"
+            if column not in subsample.columns or name in estimates.columns:
+                continue
+
+            values = subsample[column]
+            numeric = pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+            if function == "count" or (function == "sum" and numeric):
+                # Totals: scale the stratum mean of x (0 for missing values) up to the stratum size
+                x = values.notna().astype(float) if function == "count" else values.astype(float).fillna(0)
+                x_grouped = x.groupby(by, observed=True, sort=True)
+                mean = x_grouped.mean().reindex(n.index)
+                mean_sq = (x ** 2).groupby(by, observed=True, sort=True).mean().reindex(n.index)
+                var = x_grouped.var(ddof=1).reindex(n.index)
+
+                estimate = population_rows * share * mean
+                # Phase 1: the stored sample of a total over all rows (x outside the stratum counts as 0)
+                var_outer = (share * mean_sq - (share * mean) ** 2).clip(lower=0) * sample_rows / max(1, sample_rows - 1)
+                variance = population_rows ** 2 * fpc_sample * var_outer / sample_rows
+                # Phase 2: the subsample of the stratum
+                variance = variance + (population_rows * share) ** 2 * fpc_sub * var / n
+                if function == "count":
+                    estimate = estimate.round().astype("int64")
+            elif function == "avg" and numeric:
+                x = values.astype(float)
+                x_grouped = x.groupby(by, observed=True, sort=True)
+                estimate = x_grouped.mean().reindex(n.index)
+                var = x_grouped.var(ddof=1).reindex(n.index)
+                present = x_grouped.count().reindex(n.index).astype(float)
+                present_reservoir = present * reservoir / n
+                variance = var / present * fpc_sub + var / present_reservoir * fpc_sample
+            else:
+                # MIN/MAX/MEDIAN/STD (of measures, or of non-numeric inputs) can't be scaled; report the
+                # sample's value, listed in metadata["unscaled"] as a sample bound rather than an estimate
+                pandas_function = {"avg": "mean"}.get(function, function)
+                estimates[name] = sub[column].agg(pandas_function).reindex(n.index)
+                unscaled.append(name)
+                continue
+
+            half_width = z * np.sqrt(variance)
+            estimates[name] = estimate
+            bounds[f"{name}_low"] = estimate - half_width
+            bounds[f"{name}_high"] = estimate + half_width
+
+        if not group_by:
+            # Global aggregations always produce exactly one row; nothing matched means zero totals
+            estimates = estimates.reindex(pd.Index([0], name=_GLOBAL_KEY))
+            bounds = bounds.reindex(estimates.index)
+            for name in estimates.columns:
+                if name.endswith(("_sum", "_count")) and name not in unscaled:
+                    estimates[name] = estimates[name].fillna(0).astype(estimates[name].dtype)
+
+        matched_rows = population_rows * len(df) / max(1, sample_rows)
+        metadata = {
+            "approximate": True,
+            "population_rows": population_rows,
+            "sample_rows": int(len(subsample)),
+            "sample_rate": round(len(subsample) / matched_rows, 6) if matched_rows else 1.0,
+            "confidence": confidence,
+            "unscaled": unscaled
+        }
+        return estimates, bounds, metadata
+
+    @staticmethod
+    def _stratum_sizes(
+        df: pd.DataFrame,
+        grouped: Any,
+        stratum_rows: np.ndarray,
+        query: QueryRequest,
+        aggregations: List[AggregationRequest],
+        scale: float,
+        z: float
+    ) -> np.ndarray:
+        """Rows to use from the stratum of each row"""
+        if query.max_relative_error:
+            # n = (z * cv / e)^2 rows give a relative half-width of e for a mean (and so a total);
+            # the tightest requirement over the aggregations wins
+            needed = np.zeros(len(df))
+            strata = grouped.ngroup()
+            for agg in aggregations:
+                if agg.function.value not in SCALED_FUNCTIONS or agg.column not in df.columns:
+                    continue
+                values = df[agg.column]
+                if agg.function.value == "count":
+                    values = values.notna().astype(float)
+                elif not pd.api.types.is_numeric_dtype(values):
+                    continue
+                by_stratum = values.astype(float).groupby(strata)
+                mean, std = by_stratum.transform("mean"), by_stratum.transform("std")
+                cv = (std / mean.abs().replace(0, np.nan)).fillna(0).to_numpy(dtype=float)
+                n = (z * cv / query.max_relative_error) ** 2
+                # Finite population correction against the stratum's estimated size
+                n = n / (1 + n / (stratum_rows * scale))
+                needed = np.maximum(needed, np.ceil(n))
+        elif query.sample_rate:
+            needed = np.ceil(query.sample_rate * stratum_rows * scale)
+        else:
+            return stratum_rows
+
+        floor = np.minimum(stratum_rows, settings.APPROX_MIN_STRATUM_ROWS)
+        return np.clip(needed, floor, stratum_rows)
+
+    @staticmethod
+    def format_intervals(
+        bounds: pd.DataFrame,
+        group_by: Optional[List[str]],
+        result: pd.DataFrame
+    ) -> List[Dict[str, Any]]:
+        """Confidence intervals as records of group keys and {result column: [low, high]}
+
+        Only groups that made it into the (sorted, limited) result are listed.
+        """
+        group_by = list(group_by or [])
+        frame = bounds.reset_index()
+        for col in group_by:
+            if isinstance(frame[col].dtype, pd.CategoricalDtype):
+                frame[col] = frame[col].astype(frame[col].cat.categories.dtype)
+
+        names = [c[:-len("_low")] for c in bounds.columns if c.endswith("_low")]
+        returned = None
+        if group_by and all(col in result.columns for col in group_by):
+            returned = set(result[group_by].itertuples(index=False, name=None))
+
+        intervals = []
+        for row in frame.to_dict(orient="records"):
+            key = tuple(row[col] for col in group_by)
+            if returned is not None and key not in returned:
+                continue
+            record = {col: row[col] for col in group_by}
+            for name in names:
+                low, high = row[f"{name}_low"], row[f"{name}_high"]
+                record[name] = None if pd.isna(low) or pd.isna(high) else [float(low), float(high)]
+            intervals.append(record)
+        return intervals
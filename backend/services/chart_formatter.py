@@ -1,8 +1,11 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
-from models.schemas import ChartRequest, ChartDataset, ChartResponse, AggregationType
+from typing import Dict, List, Any, Optional, Tuple
+from models.schemas import ChartRequest, AggregationType, DownsampleMethod, PointFormat
 from utils.validators import apply_filters
+from utils.dataset_manager import DatasetManager
+from utils.json_response import json_array, point_objects
+from utils.downsampling import lttb, minmax, grid_density
 
 class ChartFormatter:
     """Service for preparing chart-ready data"""
@@ -14,17 +17,76 @@ class ChartFormatter:
     ]
     
     @staticmethod
-    def prepare_bar_chart(file_path: str, request: ChartRequest) -> ChartResponse:
+    def _load_chart_data(file_path: str, request: ChartRequest, columns: List[str]) -> pd.DataFrame:
+        """Load only the columns a chart needs, falling back to all columns for default charts"""
+        if not all(columns):
+            return DatasetManager.load_dataframe(file_path)
+        
+        filter_columns = [f.column for f in request.filters] if request.filters else []
+        return DatasetManager.load_dataframe(file_path, columns=list(columns) + filter_columns)
+    
+    @staticmethod
+    def _response(chart_type: str, labels: List[str], datasets: List[Dict[str, Any]], options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Chart payload in the shape of ChartResponse, with datasets holding NumPy arrays
+
+        Routes render it with NumpyJSONResponse, which writes the arrays without
+        building a Python object per point.
+        """
+        return {"chart_type": chart_type, "labels": labels, "datasets": datasets, "options": options or {}}
+    
+    @staticmethod
+    def _points(x: pd.Series, y: pd.Series) -> np.ndarray:
+        """Scatter points as an (n, 2) float array of [x, y] pairs, skipping pairs with a missing value"""
+        points = np.column_stack([
+            x.to_numpy(dtype="float64", na_value=np.nan),
+            y.to_numpy(dtype="float64", na_value=np.nan)
+        ])
+        return points[~np.isnan(points).any(axis=1)]
+    
+    @staticmethod
+    def _downsample_line(df: pd.DataFrame, request: ChartRequest) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Reduce an x-sorted series to about max_points rows, keeping its visual shape
+
+        Rows with a missing y value are dropped. Numeric and datetime x values are
+        used as the horizontal position; any other x is treated as evenly spaced.
+        """
+        y = df[request.y_column].to_numpy(dtype="float64", na_value=np.nan)
+        valid = ~np.isnan(y)
+        df, y = df[valid], y[valid]
+        source_points = len(df)
+
+        x_values = df[request.x_column]
+        if pd.api.types.is_datetime64_any_dtype(x_values):
+            x = x_values.to_numpy(dtype="datetime64[ns]").astype("int64").astype("float64")
+        elif pd.api.types.is_numeric_dtype(x_values) and not pd.api.types.is_bool_dtype(x_values):
+            x = x_values.to_numpy(dtype="float64", na_value=np.nan)
+        else:
+            x = np.arange(len(df), dtype="float64")
+        placed = ~np.isnan(x)
+        if not placed.all():
+            # Missing x values sort last; they have no position, so they are dropped as well
+            df, x, y = df[placed], x[placed], y[placed]
+
+        method = request.downsample or DownsampleMethod.LTTB
+        if method == DownsampleMethod.MINMAX:
+            positions = minmax(y, request.max_points)
+        else:
+            positions = lttb(x, y, request.max_points)
+        df = df.iloc[positions]
+        return df, {"downsampled": {"method": method.value, "source_points": source_points, "points": len(df)}}
+    
+    @staticmethod
+    def prepare_bar_chart(file_path: str, request: ChartRequest) -> Dict[str, Any]:
         """Prepare data for bar chart"""
-        df = pd.read_csv(file_path)
+        df = ChartFormatter._load_chart_data(file_path, request, [request.category_column, request.value_column])
         
         # Apply filters
         if request.filters:
-            df = apply_filters(df, request.filters)
+            df = apply_filters(df, DatasetManager.parse_filter_values(file_path, request.filters))
         
         # Group and aggregate
         if request.category_column and request.value_column:
-            grouped = df.groupby(request.category_column)[request.value_column].agg(
+            grouped = df.groupby(request.category_column, observed=True)[request.value_column].agg(
                 request.aggregation.value if request.aggregation else "sum"
             ).reset_index()
             
@@ -33,147 +95,140 @@ class ChartFormatter:
                 grouped = grouped.head(request.limit)
             
             labels = grouped[request.category_column].astype(str).tolist()
-            data = grouped[request.value_column].tolist()
+            data = json_array(grouped[request.value_column])
         else:
             # Default: count by first column
             first_col = df.columns[0]
             value_counts = df[first_col].value_counts().head(request.limit or 20)
             labels = value_counts.index.astype(str).tolist()
-            data = value_counts.values.tolist()
-        
-        dataset = ChartDataset(
-            label=request.value_column or "Count",
-            data=data,
-            backgroundColor=ChartFormatter.COLORS[:len(data)]
-        )
-        
-        return ChartResponse(
-            chart_type="bar",
-            labels=labels,
-            datasets=[dataset]
-        )
+            data = value_counts.to_numpy()
+        
+        dataset = {
+            "label": request.value_column or "Count",
+            "data": data,
+            "backgroundColor": ChartFormatter.COLORS[:len(data)],
+            "borderColor": None
+        }
+        return ChartFormatter._response("bar", labels, [dataset])
     
     @staticmethod
-    def prepare_line_chart(file_path: str, request: ChartRequest) -> ChartResponse:
+    def prepare_line_chart(file_path: str, request: ChartRequest) -> Dict[str, Any]:
         """Prepare data for line chart"""
-        df = pd.read_csv(file_path)
+        df = ChartFormatter._load_chart_data(file_path, request, [request.x_column, request.y_column])
         
         # Apply filters
         if request.filters:
-            df = apply_filters(df, request.filters)
+            df = apply_filters(df, DatasetManager.parse_filter_values(file_path, request.filters))
         
+        options = None
         if request.x_column and request.y_column:
             # Sort by x column
             df = df.sort_values(by=request.x_column)
             
-            # Apply limit
-            if request.limit:
+            # Downsample the whole series, or apply limit
+            if request.max_points:
+                df, options = ChartFormatter._downsample_line(df, request)
+            elif request.limit:
                 df = df.head(request.limit)
             
             labels = df[request.x_column].astype(str).tolist()
-            data = df[request.y_column].tolist()
+            data = json_array(df[request.y_column])
         else:
             # Default: use first two columns
-            labels = df.iloc[:, 0].astype(str).tolist()[:request.limit or 50]
-            data = df.iloc[:, 1].tolist()[:request.limit or 50]
-        
-        dataset = ChartDataset(
-            label=request.y_column or "Value",
-            data=data,
-            borderColor=ChartFormatter.COLORS[0]
-        )
-        
-        return ChartResponse(
-            chart_type="line",
-            labels=labels,
-            datasets=[dataset]
-        )
+            head = df.head(request.limit or 50)
+            labels = head.iloc[:, 0].astype(str).tolist()
+            data = json_array(head.iloc[:, 1])
+        
+        dataset = {
+            "label": request.y_column or "Value",
+            "data": data,
+            "backgroundColor": None,
+            "borderColor": ChartFormatter.COLORS[0]
+        }
+        return ChartFormatter._response("line", labels, [dataset], options=options)
     
     @staticmethod
-    def prepare_pie_chart(file_path: str, request: ChartRequest) -> ChartResponse:
+    def prepare_pie_chart(file_path: str, request: ChartRequest) -> Dict[str, Any]:
         """Prepare data for pie chart"""
-        df = pd.read_csv(file_path)
+        df = ChartFormatter._load_chart_data(file_path, request, [request.category_column, request.value_column])
         
         # Apply filters
         if request.filters:
-            df = apply_filters(df, request.filters)
+            df = apply_filters(df, DatasetManager.parse_filter_values(file_path, request.filters))
         
         if request.category_column and request.value_column:
-            grouped = df.groupby(request.category_column)[request.value_column].sum().reset_index()
+            grouped = df.groupby(request.category_column, observed=True)[request.value_column].sum().reset_index()
             grouped = grouped.head(request.limit or 10)
             
             labels = grouped[request.category_column].astype(str).tolist()
-            data = grouped[request.value_column].tolist()
+            data = json_array(grouped[request.value_column])
         else:
             # Default: count by first column
             first_col = df.columns[0]
             value_counts = df[first_col].value_counts().head(request.limit or 10)
             labels = value_counts.index.astype(str).tolist()
-            data = value_counts.values.tolist()
-        
-        dataset = ChartDataset(
-            label="Distribution",
-            data=data,
-            backgroundColor=ChartFormatter.COLORS[:len(data)]
-        )
-        
-        return ChartResponse(
-            chart_type="pie",
-            labels=labels,
-            datasets=[dataset]
-        )
+            data = value_counts.to_numpy()
+        
+        dataset = {
+            "label": "Distribution",
+            "data": data,
+            "backgroundColor": ChartFormatter.COLORS[:len(data)],
+            "borderColor": None
+        }
+        return ChartFormatter._response("pie", labels, [dataset])
     
     @staticmethod
-    def prepare_scatter_chart(file_path: str, request: ChartRequest) -> ChartResponse:
+    def prepare_scatter_chart(file_path: str, request: ChartRequest) -> Dict[str, Any]:
         """Prepare data for scatter plot"""
-        df = pd.read_csv(file_path)
+        df = ChartFormatter._load_chart_data(file_path, request, [request.x_column, request.y_column])
         
         # Apply filters
         if request.filters:
-            df = apply_filters(df, request.filters)
+            df = apply_filters(df, DatasetManager.parse_filter_values(file_path, request.filters))
         
+        options = None
+        counts = None
         if request.x_column and request.y_column:
-            # Apply limit
-            if request.limit:
+            # Apply limit, unless the whole cloud is binned down to max_points below
+            if request.limit and not request.max_points:
                 df = df.head(request.limit)
             
-            data = [
-                {"x": float(x), "y": float(y)}
-                for x, y in zip(df[request.x_column], df[request.y_column])
-                if pd.notna(x) and pd.notna(y)
-            ]
+            data = ChartFormatter._points(df[request.x_column], df[request.y_column])
+            if request.max_points and len(data) > request.max_points:
+                # One point per occupied grid cell, at the centroid of its points
+                x, y, counts = grid_density(data[:, 0], data[:, 1], request.max_points)
+                options = {"downsampled": {"method": "grid", "source_points": len(data), "points": len(counts)}}
+                data = np.column_stack([x, y])
         else:
             # Default: use first two numeric columns
             numeric_cols = df.select_dtypes(include=[np.number]).columns[:2]
             if len(numeric_cols) >= 2:
-                data = [
-                    {"x": float(x), "y": float(y)}
-                    for x, y in zip(df[numeric_cols[0]], df[numeric_cols[1]])
-                    if pd.notna(x) and pd.notna(y)
-                ][:request.limit or 100]
+                data = ChartFormatter._points(df[numeric_cols[0]], df[numeric_cols[1]])[:request.limit or 100]
             else:
-                data = []
-        
-        dataset = ChartDataset(
-            label="Data Points",
-            data=data,
-            backgroundColor=[ChartFormatter.COLORS[0]]
-        )
-        
-        return ChartResponse(
-            chart_type="scatter",
-            labels=[],
-            datasets=[dataset]
-        )
+                data = np.empty((0, 2))
+        
+        if request.point_format != PointFormat.PAIRS:
+            data = point_objects(data)
+        
+        dataset = {
+            "label": "Data Points",
+            "data": data,
+            "backgroundColor": [ChartFormatter.COLORS[0]],
+            "borderColor": None
+        }
+        if counts is not None:
+            # Points per grid cell, aligned with data, for sizing or shading the markers
+            dataset["counts"] = counts
+        return ChartFormatter._response("scatter", [], [dataset], options=options)
     
     @staticmethod
-    def prepare_heatmap(file_path: str, request: ChartRequest) -> ChartResponse:
+    def prepare_heatmap(file_path: str, request: ChartRequest) -> Dict[str, Any]:
         """Prepare correlation heatmap data"""
-        df = pd.read_csv(file_path)
+        df = DatasetManager.load_dataframe(file_path)
         
         # Apply filters
         if request.filters:
-            df = apply_filters(df, request.filters)
+            df = apply_filters(df, DatasetManager.parse_filter_values(file_path, request.filters))
         
         # Get numeric columns only
         numeric_df = df.select_dtypes(include=[np.number])
@@ -183,11 +238,7 @@ class ChartFormatter:
         
         # Convert to format suitable for heatmap
         labels = corr_matrix.columns.tolist()
-        data = corr_matrix.values.tolist()
-        
-        return ChartResponse(
-            chart_type="heatmap",
-            labels=labels,
-            datasets=[ChartDataset(label="Correlation", data=data)],
-            options={"min": -1, "max": 1}
-        )
+        data = corr_matrix.to_numpy()
+        
+        dataset = {"label": "Correlation", "data": data, "backgroundColor": None, "borderColor": None}
+        return ChartFormatter._response("heatmap", labels, [dataset], options={"min": -1, "max": 1})
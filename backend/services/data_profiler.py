@@ -1,31 +1,106 @@
+import json
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
+import pyarrow.parquet as pq
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
+from utils.dataset_manager import DatasetManager
+from utils.sketches import ColumnSketch, QuantileSketch
+from utils.type_inference import TypeInference
+from config import settings
 
 class DataProfiler:
     """Service for profiling CSV datasets"""
     
+    # Quantiles computed for every numeric column, in one batched pass
+    PERCENTILES = [0.25, 0.5, 0.75]
+    # Numeric profile fields and the describe() rows they are read from
+    NUMERIC_STATS = {
+        "mean": "mean", "median": "50%", "std": "std", "min": "min", "max": "max", "q25": "25%", "q75": "75%"
+    }
+    
     @staticmethod
     def profile_dataset(file_path: str) -> Dict[str, Any]:
         """Generate comprehensive profile of a dataset"""
-        df = pd.read_csv(file_path)
+        return DataProfiler.profile_frame(DatasetManager.load_dataframe(file_path))
+    
+    @staticmethod
+    def get_profile(file_path: str, schema_json: Optional[str]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """The stored profile of a dataset file, or a fresh one and the schema_json to store it in"""
+        profile = DataProfiler.stored_profile(schema_json, file_path)
+        if profile is not None:
+            return profile, None
+        profile = DataProfiler.profile_dataset(file_path)
+        return profile, DataProfiler.store_profile(schema_json, file_path, profile)
+    
+    @staticmethod
+    def fingerprint(file_path: str) -> str:
+        """Version stamp of the data file a profile was computed from"""
+        mtime, size = DatasetManager.get_file_version(file_path)
+        return f"{mtime}-{size}"
+    
+    @staticmethod
+    def stored_profile(schema_json: Optional[str], file_path: str) -> Optional[Dict[str, Any]]:
+        """The profile persisted in a dataset's schema_json, if it was computed from the current data file"""
+        if not schema_json:
+            return None
+        try:
+            schema = json.loads(schema_json)
+        except ValueError:
+            return None
+        if schema.get("profile_fingerprint") != DataProfiler.fingerprint(file_path):
+            return None
+        return schema.get("profile")
+    
+    @staticmethod
+    def store_profile(schema_json: Optional[str], file_path: str, profile: Dict[str, Any]) -> str:
+        """schema_json with the profile of the current data file added"""
+        schema = json.loads(schema_json) if schema_json else {}
+        schema["profile"] = profile
+        schema["profile_fingerprint"] = DataProfiler.fingerprint(file_path)
+        return json.dumps(schema, default=str)
+    
+    @staticmethod
+    def profile_frame(df: pd.DataFrame, approximate: Optional[bool] = None) -> Dict[str, Any]:
+        """Profile every column of a frame in one vectorized pass
+        
+        Missing counts come from a single null mask over the frame, numeric
+        statistics from one describe() over all numeric columns, and distinct
+        counts (with top values for text columns) from one hash pass per column.
+        
+        In approximate mode (by default for frames of PROFILE_SKETCH_MIN_ROWS rows
+        or more) distinct counts and top values of non-categorical columns come
+        from sketches instead, and are listed in the column's approximate_fields.
+        """
+        total_rows = len(df)
+        if approximate is None:
+            approximate = total_rows >= settings.PROFILE_SKETCH_MIN_ROWS
+        sketches = DataProfiler.sketch_columns(df) if approximate else {}
         
         profile = {
-            "total_rows": len(df),
+            "total_rows": total_rows,
             "total_columns": len(df.columns),
             "columns": [],
             "numeric_columns": [],
             "categorical_columns": [],
-            "date_columns": []
+            "date_columns": [],
+            "approximate": bool(sketches)
         }
         
+        missing = df.isna().sum()
+        numeric_cols = [c for c in df.columns if DataProfiler._is_numeric(df[c])]
+        stats = None
+        if numeric_cols:
+            stats = df[numeric_cols].describe(percentiles=DataProfiler.PERCENTILES)
+        
         for column in df.columns:
-            col_profile = DataProfiler._profile_column(df, column)
+            col_profile = DataProfiler._profile_column(
+                df[column], column, int(missing[column]), total_rows, stats, sketches.get(column)
+            )
             profile["columns"].append(col_profile)
             
             # Categorize columns
-            if col_profile["dtype"] in ["int64", "float64"]:
+            if column in numeric_cols:
                 profile["numeric_columns"].append(column)
             elif col_profile.get("is_date", False):
                 profile["date_columns"].append(column)
@@ -35,18 +110,66 @@ class DataProfiler:
         return profile
     
     @staticmethod
-    def _profile_column(df: pd.DataFrame, column: str) -> Dict[str, Any]:
-        """Profile a single column"""
-        col_data = df[column]
+    def sketch_columns(df: pd.DataFrame) -> Dict[str, ColumnSketch]:
+        """Distinct-count (and, for text, top-value) sketches of the non-categorical columns, built chunk by chunk
         
+        Categorical columns are left out: counting their codes is exact and needs
+        no more memory than their dictionary.
+        """
+        sketches = {
+            column: ColumnSketch(
+                settings.PROFILE_HLL_PRECISION, settings.PROFILE_TOP_CAPACITY,
+                track_top=DataProfiler._is_text(df[column])
+            )
+            for column in df.columns
+            if not isinstance(df[column].dtype, pd.CategoricalDtype)
+        }
+        for start in range(0, len(df), settings.STREAMING_CHUNK_ROWS):
+            chunk = df.iloc[start:start + settings.STREAMING_CHUNK_ROWS]
+            for column, sketch in sketches.items():
+                sketch.add(chunk[column])
+        return sketches
+    
+    @staticmethod
+    def _profile_column(
+        col_data: pd.Series,
+        column: str,
+        missing_count: int,
+        total_rows: int,
+        stats: Optional[pd.DataFrame],
+        sketch: Optional[ColumnSketch] = None
+    ) -> Dict[str, Any]:
+        """Profile a single column from the frame-wide missing counts and numeric statistics"""
+        is_categorical = isinstance(col_data.dtype, pd.CategoricalDtype)
+        is_text = DataProfiler._is_text(col_data)
+        counts = None
+        if is_text and sketch is None:
+            # Integer codes per distinct value (-1 for missing) and how often each occurs,
+            # giving both the distinct count and the top values from one hash pass
+            if is_categorical:
+                codes, labels = col_data.cat.codes.to_numpy(), col_data.cat.categories
+            else:
+                codes, labels = pd.factorize(col_data, use_na_sentinel=True)
+            counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+        
+        sample = col_data.dropna().head(5)
         profile = {
             "name": column,
-            "dtype": str(col_data.dtype),
-            "missing_count": int(col_data.isna().sum()),
-            "missing_percentage": float(col_data.isna().sum() / len(col_data) * 100),
-            "unique_count": int(col_data.nunique()),
-            "sample_values": col_data.dropna().head(5).tolist()
+            # Dictionary-encoded columns report the type of their labels
+            "dtype": str(col_data.cat.categories.dtype) if is_categorical else str(col_data.dtype),
+            "missing_count": missing_count,
+            "missing_percentage": float(missing_count / total_rows * 100) if total_rows else 0.0,
+            "unique_count": None,
+            # JSON-native values, so a profile reads the same fresh and from the stored copy
+            "sample_values": json.loads(sample.to_json(orient="values", date_format="iso"))
         }
+        if sketch is not None:
+            profile["unique_count"] = sketch.unique_count()
+            profile["approximate_fields"] = ["unique_count", "top_values"] if is_text else ["unique_count"]
+        elif is_text:
+            profile["unique_count"] = int(np.count_nonzero(counts))
+        else:
+            profile["unique_count"] = int(col_data.nunique())
         
         # Check if it's a date column
         if DataProfiler._is_date_column(col_data):
@@ -54,41 +177,221 @@ class DataProfiler:
             profile["dtype"] = "datetime"
         
         # Add numeric statistics
-        if col_data.dtype in ["int64", "float64"]:
+        if stats is not None and column in stats.columns:
+            column_stats = stats[column]
             profile.update({
-                "mean": float(col_data.mean()) if not col_data.isna().all() else None,
-                "median": float(col_data.median()) if not col_data.isna().all() else None,
-                "std": float(col_data.std()) if not col_data.isna().all() else None,
-                "min": float(col_data.min()) if not col_data.isna().all() else None,
-                "max": float(col_data.max()) if not col_data.isna().all() else None,
-                "q25": float(col_data.quantile(0.25)) if not col_data.isna().all() else None,
-                "q75": float(col_data.quantile(0.75)) if not col_data.isna().all() else None
+                name: None if pd.isna(column_stats[row]) else float(column_stats[row])
+                for name, row in DataProfiler.NUMERIC_STATS.items()
             })
         
         # Add categorical statistics
-        elif col_data.dtype == "object":
-            value_counts = col_data.value_counts().head(10)
+        elif is_text and sketch is not None:
             profile["top_values"] = {
-                str(k): int(v) for k, v in value_counts.items()
+                str(value): int(count) for value, count in sketch.top_values(10).items()
+            }
+        elif is_text:
+            top = np.argsort(-counts, kind="stable")[:10]
+            top = top[counts[top] > 0]
+            profile["top_values"] = {
+                str(labels[i]): int(counts[i]) for i in top
             }
         
         return profile
     
+    @staticmethod
+    def _is_numeric(col_data: pd.Series) -> bool:
+        return pd.api.types.is_numeric_dtype(col_data) and not pd.api.types.is_bool_dtype(col_data)
+    
+    @staticmethod
+    def _is_text(col_data: pd.Series) -> bool:
+        return isinstance(col_data.dtype, pd.CategoricalDtype) \
+            or pd.api.types.is_object_dtype(col_data) or pd.api.types.is_string_dtype(col_data)
+    
     @staticmethod
     def _is_date_column(col_data: pd.Series) -> bool:
         """Check if a column contains date values"""
-        if col_data.dtype == "object":
-            try:
-                # Try to parse a sample of non-null values
-                sample = col_data.dropna().head(10)
-                pd.to_datetime(sample, errors='raise')
-                return True
-            except:
-                return False
+        if pd.api.types.is_datetime64_any_dtype(col_data):
+            return True
+        if DataProfiler._is_text(col_data):
+            # Dates are typed at ingest; older datasets may still hold them as text
+            return TypeInference.detect_datetime_format(col_data.dropna().head(10)) is not None
         return False
     
     @staticmethod
     def get_row_count(file_path: str) -> int:
-        """Get the number of rows in a CSV file"""
+        """Get the number of rows in a dataset file"""
+        if file_path.endswith(DatasetManager.COLUMNAR_EXTENSION):
+            # Parquet footers carry the row count, no need to read any data
+            return pq.ParquetFile(file_path).metadata.num_rows
         df = pd.read_csv(file_path)
         return len(df)
+
+
+class ProfileBuilder:
+    """Profile of a dataset built from its rows a chunk at a time, as they are ingested
+
+    Missing counts, means, standard deviations and extremes are exact. Quartiles
+    come from a QuantileSketch, exact until the column has more values than it
+    keeps. Values are counted exactly while a column has at most
+    CATEGORICAL_MAX_UNIQUE distinct ones or fewer than PROFILE_SKETCH_MIN_ROWS
+    rows were seen; past that, distinct counts and top values come from the
+    column's ColumnSketch. Estimated fields are listed in approximate_fields.
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self) -> None:
+        """Forget the rows added so far"""
+        self.rows = 0
+        self.columns: Dict[str, Dict[str, Any]] = {}
+    
+    def add(self, chunk: pd.DataFrame) -> None:
+        """Add the next rows of the dataset"""
+        for column in chunk.columns:
+            series = chunk[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype(series.cat.categories.dtype)
+            state = self.columns.get(column)
+            if state is None:
+                state = self.columns[column] = ProfileBuilder._column_state(series)
+            elif state["numeric"] and isinstance(series.dtype, np.dtype):
+                # e.g. integers with missing values read as floats, as in the whole column
+                state["dtype"] = np.result_type(state["dtype"], series.dtype)
+            
+            values = series.dropna()
+            state["missing"] += len(series) - len(values)
+            if len(state["head"]) < 10:
+                state["head"] = pd.concat([state["head"], values.head(10)]).head(10)
+            
+            if state["numeric"]:
+                # Sketch numbers as floats, so an integer chunk and a float chunk hash alike
+                values = values.astype("float64")
+                ProfileBuilder._add_moments(state, values.to_numpy())
+                state["quantiles"].add(values.to_numpy())
+            state["sketch"].add(values)
+            
+            if state["counts"] is not None:
+                counts = values.value_counts(sort=False)
+                # Summed in order of first appearance, which breaks ties between top values
+                state["counts"] = pd.concat([state["counts"], counts]).groupby(level=0, sort=False).sum() \
+                    if len(state["counts"]) else counts
+                if self.rows + len(chunk) >= settings.PROFILE_SKETCH_MIN_ROWS \
+                        and len(state["counts"]) > settings.CATEGORICAL_MAX_UNIQUE:
+                    state["counts"] = None
+        self.rows += len(chunk)
+    
+    def result(self) -> Dict[str, Any]:
+        """The profile, in the layout of DataProfiler.profile_frame"""
+        profile = {
+            "total_rows": self.rows,
+            "total_columns": len(self.columns),
+            "columns": [],
+            "numeric_columns": [],
+            "categorical_columns": [],
+            "date_columns": [],
+            "approximate": False
+        }
+        for column, state in self.columns.items():
+            col_profile = ProfileBuilder._profile_column(column, state, self.rows)
+            profile["columns"].append(col_profile)
+            profile["approximate"] |= "unique_count" in col_profile.get("approximate_fields", [])
+            
+            if state["numeric"]:
+                profile["numeric_columns"].append(column)
+            elif col_profile.get("is_date", False):
+                profile["date_columns"].append(column)
+            else:
+                profile["categorical_columns"].append(column)
+        return profile
+    
+    @staticmethod
+    def _column_state(series: pd.Series) -> Dict[str, Any]:
+        is_text = DataProfiler._is_text(series)
+        return {
+            "dtype": series.dtype,
+            "numeric": DataProfiler._is_numeric(series),
+            "text": is_text,
+            "missing": 0,
+            "head": series.iloc[:0],
+            "count": 0,
+            "mean": 0.0,
+            "m2": 0.0,
+            "min": None,
+            "max": None,
+            "quantiles": QuantileSketch(),
+            "sketch": ColumnSketch(settings.PROFILE_HLL_PRECISION, settings.PROFILE_TOP_CAPACITY, track_top=is_text),
+            "counts": series.iloc[:0].value_counts()
+        }
+    
+    @staticmethod
+    def _add_moments(state: Dict[str, Any], values: np.ndarray) -> None:
+        """Fold a chunk into the running count, mean and sum of squared deviations (Chan et al.)"""
+        if not len(values):
+            return
+        count, mean = len(values), float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = state["count"] + count
+        delta = mean - state["mean"]
+        state["m2"] += m2 + delta * delta * state["count"] * count / total
+        state["mean"] += delta * count / total
+        state["count"] = total
+        low, high = float(values.min()), float(values.max())
+        state["min"] = low if state["min"] is None else min(state["min"], low)
+        state["max"] = high if state["max"] is None else max(state["max"], high)
+    
+    @staticmethod
+    def _profile_column(column: str, state: Dict[str, Any], total_rows: int) -> Dict[str, Any]:
+        head = state["head"]
+        profile = {
+            "name": column,
+            "dtype": str(state["dtype"]),
+            "missing_count": state["missing"],
+            "missing_percentage": float(state["missing"] / total_rows * 100) if total_rows else 0.0,
+            "unique_count": None,
+            # JSON-native values, so a profile reads the same fresh and from the stored copy
+            "sample_values": json.loads(head.head(5).to_json(orient="values", date_format="iso"))
+        }
+        counts = state["counts"]
+        approximate_fields = []
+        if counts is not None:
+            profile["unique_count"] = int(len(counts))
+        else:
+            profile["unique_count"] = state["sketch"].unique_count()
+            approximate_fields = ["unique_count", "top_values"] if state["text"] else ["unique_count"]
+        
+        if DataProfiler._is_date_column(head):
+            profile["is_date"] = True
+            profile["dtype"] = "datetime"
+        
+        if state["numeric"]:
+            count = state["count"]
+            quantiles = state["quantiles"]
+            profile.update({
+                "mean": state["mean"] if count else None,
+                "median": quantiles.quantile(0.5),
+                "std": float(np.sqrt(state["m2"] / (count - 1))) if count > 1 else None,
+                "min": state["min"],
+                "max": state["max"],
+                "q25": quantiles.quantile(0.25),
+                "q75": quantiles.quantile(0.75)
+            })
+            if quantiles.count > quantiles.max_centroids:
+                approximate_fields += ["median", "q25", "q75"]
+        elif state["text"] and counts is not None:
+            if len(counts) <= min(settings.CATEGORICAL_MAX_UNIQUE, max(1, total_rows * settings.CATEGORICAL_MAX_UNIQUE_RATIO)):
+                # Columns stored as categoricals list tied values in dictionary (sorted) order
+                try:
+                    counts = counts.sort_index()
+                except TypeError:
+                    pass
+            top = counts.sort_values(ascending=False, kind="stable").iloc[:10]
+            profile["top_values"] = {str(value): int(count) for value, count in top.items()}
+        elif state["text"]:
+            profile["top_values"] = {
+                str(value): int(count) for value, count in state["sketch"].top_values(10).items()
+            }
+        
+        if approximate_fields:
+            profile["approximate_fields"] = approximate_fields
+        return profile
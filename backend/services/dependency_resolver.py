@@ -0,0 +1,180 @@
+from typing import List, Dict, Any, Optional, Set, Tuple, Iterable
+from models.schemas import QueryRequest
+from services.formula_engine import FormulaEngine, FormulaError
+
+class DependencyResolver:
+    """Work out which input columns a query really needs so loading can skip the rest"""
+
+    @staticmethod
+    def is_aggregate_formula(formula: str, known_columns: Iterable[str] = ()) -> bool:
+        """Check whether a measure formula is evaluated after grouping"""
+        return FormulaEngine.is_aggregate(formula, known_columns)
+
+    @staticmethod
+    def formula_columns(formula: str, known_columns: Set[str]) -> Set[str]:
+        """Find the known column names referenced by a formula
+
+        Read from the compiled formula. If it doesn't parse, fall back to
+        substring matching, longest names first so "Total Sales" is not also read
+        as "Total"; over-matching only costs a few extra columns, never a wrong result.
+        """
+        try:
+            return set(FormulaEngine.compile(formula, known_columns).columns) & set(known_columns)
+        except FormulaError:
+            pass
+
+        remaining = formula or ""
+        found = set()
+        for col in sorted(known_columns, key=len, reverse=True):
+            if col and col in remaining:
+                found.add(col)
+                remaining = remaining.replace(col, " ")
+        return found
+
+    @staticmethod
+    def pipeline_columns(
+        available: List[str],
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> Set[str]:
+        """Every column name that can exist at some point in the pipeline"""
+        universe = set(available)
+        for step in transformations or []:
+            params = step.get("params", {})
+            if step.get("type") == "rename":
+                universe.update(params.get("columns", {}).values())
+            elif step.get("type") == "derived_column" and params.get("name"):
+                universe.add(params["name"])
+        universe.update(m["name"] for m in measures or [])
+        return universe
+
+    @staticmethod
+    def query_columns(
+        available: List[str],
+        query: QueryRequest,
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> Optional[Set[str]]:
+        """Columns of the prepared frame a query reads, or None if it returns raw rows"""
+        if not query.aggregations:
+            # Without aggregations every column ends up in the result
+            return None
+
+        universe = DependencyResolver.pipeline_columns(available, transformations, measures)
+        measures_by_name = {m["name"]: m for m in (measures or [])}
+        needed = set(query.group_by or [])
+        needed.update(f.column for f in query.filters or [])
+        needed.update(s.column for s in query.sort_by or [])
+
+        for agg in query.aggregations:
+            measure = measures_by_name.get(agg.column)
+            if measure and DependencyResolver.is_aggregate_formula(measure.get("formula", ""), universe):
+                needed |= DependencyResolver.formula_columns(measure["formula"], universe)
+            else:
+                needed.add(agg.column)
+
+        return {col for col in needed if col in universe}
+
+    @staticmethod
+    def resolve_pipeline(
+        available: List[str],
+        needed: Optional[Set[str]],
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> Tuple[Optional[List[str]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Walk the pipeline backwards from the needed output columns
+
+        Returns the minimal input columns (None for all), plus the transformation
+        steps and row-level measures that still contribute to the output.
+        """
+        transformations = transformations or []
+        measures = measures or []
+        if needed is None:
+            return None, transformations, measures
+
+        universe = DependencyResolver.pipeline_columns(available, transformations, measures)
+        required = set(needed)
+
+        # Row-level measures run last, so resolve them first (in reverse)
+        kept_measures = []
+        for m in reversed(measures):
+            formula = m.get("formula", "")
+            if DependencyResolver.is_aggregate_formula(formula, universe) or m["name"] not in required:
+                continue
+            required.discard(m["name"])
+            required |= DependencyResolver.formula_columns(formula, universe)
+            kept_measures.append(m)
+        kept_measures.reverse()
+
+        kept_steps = []
+        for step in reversed(transformations):
+            step_type = step.get("type")
+            params = step.get("params", {})
+
+            if step_type == "rename":
+                mapping = params.get("columns", {})
+                renamed_from = {new: old for old, new in mapping.items()}
+                # Also kept when an old name is required: after the rename that column is gone,
+                # and skipping the step would answer from it anyway
+                if any(new in required for new in renamed_from) or any(old in required for old in mapping):
+                    required = {renamed_from.get(col, col) for col in required}
+                    kept_steps.append(step)
+            elif step_type == "derived_column":
+                name = params.get("name")
+                if name in required:
+                    required.discard(name)
+                    required |= DependencyResolver.formula_columns(params.get("formula", ""), universe)
+                    kept_steps.append(step)
+            elif step_type == "type_convert":
+                if params.get("column") in required:
+                    kept_steps.append(step)
+            elif step_type in ("filter", "sort"):
+                # Row selection and order affect every output column
+                if params.get("column"):
+                    required.add(params["column"])
+                kept_steps.append(step)
+            elif step_type == "drop":
+                dropped = required & set(params.get("columns", []))
+                if dropped:
+                    required -= dropped
+                    kept_steps.append(step)
+            else:
+                # Unknown step: can't tell what it reads, so load everything
+                return None, transformations, measures
+        kept_steps.reverse()
+
+        input_columns = [c for c in available if c in required]
+        return input_columns, kept_steps, kept_measures
+
+    @staticmethod
+    def row_aligned_columns(
+        available: List[str],
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> Optional[Set[str]]:
+        """Stored columns whose rows and values pass through the pipeline unchanged
+
+        Returns None if a step filters or reorders rows, since row positions of
+        the prepared frame then no longer match the stored file.
+        """
+        aligned = set(available)
+        for step in transformations or []:
+            step_type = step.get("type")
+            params = step.get("params", {})
+
+            if step_type in ("filter", "sort"):
+                return None
+            if step_type == "rename":
+                mapping = params.get("columns", {})
+                aligned -= set(mapping.keys()) | set(mapping.values())
+            elif step_type == "drop":
+                aligned -= set(params.get("columns", []))
+            elif step_type == "type_convert":
+                aligned.discard(params.get("column"))
+            elif step_type == "derived_column":
+                aligned.discard(params.get("name"))
+            else:
+                return None
+
+        aligned -= {m["name"] for m in measures or []}
+        return aligned
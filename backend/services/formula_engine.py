@@ -0,0 +1,507 @@
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+import numpy as np
+import pandas as pd
+
+# Aggregate functions allowed in measure formulas, mapped to AggregationType values
+AGGREGATE_FUNCTIONS = {
+    "SUM": "sum",
+    "AVG": "avg",
+    "MEAN": "avg",
+    "COUNT": "count",
+    "MIN": "min",
+    "MAX": "max",
+    "MEDIAN": "median",
+    "STD": "std"
+}
+
+# Row-level functions, applied element-wise
+SCALAR_FUNCTIONS = {
+    "ABS": np.abs,
+    "SQRT": np.sqrt,
+    "LOG": np.log,
+    "LOG10": np.log10,
+    "EXP": np.exp,
+    "FLOOR": np.floor,
+    "CEIL": np.ceil,
+    "ROUND": np.round
+}
+
+BINARY_OPERATORS = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": lambda a, b: a / b,
+    "//": lambda a, b: a // b,
+    "%": lambda a, b: a % b,
+    "**": lambda a, b: a ** b,
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "&": lambda a, b: a & b,
+    "|": lambda a, b: a | b
+}
+
+_NUMBER = re.compile(r"\d+(\.\d*)?([eE][+-]?\d+)?|\.\d+([eE][+-]?\d+)?")
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+_OPERATORS = ("**", "//", "==", "!=", "<=", ">=", "+", "-", "*", "/", "%", "<", ">", "&", "|", "~", "(", ")", ",")
+_KEYWORDS = {"and": "&", "or": "|", "not": "~"}
+
+
+class FormulaError(ValueError):
+    """A formula that can't be parsed"""
+
+
+class AggregateCall:
+    """One aggregate call inside a formula, e.g. SUM(Unit price * Quantity)
+
+    `key` is the name the aggregated input goes by: the column itself for
+    SUM(Sales), otherwise the canonical text of the argument, so the same
+    expression written differently ("Price*Qty", "(Price * Qty)") shares one
+    key. Aggregated results are looked up as f"{key}_{function}".
+    """
+
+    def __init__(self, node: tuple):
+        _, self.function, self.key, self.node = node
+
+    @property
+    def is_column(self) -> bool:
+        return self.node[0] == "col"
+
+    @property
+    def result_column(self) -> str:
+        return f"{self.key}_{self.function}"
+
+    def evaluate_argument(self, df: pd.DataFrame) -> Any:
+        """Row-level values of the aggregated expression"""
+        return _evaluate(self.node, df)
+
+
+class CompiledFormula:
+    """A parsed formula with its column dependencies and aggregate calls
+
+    Nodes are plain tuples, so equal subexpressions of different formulas
+    compare (and hash) equal.
+    """
+
+    def __init__(self, text: str, node: tuple, columns: Set[str], aggregates: List[AggregateCall]):
+        self.text = text
+        self.node = node
+        self.columns = frozenset(columns)
+        self.aggregates = aggregates
+
+    @property
+    def is_aggregate(self) -> bool:
+        return bool(self.aggregates)
+
+    def evaluate(self, df: pd.DataFrame) -> Any:
+        """Evaluate vectorized over a frame
+
+        Column references read df columns; aggregate calls read the
+        f"{key}_{function}" columns of an already aggregated frame.
+        """
+        return _evaluate(self.node, df)
+
+
+def _evaluate(node: tuple, df: pd.DataFrame, evaluate: Optional[Callable[[tuple], Any]] = None) -> Any:
+    """Evaluate one node; children go through `evaluate` (this function by default)"""
+    evaluate = evaluate or (lambda child: _evaluate(child, df))
+    kind = node[0]
+    if kind == "const":
+        return node[1]
+    if kind == "col":
+        if node[1] not in df.columns:
+            raise KeyError(f"Column not found: {node[1]}")
+        return df[node[1]]
+    if kind == "agg":
+        name = f"{node[2]}_{node[1]}"
+        if name not in df.columns:
+            raise KeyError(f"Aggregate not computed: {name}")
+        return df[name]
+    if kind == "neg":
+        return -evaluate(node[1])
+    if kind == "not":
+        return ~evaluate(node[1])
+    if kind == "bin":
+        return BINARY_OPERATORS[node[1]](evaluate(node[2]), evaluate(node[3]))
+    if kind == "call":
+        return SCALAR_FUNCTIONS[node[1]](*[evaluate(arg) for arg in node[2]])
+    raise FormulaError(f"Unknown node {kind}")
+
+
+def _children(node: tuple) -> Tuple[tuple, ...]:
+    kind = node[0]
+    if kind in ("neg", "not"):
+        return (node[1],)
+    if kind == "bin":
+        return (node[2], node[3])
+    if kind == "call":
+        return node[2]
+    # Aggregates read a precomputed column, so their argument isn't evaluated here
+    return ()
+
+
+_PRECEDENCE = {
+    "|": 1, "&": 2, "not": 3,
+    "==": 4, "!=": 4, "<": 4, "<=": 4, ">": 4, ">=": 4,
+    "+": 5, "-": 5, "*": 6, "/": 6, "//": 6, "%": 6,
+    "neg": 7, "**": 8
+}
+
+
+def render(node: tuple) -> str:
+    """Canonical text of a node: one spacing style, only the parentheses precedence needs"""
+    kind = node[0]
+    if kind == "const":
+        return f'"{node[1]}"' if isinstance(node[1], str) else repr(node[1])
+    if kind == "col":
+        return node[1]
+    if kind == "agg":
+        return f"{node[1].upper()}({render(node[3])})"
+    if kind == "call":
+        return f"{node[1]}({', '.join(render(arg) for arg in node[2])})"
+
+    def precedence(child: tuple) -> int:
+        if child[0] == "bin":
+            return _PRECEDENCE[child[1]]
+        return _PRECEDENCE.get(child[0], 9)
+
+    if kind in ("neg", "not"):
+        child = render(node[1])
+        if precedence(node[1]) < _PRECEDENCE[kind]:
+            child = f"({child})"
+        return ("-" if kind == "neg" else "~") + child
+
+    op, left, right = node[1], node[2], node[3]
+    left_text, right_text = render(left), render(right)
+    # ** is right-associative, everything else left-associative
+    if precedence(left) < _PRECEDENCE[op] or (op == "**" and precedence(left) == _PRECEDENCE[op]):
+        left_text = f"({left_text})"
+    if precedence(right) < _PRECEDENCE[op] or (op != "**" and precedence(right) == _PRECEDENCE[op]):
+        right_text = f"({right_text})"
+    return f"{left_text} {op} {right_text}"
+
+
+class SharedEvaluator:
+    """Evaluates several formula trees over one frame, computing each repeated subexpression once
+
+    Uses are counted up front; a shared intermediate result is kept only until
+    its last consumer has read it, so memory never holds more than the live ones.
+    """
+
+    def __init__(self, df: pd.DataFrame, roots: Iterable[tuple]):
+        self.df = df
+        self._uses: Counter = Counter()
+        self._memo: Dict[tuple, Any] = {}
+        for root in roots:
+            self._count(root)
+
+    def _count(self, node: tuple) -> None:
+        self._uses[node] += 1
+        if self._uses[node] == 1:
+            # A shared subtree reads its own children only once
+            for child in _children(node):
+                self._count(child)
+
+    def evaluate(self, node: tuple) -> Any:
+        if node in self._memo:
+            value = self._memo[node]
+        else:
+            value = _evaluate(node, self.df, self.evaluate)
+
+        self._uses[node] -= 1
+        if self._uses[node] > 0 and node[0] not in ("const", "col", "agg"):
+            self._memo[node] = value
+        else:
+            self._memo.pop(node, None)
+        return value
+
+
+class MeasurePlan:
+    """Shared evaluation plan for the aggregate measures requested together in one query
+
+    Identical aggregate calls across measures are computed once, each distinct
+    row-level argument (e.g. Price * Qty) is materialized as a single column,
+    and common subexpressions are shared both before and after grouping.
+    """
+
+    def __init__(self, measures: List[Tuple[str, CompiledFormula]]):
+        self.measures = measures
+        calls: Dict[Tuple[str, str], AggregateCall] = {}
+        for _, compiled in measures:
+            for call in compiled.aggregates:
+                calls.setdefault((call.key, call.function), call)
+        self.calls = list(calls.values())
+
+    def materialize_inputs(self, df: pd.DataFrame) -> None:
+        """Add every distinct aggregated expression to `df` once, as a column named by its key"""
+        pending: Dict[str, tuple] = {}
+        for call in self.calls:
+            if not call.is_column and call.key not in df.columns:
+                pending.setdefault(call.key, call.node)
+
+        evaluator = SharedEvaluator(df, pending.values())
+        for key, node in pending.items():
+            try:
+                df[key] = evaluator.evaluate(node)
+            except Exception as e:
+                print(f"Warning: could not pre-evaluate row-level expression '{key}': {e}")
+
+    def evaluate(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Evaluate the measures on an aggregated frame"""
+        evaluator = SharedEvaluator(df, [compiled.node for _, compiled in self.measures])
+        for name, compiled in self.measures:
+            try:
+                df[name] = evaluator.evaluate(compiled.node)
+            except Exception as e:
+                print(f"Error evaluating aggregate measure {name}: {e}")
+        return df
+
+
+class _Parser:
+    """Recursive-descent parser over a token list
+
+    Column names may contain spaces and operator characters ("Unit price",
+    "Tax 5%"), so known column names are matched first, longest first, then
+    `backticked` names, literals, functions, bare identifiers and operators.
+    """
+
+    def __init__(self, text: str, columns: Iterable[str]):
+        self.text = text
+        self.columns = sorted(columns, key=len, reverse=True)
+        self.tokens = self._tokenize()
+        self.pos = 0
+        self.referenced: Set[str] = set()
+        self.aggregates: List[AggregateCall] = []
+
+    def parse(self) -> CompiledFormula:
+        if not self.tokens:
+            raise FormulaError("Empty formula")
+        node = self._or()
+        if self.pos != len(self.tokens):
+            raise FormulaError(f"Unexpected '{self._peek()[1]}' in formula '{self.text}'")
+        return CompiledFormula(self.text, node, self.referenced, self.aggregates)
+
+    def _tokenize(self) -> List[Tuple[str, Any, int, int]]:
+        text = self.text
+        tokens = []
+        i = 0
+        while i < len(text):
+            if text[i].isspace():
+                i += 1
+                continue
+
+            column = next((c for c in self.columns if self._column_at(c, i)), None)
+            if column is not None:
+                tokens.append(("col", column, i, i + len(column)))
+                i += len(column)
+            elif text[i] == "`":
+                end = text.find("`", i + 1)
+                if end < 0:
+                    raise FormulaError(f"Unclosed ` in formula '{text}'")
+                tokens.append(("col", text[i + 1:end], i, end + 1))
+                i = end + 1
+            elif text[i] in "'\"":
+                end = text.find(text[i], i + 1)
+                if end < 0:
+                    raise FormulaError(f"Unclosed string in formula '{text}'")
+                tokens.append(("const", text[i + 1:end], i, end + 1))
+                i = end + 1
+            elif (match := _NUMBER.match(text, i)):
+                literal = match.group(0)
+                value = float(literal) if any(ch in literal for ch in ".eE") else int(literal)
+                tokens.append(("const", value, i, match.end()))
+                i = match.end()
+            elif (match := _IDENTIFIER.match(text, i)):
+                word = match.group(0)
+                if word.lower() in _KEYWORDS:
+                    tokens.append(("op", _KEYWORDS[word.lower()], i, match.end()))
+                elif word in ("True", "False"):
+                    tokens.append(("const", word == "True", i, match.end()))
+                elif text[match.end():].lstrip().startswith("("):
+                    tokens.append(("func", word.upper(), i, match.end()))
+                else:
+                    tokens.append(("col", word, i, match.end()))
+                i = match.end()
+            else:
+                operator = next((op for op in _OPERATORS if text.startswith(op, i)), None)
+                if operator is None:
+                    raise FormulaError(f"Unexpected character '{text[i]}' in formula '{text}'")
+                tokens.append(("op", operator, i, i + len(operator)))
+                i += len(operator)
+        return tokens
+
+    def _column_at(self, column: str, i: int) -> bool:
+        """Whether a known column name starts at position i as a whole token"""
+        text = self.text
+        if not text.startswith(column, i):
+            return False
+        end = i + len(column)
+        if _is_word_char(column[-1]) and end < len(text) and _is_word_char(text[end]):
+            # "Total" must not match the start of "Totals"
+            return False
+        if column.upper() in AGGREGATE_FUNCTIONS or column.upper() in SCALAR_FUNCTIONS:
+            # A column named like a function is still the function when called
+            return not text[end:].lstrip().startswith("(")
+        return True
+
+    def _peek(self) -> Optional[Tuple[str, Any, int, int]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _accept(self, *operators: str) -> Optional[str]:
+        token = self._peek()
+        if token is not None and token[0] == "op" and token[1] in operators:
+            self.pos += 1
+            return token[1]
+        return None
+
+    def _expect(self, operator: str) -> Tuple[str, Any, int, int]:
+        token = self._peek()
+        if token is None or token[0] != "op" or token[1] != operator:
+            raise FormulaError(f"Expected '{operator}' in formula '{self.text}'")
+        self.pos += 1
+        return token
+
+    def _binary(self, operand, operators) -> tuple:
+        node = operand()
+        while (op := self._accept(*operators)) is not None:
+            node = ("bin", op, node, operand())
+        return node
+
+    def _or(self) -> tuple:
+        return self._binary(self._and, ("|",))
+
+    def _and(self) -> tuple:
+        return self._binary(self._not, ("&",))
+
+    def _not(self) -> tuple:
+        if self._accept("~"):
+            return ("not", self._not())
+        return self._comparison()
+
+    def _comparison(self) -> tuple:
+        node = self._additive()
+        op = self._accept("==", "!=", "<", "<=", ">", ">=")
+        if op is not None:
+            node = ("bin", op, node, self._additive())
+        return node
+
+    def _additive(self) -> tuple:
+        return self._binary(self._multiplicative, ("+", "-"))
+
+    def _multiplicative(self) -> tuple:
+        return self._binary(self._unary, ("*", "/", "//", "%"))
+
+    def _unary(self) -> tuple:
+        if self._accept("-"):
+            return ("neg", self._unary())
+        if self._accept("+"):
+            return self._unary()
+        return self._power()
+
+    def _power(self) -> tuple:
+        node = self._atom()
+        if self._accept("**"):
+            # Right-associative and binds tighter than a unary minus on its left
+            node = ("bin", "**", node, self._unary())
+        return node
+
+    def _atom(self) -> tuple:
+        token = self._peek()
+        if token is None:
+            raise FormulaError(f"Unexpected end of formula '{self.text}'")
+        kind, value = token[0], token[1]
+
+        if kind == "const":
+            self.pos += 1
+            return ("const", value)
+        if kind == "col":
+            self.pos += 1
+            self.referenced.add(value)
+            return ("col", value)
+        if kind == "func":
+            self.pos += 1
+            return self._call(value)
+        if self._accept("("):
+            node = self._or()
+            self._expect(")")
+            return node
+        raise FormulaError(f"Unexpected '{value}' in formula '{self.text}'")
+
+    def _call(self, name: str) -> tuple:
+        self._expect("(")
+        args = []
+        if not self._accept(")"):
+            args.append(self._or())
+            while self._accept(","):
+                args.append(self._or())
+            self._expect(")")
+
+        if name in AGGREGATE_FUNCTIONS:
+            if len(args) != 1:
+                raise FormulaError(f"{name}() takes exactly one argument")
+            arg = args[0]
+            key = arg[1] if arg[0] == "col" else render(arg)
+            node = ("agg", AGGREGATE_FUNCTIONS[name], key, arg)
+            self.aggregates.append(AggregateCall(node))
+            return node
+        if name in SCALAR_FUNCTIONS:
+            return ("call", name, tuple(args))
+        raise FormulaError(f"Unknown function {name}() in formula '{self.text}'")
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+_compiled: "OrderedDict[Tuple[str, FrozenSet[str]], Union[CompiledFormula, FormulaError]]" = OrderedDict()
+_compiled_guard = threading.Lock()
+_COMPILED_MAX_ENTRIES = 1024
+
+
+class FormulaEngine:
+    """Compile measure and derived-column formulas once and evaluate them vectorized"""
+
+    @staticmethod
+    def compile(formula: str, columns: Iterable[str] = ()) -> CompiledFormula:
+        """Parse a formula, resolving names against the given columns
+
+        Results (and parse errors) are cached by formula text and column set, so
+        the columns are only searched for in the formula once per schema.
+        """
+        formula = formula or ""
+        key = (formula, frozenset(columns))
+
+        with _compiled_guard:
+            compiled = _compiled.get(key)
+            if compiled is not None:
+                _compiled.move_to_end(key)
+        if compiled is None:
+            candidates = tuple(sorted(c for c in key[1] if c and c in formula))
+            try:
+                compiled = _Parser(formula, candidates).parse()
+            except FormulaError as e:
+                compiled = e
+            with _compiled_guard:
+                _compiled[key] = compiled
+                while len(_compiled) > _COMPILED_MAX_ENTRIES:
+                    _compiled.popitem(last=False)
+
+        if isinstance(compiled, FormulaError):
+            # A fresh error each time, so tracebacks don't pile up on the cached one
+            raise FormulaError(*compiled.args)
+        return compiled
+
+    @staticmethod
+    def is_aggregate(formula: str, columns: Iterable[str] = ()) -> bool:
+        """Whether a formula is evaluated after grouping (contains an aggregate call)"""
+        try:
+            return FormulaEngine.compile(formula, columns).is_aggregate
+        except FormulaError:
+            upper = (formula or "").upper()
+            return any(f"{name}(" in upper for name in AGGREGATE_FUNCTIONS)
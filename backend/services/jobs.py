@@ -0,0 +1,91 @@
+import os
+import json
+from typing import Any, Dict, List
+from fastapi import HTTPException
+from database import SessionLocal
+from models.db_models import Dataset
+from models.schemas import ChartRequest, FilterCondition, ReportFormat
+from services.data_profiler import DataProfiler, ProfileBuilder
+from services.report_generator import ReportGenerator
+from utils.dataset_manager import DatasetManager
+from utils.ingest import CSVIngest
+from utils.job_queue import JobContext, job_queue
+
+
+class JobHandlers:
+    """Background job implementations, registered with the job queue by kind"""
+
+    # Share of an ingest job's progress spent parsing and writing the columnar copy
+    INGEST_CONVERT_PERCENT = 70
+
+    @staticmethod
+    def ingest_dataset(job: JobContext, dataset_id: str, user_id: str, name: str, file_path: str) -> Dict[str, Any]:
+        """Convert, index and profile an uploaded CSV, then register the dataset"""
+        def converting(fraction: float, step: str) -> None:
+            job.progress(JobHandlers.INGEST_CONVERT_PERCENT * fraction, step)
+
+        # Profiled as the chunks stream past; profile requests are then served from schema_json until the data changes
+        profile = ProfileBuilder()
+        try:
+            ingest = CSVIngest.ingest_file(file_path, converting, [profile])
+        except Exception:
+            # Don't keep sources of uploads that never become datasets
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+        columnar_path = ingest["columnar_path"]
+
+        job.progress(80, "Profiling")
+        schema_json = DataProfiler.store_profile(
+            json.dumps(DatasetManager.load_schema(columnar_path)), columnar_path, profile.result()
+        )
+
+        job.progress(95, "Saving")
+        db = SessionLocal()
+        try:
+            # A rerun after a restart may find the record already written
+            dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+            if dataset is None:
+                db.add(Dataset(id=dataset_id, user_id=user_id, name=name, file_path=file_path, schema_json=schema_json))
+            else:
+                dataset.schema_json = schema_json
+            db.commit()
+        finally:
+            db.close()
+
+        return {"dataset_id": dataset_id, "rows": ingest["rows"]}
+
+    @staticmethod
+    def generate_report(
+        job: JobContext,
+        dataset_id: str,
+        output_filename: str,
+        format: str,
+        title: str,
+        chart_configs: List[Dict[str, Any]],
+        filters: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Render a CSV or PDF report of a dashboard's dataset"""
+        db = SessionLocal()
+        try:
+            dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+            if dataset is None:
+                raise HTTPException(status_code=404, detail="Dataset not found")
+            job.progress(10, "Loading data")
+            read_path = DatasetManager.get_read_path(dataset.file_path)
+        finally:
+            db.close()
+
+        conditions = [FilterCondition(**f) for f in filters]
+        job.progress(30, "Rendering")
+        if format == ReportFormat.CSV.value:
+            file_path = ReportGenerator.generate_csv_report(read_path, output_filename, conditions)
+        else:
+            file_path = ReportGenerator.generate_pdf_report(
+                read_path, output_filename, title, [ChartRequest(**c) for c in chart_configs], conditions
+            )
+        return {"file_path": file_path, "filename": output_filename}
+
+
+job_queue.register("ingest", JobHandlers.ingest_dataset)
+job_queue.register("report", JobHandlers.generate_report)
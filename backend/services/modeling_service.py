@@ -1,5 +1,7 @@
 import pandas as pd
 from typing import List, Dict, Any
+from services.formula_engine import FormulaEngine
+from utils.type_inference import TypeInference
 
 class ModelingService:
     @staticmethod
@@ -9,25 +11,15 @@ class ModelingService:
             name = measure.get("name")
             formula = measure.get("formula")
             
-            # Simple check if it's an aggregate measure (has SUM, AVG, COUNT, etc.)
-            # Aggregate measures are evaluated AFTER grouping in the QueryEngine
-            is_aggregate = any(agg in formula.upper() for agg in ["SUM(", "AVG(", "COUNT(", "MIN(", "MAX("])
-            
-            if is_aggregate:
-                continue
-
             try:
-                # Proactively backtick known columns in the expression for robust evaluation
-                safe_expr = formula
-                sorted_cols = sorted(df.columns.tolist(), key=len, reverse=True)
-                for col in sorted_cols:
-                    if col in safe_expr and not f"`{col}`" in safe_expr:
-                        # If name has spaces or special chars, backtick it
-                        if any(c in col for c in " %-+*/()"):
-                             safe_expr = safe_expr.replace(col, f"`{col}`")
+                compiled = FormulaEngine.compile(formula, df.columns)
+                
+                # Aggregate measures (SUM, AVG, COUNT, ...) are evaluated AFTER grouping in the QueryEngine
+                if compiled.is_aggregate:
+                    continue
                 
-                # df.eval for row-level cross-column arithmetic
-                df[name] = df.eval(safe_expr)
+                # Vectorized row-level cross-column arithmetic
+                df[name] = compiled.evaluate(df)
             except Exception as e:
                 print(f"Error calculating row-level measure {name}: {e}")
                 
@@ -38,7 +30,7 @@ class ModelingService:
         """Add basic time intelligence columns if a date column is present"""
         if date_col in df.columns:
             try:
-                dt = pd.to_datetime(df[date_col], errors='coerce')
+                dt = TypeInference.to_datetime(df[date_col])
                 df[f"{date_col}_Year"] = dt.dt.year
                 df[f"{date_col}_Month"] = dt.dt.month_name()
                 df[f"{date_col}_Quarter"] = dt.dt.quarter.map(lambda x: f"Q{x}")
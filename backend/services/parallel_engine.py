@@ -0,0 +1,200 @@
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from config import settings
+from models.schemas import QueryRequest, FilterCondition, AggregationRequest
+from utils.validators import apply_filters, compile_filter_mask
+from services.partial_aggregates import PartialAggregator
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_guard = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_guard:
+        if _executor is None:
+            # spawn: forking a multi-threaded server process can deadlock the children
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.QUERY_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _reset_executor() -> None:
+    global _executor
+    with _executor_guard:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+class PartitionError(Exception):
+    """An HTTPException raised in a worker, in a form that survives pickling back to the parent"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open a block created by the parent; the parent stays responsible for unlinking it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Spawned workers share the parent's resource tracker, so registering again is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+def _aggregate_partition(
+    layout: Dict[str, Dict[str, Any]],
+    start: int,
+    stop: int,
+    group_by: List[str],
+    aggregations: List[AggregationRequest],
+    filters: List[FilterCondition]
+) -> PartialAggregator:
+    """Worker task: filter and partially aggregate rows [start, stop) of a shared frame"""
+    data = {}
+    for column, meta in layout.items():
+        block = _attach(meta["shm"])
+        try:
+            values = np.ndarray((meta["length"],), dtype=meta["dtype"], buffer=block.buf)[start:stop].copy()
+        finally:
+            block.close()
+        if meta["kind"] == "array":
+            data[column] = values
+        else:
+            restored = pd.Series(pd.Categorical.from_codes(values, dtype=meta["categorical"]))
+            data[column] = restored if meta["kind"] == "categorical" else restored.astype(meta["dtype_original"])
+
+    df = pd.DataFrame(data)
+    try:
+        if filters:
+            df = apply_filters(df, filters)
+        aggregator = PartialAggregator(group_by, aggregations)
+        aggregator.update(df)
+    except HTTPException as e:
+        # HTTPException can't be unpickled in the parent; a failed unpickle breaks the whole pool
+        raise PartitionError(e.status_code, e.detail)
+    return aggregator
+
+
+class ParallelQueryEngine:
+    """Partitioned multi-core execution of filter + aggregate queries
+
+    The needed columns of a prepared frame are copied once into shared memory
+    (text columns as dictionary codes), each worker process filters and
+    partially aggregates one row range, and the partial aggregates are merged.
+    """
+
+    @staticmethod
+    def should_partition(df: pd.DataFrame, query: QueryRequest) -> bool:
+        """Whether a query on this frame is big enough to be worth the process pool"""
+        return (
+            settings.QUERY_WORKERS > 1
+            and bool(query.aggregations)
+            and not query.is_histogram
+            and len(df) >= settings.PARALLEL_MIN_ROWS
+            # Exact medians need all values of a group in one place
+            and not any(agg.function.value == "median" for agg in query.aggregations)
+        )
+
+    @staticmethod
+    def aggregate(
+        df: pd.DataFrame,
+        group_by: Optional[List[str]],
+        aggregations: List[AggregationRequest],
+        filters: List[FilterCondition] = None
+    ) -> pd.DataFrame:
+        """Filter and aggregate a frame across the worker pool
+
+        Returns the aggregates indexed by the group keys, like PartialAggregator.result().
+        """
+        filters = filters or []
+        # Reject bad filters (unknown columns, mistyped values) here, before any work reaches the pool
+        if filters:
+            compile_filter_mask(df.head(1), filters)
+        columns = set(group_by or []) | {a.column for a in aggregations} | {f.column for f in filters}
+        columns = [c for c in df.columns if c in columns]
+
+        bounds = np.linspace(0, len(df), settings.QUERY_WORKERS + 1).astype(int)
+
+        blocks, layout = ParallelQueryEngine._share_columns(df, columns)
+        try:
+            try:
+                executor = _get_executor()
+                futures = [
+                    executor.submit(
+                        _aggregate_partition, layout, int(start), int(stop), group_by, aggregations, filters
+                    )
+                    for start, stop in zip(bounds[:-1], bounds[1:])
+                ]
+                partials = [future.result() for future in futures]
+            except PartitionError as e:
+                raise HTTPException(status_code=e.status_code, detail=e.detail)
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory); rebuild the pool next time and finish here
+                print(f"Warning: query worker pool failed, running serially: {e}")
+                _reset_executor()
+                partials = [
+                    _aggregate_partition(layout, int(start), int(stop), group_by, aggregations, filters)
+                    for start, stop in zip(bounds[:-1], bounds[1:])
+                ]
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+        merged = partials[0]
+        for partial in partials[1:]:
+            merged.merge(partial)
+        return merged.result()
+
+    @staticmethod
+    def _share_columns(
+        df: pd.DataFrame,
+        columns: List[str]
+    ) -> Tuple[List[shared_memory.SharedMemory], Dict[str, Dict[str, Any]]]:
+        """Copy columns into shared memory blocks, returning the blocks and their layout"""
+        blocks = []
+        layout = {}
+        try:
+            for column in columns:
+                series = df[column]
+                meta: Dict[str, Any] = {"length": len(series)}
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    values = series.cat.codes.to_numpy()
+                    meta.update(kind="categorical", categorical=series.dtype)
+                elif isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufmM":
+                    values = series.to_numpy()
+                    meta.update(kind="array")
+                else:
+                    # Text and other object columns travel as codes plus their distinct values
+                    codes, uniques = pd.factorize(series)
+                    values = codes
+                    meta.update(
+                        kind="factorized",
+                        categorical=pd.CategoricalDtype(uniques),
+                        dtype_original=series.dtype
+                    )
+
+                block = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+                blocks.append(block)
+                np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+                meta.update(shm=block.name, dtype=values.dtype.str)
+                layout[column] = meta
+        except Exception:
+            for block in blocks:
+                block.close()
+                block.unlink()
+            raise
+        return blocks, layout
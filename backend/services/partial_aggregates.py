@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Optional, Hashable
+from utils.sketches import QuantileSketch
+
+# Partial statistics each aggregation function is rebuilt from
+STAT_DEPENDENCIES = {
+    "sum": ("sum",),
+    "count": ("count",),
+    "avg": ("sum", "count"),
+    "min": ("min",),
+    "max": ("max",),
+    "std": ("count", "mean", "m2"),
+    "median": ("count",)  # The values themselves go into a per-group QuantileSketch
+}
+
+# Group key used for aggregations without group_by
+_GLOBAL_KEY = "__all__"
+
+class PartialAggregator:
+    """Mergeable partial aggregates for SUM/COUNT/MIN/MAX/AVG/STD/MEDIAN
+
+    Feed it chunks of rows with `update` (or combine aggregators built on other
+    chunks with `merge`) and read the final grouped frame with `result`. Means
+    are kept as sum/count, standard deviations as Welford count/mean/M2 combined
+    with Chan's formula, and medians as quantile sketches.
+    """
+
+    def __init__(self, group_by: Optional[List[str]], aggregations: List[Any]):
+        self.group_by = list(group_by or [])
+        self.aggregations = list(aggregations)
+        self.stats: Dict[str, List[str]] = {}
+        self.medians: List[str] = []
+        for agg in self.aggregations:
+            function = agg.function.value
+            column_stats = self.stats.setdefault(agg.column, [])
+            for stat in STAT_DEPENDENCIES.get(function, ("sum",)):
+                if stat not in column_stats:
+                    column_stats.append(stat)
+            if function == "median" and agg.column not in self.medians:
+                self.medians.append(agg.column)
+        self.states: Dict[str, pd.DataFrame] = {}
+        self.sketches: Dict[str, Dict[Hashable, QuantileSketch]] = {column: {} for column in self.medians}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Aggregate one chunk of rows and merge it into the running state"""
+        keys = self.group_by or [_GLOBAL_KEY]
+        if not self.group_by:
+            chunk = chunk.assign(**{_GLOBAL_KEY: 0})
+        missing = [col for col in keys if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"Columns not found: {', '.join(missing)}")
+
+        grouped = chunk.groupby(keys, observed=True, sort=False)
+        for column, stats in self.stats.items():
+            if column not in chunk.columns:
+                continue
+            g = grouped[column]
+            partial = {}
+            if "count" in stats:
+                partial["count"] = g.count()
+            if "sum" in stats:
+                partial["sum"] = g.sum()
+            if "min" in stats:
+                partial["min"] = g.min()
+            if "max" in stats:
+                partial["max"] = g.max()
+            if "mean" in stats:
+                partial["mean"] = g.mean()
+                partial["m2"] = g.var(ddof=0) * partial["count"]
+            self._merge_state(column, pd.DataFrame(partial))
+
+        if self.medians:
+            positions = grouped.indices
+            for column in self.medians:
+                if column not in chunk.columns:
+                    continue
+                values = chunk[column].to_numpy(dtype=float, na_value=np.nan)
+                sketches = self.sketches[column]
+                for key, rows in positions.items():
+                    sketches.setdefault(key, QuantileSketch()).add(values[rows])
+
+    def merge(self, other: "PartialAggregator") -> None:
+        """Fold the state of an aggregator built from other rows into this one"""
+        for column, state in other.states.items():
+            self._merge_state(column, state)
+        for column, sketches in other.sketches.items():
+            own = self.sketches.setdefault(column, {})
+            for key, sketch in sketches.items():
+                if key in own:
+                    own[key].merge(sketch)
+                else:
+                    own[key] = sketch
+
+    def estimated_columns(self) -> List[str]:
+        """Result columns that are estimates: medians of a group with more values than its sketch keeps"""
+        return [
+            f"{column}_median" for column in self.medians
+            if not all(sketch.exact for sketch in self.sketches[column].values())
+        ]
+
+    def result(self) -> pd.DataFrame:
+        """Final aggregates, indexed by the group keys, with f"{column}_{function}" columns"""
+        index = None
+        for state in self.states.values():
+            index = state.index if index is None else index.union(state.index, sort=False)
+        if not self.group_by:
+            # Global aggregations always produce exactly one row
+            index = pd.Index([0], name=_GLOBAL_KEY)
+        elif index is None:
+            index = pd.MultiIndex.from_arrays([[]] * len(self.group_by), names=self.group_by) \
+                if len(self.group_by) > 1 else pd.Index([], name=self.group_by[0])
+        else:
+            # Same group order as an in-memory groupby
+            index = index.sort_values()
+
+        result = pd.DataFrame(index=index)
+        for agg in self.aggregations:
+            column = agg.column
+            function = agg.function.value
+            name = f"{column}_{function}"
+            if name in result.columns or column not in self.states:
+                # Like the in-memory path, aggregations of missing columns are skipped
+                continue
+
+            state = self.states[column].reindex(index)
+            if function == "sum":
+                result[name] = state["sum"].fillna(0)
+            elif function == "count":
+                result[name] = state["count"].fillna(0).astype("int64")
+            elif function == "avg":
+                result[name] = state["sum"] / state["count"].where(state["count"] > 0)
+            elif function == "min":
+                result[name] = state["min"]
+            elif function == "max":
+                result[name] = state["max"]
+            elif function == "std":
+                count = state["count"]
+                result[name] = np.sqrt(state["m2"] / (count - 1).where(count > 1))
+            elif function == "median":
+                sketches = self.sketches.get(column, {})
+                result[name] = [
+                    sketch.quantile(0.5) if (sketch := sketches.get(key)) is not None else np.nan
+                    for key in index
+                ]
+        return result
+
+    def _merge_state(self, column: str, partial: pd.DataFrame) -> None:
+        state = self.states.get(column)
+        if state is None:
+            self.states[column] = partial
+            return
+
+        a, b = state.align(partial, join="outer")
+        merged = pd.DataFrame(index=a.index)
+        if "count" in a:
+            n_a, n_b = a["count"].fillna(0), b["count"].fillna(0)
+            merged["count"] = n_a + n_b
+        if "sum" in a:
+            merged["sum"] = a["sum"].fillna(0) + b["sum"].fillna(0)
+        if "min" in a:
+            merged["min"] = a["min"].where((a["min"] <= b["min"]) | b["min"].isna(), b["min"])
+        if "max" in a:
+            merged["max"] = a["max"].where((a["max"] >= b["max"]) | b["max"].isna(), b["max"])
+        if "mean" in a:
+            # Chan et al. pairwise combination of Welford (count, mean, M2) states
+            n = n_a + n_b
+            mean_a, mean_b = a["mean"].fillna(0), b["mean"].fillna(0)
+            delta = mean_b - mean_a
+            share_b = (n_b / n.where(n > 0)).fillna(0)
+            merged["mean"] = (mean_a + delta * share_b).where(n > 0)
+            merged["m2"] = a["m2"].fillna(0) + b["m2"].fillna(0) + delta ** 2 * n_a * share_b
+        
+        # Outer alignment turns integer columns into floats; restore them where nothing is missing
+        for stat in ("count", "sum", "min", "max"):
+            if stat in merged and pd.api.types.is_integer_dtype(state[stat]) \
+                    and pd.api.types.is_integer_dtype(partial[stat]) and merged[stat].notna().all():
+                merged[stat] = merged[stat].astype(state[stat].dtype)
+        self.states[column] = merged
@@ -1,15 +1,176 @@
 import pandas as pd
-from typing import List, Dict, Any, Set
-import re
-from models.schemas import QueryRequest, AggregationType, FilterCondition, AggregationRequest
-from utils.validators import apply_filters, validate_columns
+from typing import List, Dict, Any, Set, Optional, Tuple
+import sys
+import hashlib
+import threading
+import weakref
+from config import settings
+from fastapi import HTTPException
+from models.schemas import QueryRequest, BatchQueryRequest, AggregationType, FilterCondition, AggregationRequest
+from utils.validators import apply_filters, apply_index_filters, validate_columns
+from utils.dataset_manager import DatasetManager
+from utils.cache import LRUCache
+from utils.column_index import ColumnIndex
 from services.transformation_service import TransformationService
 from services.modeling_service import ModelingService
+from services.dependency_resolver import DependencyResolver
+from services.formula_engine import FormulaEngine, FormulaError, MeasurePlan
+from services.partial_aggregates import PartialAggregator
+from services.parallel_engine import ParallelQueryEngine
+from services.approximate_engine import ApproximateQueryEngine
+from services.rollup_service import RollupService, cube_cache
 import json
 
+# Datasets with their saved transformations and row-level measures already applied,
+# keyed by (dataset id, file version, pipeline version)
+prepared_cache = LRUCache(settings.PREPARED_CACHE_MAX_BYTES)
+# Dropped once no preparation of the dataset holds or waits for them
+_prepare_locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+_prepare_locks_guard = threading.Lock()
+
+def _estimate_result_size(result: Dict[str, Any]) -> int:
+    """Rough size of a query result dict (rows x columns of boxed Python values)"""
+    return sys.getsizeof(result["data"]) + result["total_rows"] * (len(result["columns"]) + 1) * 100
+
+# Finished query results, keyed by (dataset id, request fingerprint)
+result_cache = LRUCache(
+    settings.QUERY_CACHE_MAX_BYTES,
+    sizeof=_estimate_result_size,
+    ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS,
+    max_entries=settings.QUERY_CACHE_MAX_ENTRIES
+)
+
+# Data-prep preview checkpoints: the full frame after each prefix of (unsaved) transformation
+# steps, keyed by (dataset id, file version, hash of the steps so far)
+preview_cache = LRUCache(settings.PREVIEW_CACHE_MAX_BYTES)
+
 class QueryEngine:
     """Service for executing queries on CSV datasets"""
     
+    @staticmethod
+    def prepare_dataset(
+        file_path: str,
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None,
+        columns: Optional[Set[str]] = None
+    ) -> pd.DataFrame:
+        """Load a dataset with its saved pipeline applied, materialized once per pipeline version
+        
+        If `columns` is given only those prepared columns are guaranteed; the
+        input columns and pipeline steps they don't depend on are skipped.
+        """
+        available = DatasetManager.get_columns(file_path)
+        input_columns, steps, row_measures = DependencyResolver.resolve_pipeline(
+            available, columns, transformations, measures
+        )
+        
+        if not transformations and not measures:
+            return DatasetManager.load_dataframe(file_path, columns=input_columns)
+        
+        dataset_key = DatasetManager.get_dataset_key(file_path)
+        version = (
+            dataset_key,
+            *DatasetManager.get_file_version(file_path),
+            DatasetManager.get_pipeline_version(transformations, measures)
+        )
+        columns_key = frozenset(columns) if columns is not None else None
+        
+        def covers(key) -> bool:
+            # A frame materialized for a wider column set serves narrower queries too
+            return key[:-1] == version and (key[-1] is None or (columns_key is not None and columns_key <= key[-1]))
+        
+        with _prepare_locks_guard:
+            lock = _prepare_locks.setdefault(dataset_key, threading.Lock())
+        
+        with lock:
+            prepared = prepared_cache.find(covers)
+            if prepared is None:
+                df = DatasetManager.load_dataframe(file_path, columns=input_columns)
+                
+                # Apply data transformations (Data Prep)
+                if steps:
+                    df = TransformationService.apply_transformations(df, steps)
+                
+                # Apply row-level measures (Data Modeling)
+                if row_measures:
+                    df = ModelingService.apply_measures(df, row_measures)
+                
+                # Older file or pipeline versions of this dataset are never read again
+                prepared_cache.invalidate(lambda key: key[0] == dataset_key and key[:-1] != version)
+                prepared_cache.put((*version, columns_key), df)
+                prepared = df
+        
+        return prepared.copy(deep=False)
+    
+    @staticmethod
+    def invalidate_dataset(dataset_id: str) -> None:
+        """Drop materialized pipelines and cached results of a dataset, e.g. after its steps or measures are saved"""
+        prepared_cache.invalidate(lambda key: key[0] == str(dataset_id))
+        result_cache.invalidate(lambda key: key[0] == str(dataset_id))
+        preview_cache.invalidate(lambda key: key[0] == str(dataset_id))
+        RollupService.invalidate(dataset_id)
+    
+    @staticmethod
+    def get_cache_stats() -> Dict[str, Any]:
+        """Hit/miss/eviction counters of the query caches"""
+        return {
+            "prepared": prepared_cache.stats(),
+            "results": result_cache.stats(),
+            "previews": preview_cache.stats(),
+            "rollups": cube_cache.stats()
+        }
+    
+    @staticmethod
+    def query_fingerprint(
+        file_path: str,
+        query: QueryRequest,
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> str:
+        """Canonical hash of a query against one version of a dataset and its pipeline"""
+        payload = query.dict()
+        
+        # Filters are ANDed, so their order (and the order of IN values) doesn't matter.
+        # group_by, aggregations and sort_by order shape the result and are kept.
+        def canonical_value(value):
+            if isinstance(value, list) and value and all(isinstance(v, (str, int, float)) for v in value):
+                return sorted(value, key=lambda v: (str(type(v)), v))
+            return value
+        
+        payload["filters"] = sorted(
+            (
+                {**f, "value": canonical_value(f["value"]) if f["operator"] == "in" else f["value"]}
+                for f in payload.get("filters") or []
+            ),
+            key=lambda f: json.dumps(f, sort_keys=True, default=str)
+        )
+        payload["file_version"] = DatasetManager.get_file_version(file_path)
+        payload["pipeline_version"] = DatasetManager.get_pipeline_version(transformations, measures)
+        
+        encoded = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def execute_cached_query(
+        file_path: str,
+        query: QueryRequest,
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Execute a query through the result cache, returning (result, cache_hit)"""
+        cache_key = (
+            DatasetManager.get_dataset_key(file_path),
+            QueryEngine.query_fingerprint(file_path, query, transformations, measures)
+        )
+        
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached, True
+        
+        result = QueryEngine.execute_query(file_path, query, transformations, measures)
+        result_cache.put(cache_key, result)
+        return result, False
+    
     @staticmethod
     def execute_query(
         file_path: str,
@@ -18,28 +179,315 @@ class QueryEngine:
         measures: List[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Execute a query on a dataset"""
-        # Load data
-        df = pd.read_csv(file_path)
+        return QueryEngine.to_response(QueryEngine.execute_query_frame(file_path, query, transformations, measures))
+    
+    @staticmethod
+    def execute_query_frame(
+        file_path: str,
+        query: QueryRequest,
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        """Execute a query on a dataset, returning the result frame"""
+        query = query.copy(update={"filters": DatasetManager.parse_filter_values(file_path, query.filters)})
+        
+        # Exploratory aggregations can opt into estimates from the stored sample; MIN/MAX/MEDIAN/STD
+        # of a sample are biased, not estimates, so queries with them always run exactly
+        if query.approximate and query.aggregations and not query.is_histogram \
+                and ApproximateQueryEngine.supports(query.aggregations):
+            return QueryEngine.execute_approximate(file_path, query, transformations, measures)
+        
+        # Load only the columns the query depends on, with the saved Data Prep
+        # steps and row-level measures applied
+        available = DatasetManager.get_columns(file_path)
+        columns = DependencyResolver.query_columns(available, query, transformations, measures)
+        
+        # Aggregations over inputs too large to hold in memory are streamed in chunks
+        if query.aggregations and not query.is_histogram:
+            input_columns, _, _ = DependencyResolver.resolve_pipeline(available, columns, transformations, measures)
+            if DatasetManager.estimate_frame_bytes(file_path, input_columns) > settings.STREAMING_THRESHOLD_BYTES:
+                return QueryEngine.execute_streaming(file_path, query, transformations, measures)
+        
+        df = QueryEngine.prepare_dataset(file_path, transformations, measures, columns=columns)
         
-        # Apply data transformations (Data Prep)
+        # Frequent group-by shapes are answered from a pre-aggregated cube
+        result = QueryEngine.run_rollup(file_path, df, query, transformations, measures)
+        if result is not None:
+            return result
+        
+        index, index_columns = QueryEngine.get_filter_index(file_path, transformations, measures)
+        return QueryEngine.run_query(df, query, measures, index=index, index_columns=index_columns)
+    
+    @staticmethod
+    def run_rollup(
+        file_path: str,
+        df: pd.DataFrame,
+        query: QueryRequest,
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> Optional[pd.DataFrame]:
+        """Answer a query from a rollup cube of the prepared, unfiltered frame, or None if none applies"""
+        agg_measures, measure_plan, combined_aggs = QueryEngine._plan_aggregations(df, query, measures)
+        version = (
+            DatasetManager.get_dataset_key(file_path),
+            *DatasetManager.get_file_version(file_path),
+            DatasetManager.get_pipeline_version(transformations, measures)
+        )
+        grouped = RollupService.answer(version, query, combined_aggs, base=df)
+        if grouped is None:
+            return None
+        
+        if query.group_by:
+            df = QueryEngine._format_grouped(grouped, query.group_by, combined_aggs)
+        else:
+            df = grouped.reset_index(drop=True)
+        return QueryEngine._finalize_frame(df, query, agg_measures, measure_plan)
+    
+    @staticmethod
+    def execute_streaming(
+        file_path: str,
+        query: QueryRequest,
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        """Execute an aggregation query out of core
+        
+        The file is read in chunks; each chunk goes through the saved pipeline and
+        the filters and is reduced to mergeable partial aggregates, so memory use
+        is bounded by the chunk size and the number of groups. Medians of large
+        groups are sketch estimates, listed in `attrs["metadata"]["estimated"]`.
+        """
+        available = DatasetManager.get_columns(file_path)
+        columns = DependencyResolver.query_columns(available, query, transformations, measures)
+        input_columns, steps, row_measures = DependencyResolver.resolve_pipeline(
+            available, columns, transformations, measures
+        )
+        
+        aggregator = None
+        for chunk in DatasetManager.iter_chunks(file_path, input_columns):
+            # Every pipeline step is row-local, so it can run chunk by chunk
+            if steps:
+                chunk = TransformationService.apply_transformations(chunk, steps)
+            if row_measures:
+                chunk = ModelingService.apply_measures(chunk, row_measures)
+            if query.filters:
+                chunk = apply_filters(chunk, query.filters)
+            
+            agg_measures, measure_plan, combined_aggs = QueryEngine._plan_aggregations(chunk, query, measures)
+            if aggregator is None:
+                if query.group_by:
+                    validate_columns(chunk, query.group_by)
+                aggregator = PartialAggregator(query.group_by, combined_aggs)
+            aggregator.update(chunk)
+        
+        grouped = aggregator.result()
+        if query.group_by:
+            df = QueryEngine._format_grouped(grouped, query.group_by, combined_aggs)
+        else:
+            df = grouped.reset_index(drop=True)
+        df = QueryEngine._finalize_frame(df, query, agg_measures, measure_plan)
+        
+        # Medians come from quantile sketches; flag them, and measures built on them, once a sketch compressed
+        estimated = aggregator.estimated_columns()
+        estimated += [
+            name for name, compiled in measure_plan.measures
+            if any(call.result_column in estimated for call in compiled.aggregates)
+        ]
+        estimated = [name for name in estimated if name in df.columns]
+        if estimated:
+            df.attrs["metadata"] = {"approximate": True, "estimated": estimated}
+        return df
+    
+    @staticmethod
+    def execute_approximate(
+        file_path: str,
+        query: QueryRequest,
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        """Estimate an aggregation query from the dataset's stored sample
+        
+        The frame's `attrs["metadata"]` carries the sample size and confidence
+        intervals of the SUM/COUNT/AVG estimates.
+        """
+        df, population_rows = DatasetManager.load_sample(file_path)
+        sample_rows = len(df)
+        
+        # The sample is small, so the saved pipeline runs on it directly
         if transformations:
             df = TransformationService.apply_transformations(df, transformations)
-            
-        # Apply row-level measures (Data Modeling)
         if measures:
             df = ModelingService.apply_measures(df, measures)
-            
-        # Apply filters
         if query.filters:
             df = apply_filters(df, query.filters)
+        if query.group_by:
+            validate_columns(df, query.group_by)
+        
+        agg_measures, measure_plan, combined_aggs = QueryEngine._plan_aggregations(df, query, measures)
+        estimates, bounds, metadata = ApproximateQueryEngine.estimate(
+            df, query, combined_aggs, population_rows, sample_rows
+        )
+        if query.group_by:
+            df = QueryEngine._format_grouped(estimates, query.group_by, combined_aggs)
+        else:
+            df = estimates.reset_index(drop=True)
+        
+        df = QueryEngine._finalize_frame(df, query, agg_measures, measure_plan)
+        metadata["intervals"] = ApproximateQueryEngine.format_intervals(bounds, query.group_by, df)
+        df.attrs["metadata"] = metadata
+        return df
+    
+    @staticmethod
+    def get_filter_index(
+        file_path: str,
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> Tuple[Optional[ColumnIndex], Optional[Set[str]]]:
+        """Get the stored column indexes and the prepared columns they are still valid for"""
+        index = ColumnIndex.load(file_path)
+        if index is None:
+            return None, None
+        
+        aligned = DependencyResolver.row_aligned_columns(
+            DatasetManager.get_columns(file_path), transformations, measures
+        )
+        if not aligned:
+            return None, None
+        return index, aligned
+    
+    @staticmethod
+    def execute_batch(
+        file_path: str,
+        batch: BatchQueryRequest,
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Execute all dashboard tiles against one prepared and pre-filtered frame"""
+        results = {}
+        errors = {}
+        pending = []
+        shared_filters = DatasetManager.parse_filter_values(file_path, batch.filters)
+        
+        # Each tile is cached as if it had been sent on its own with the dashboard filters,
+        # so batch and single-tile requests share cache entries
+        for item in batch.queries:
+            combined = item.query.copy(update={"filters": (batch.filters or []) + (item.query.filters or [])})
+            cache_key = (
+                DatasetManager.get_dataset_key(file_path),
+                QueryEngine.query_fingerprint(file_path, combined, transformations, measures)
+            )
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                results[item.tile_id] = cached
+            else:
+                # Filter values are parsed after fingerprinting, so the key matches a single-tile request
+                query = item.query.copy(update={"filters": DatasetManager.parse_filter_values(file_path, item.query.filters)})
+                combined = query.copy(update={"filters": shared_filters + query.filters})
+                pending.append((item, query, combined, cache_key))
+        
+        if pending:
+            # Load and prepare the union of the columns all remaining tiles need
+            available = DatasetManager.get_columns(file_path)
+            columns = set(f.column for f in shared_filters)
+            for _, query, _, _ in pending:
+                tile_columns = DependencyResolver.query_columns(available, query, transformations, measures)
+                if tile_columns is None:
+                    columns = None
+                    break
+                columns |= tile_columns
+            
+            df = QueryEngine.prepare_dataset(file_path, transformations, measures, columns=columns)
+            prepared = df
+            
+            # Dashboard-level filters are applied once for every tile
+            if shared_filters:
+                index, index_columns = QueryEngine.get_filter_index(file_path, transformations, measures)
+                df = apply_filters(df, shared_filters, index=index, index_columns=index_columns)
+            
+            for item, query, combined, cache_key in pending:
+                try:
+                    # Tiles may add helper columns, so each gets its own shallow copy
+                    result = QueryEngine.run_rollup(
+                        file_path, prepared.copy(deep=False), combined, transformations, measures
+                    )
+                    if result is None:
+                        result = QueryEngine.run_query(df.copy(deep=False), query, measures)
+                    result = QueryEngine.to_response(result)
+                    result_cache.put(cache_key, result)
+                    results[item.tile_id] = result
+                except HTTPException as e:
+                    errors[item.tile_id] = str(e.detail)
+                except Exception as e:
+                    errors[item.tile_id] = str(e)
+        
+        return {"results": results, "errors": errors}
+    
+    @staticmethod
+    def run_query(
+        df: pd.DataFrame,
+        query: QueryRequest,
+        measures: List[Dict[str, Any]] = None,
+        index: Optional[ColumnIndex] = None,
+        index_columns: Optional[Set[str]] = None
+    ) -> pd.DataFrame:
+        """Filter, group and aggregate an already prepared frame, returning the result frame"""
+        # Resolve filters from the stored column indexes where possible
+        remaining_filters = query.filters or []
+        if remaining_filters:
+            df, remaining_filters = apply_index_filters(df, remaining_filters, index, index_columns)
+        
+        # Large aggregations scan the remaining filters in the worker pool instead
+        partitioned = ParallelQueryEngine.should_partition(df, query)
+        if remaining_filters and not partitioned:
+            df = apply_filters(df, remaining_filters)
 
+        agg_measures, measure_plan, combined_aggs = QueryEngine._plan_aggregations(df, query, measures)
+        
+        if partitioned and combined_aggs:
+            if query.group_by:
+                validate_columns(df, query.group_by)
+            grouped = ParallelQueryEngine.aggregate(df, query.group_by, combined_aggs, remaining_filters)
+            if query.group_by:
+                df = QueryEngine._format_grouped(grouped, query.group_by, combined_aggs)
+            else:
+                df = grouped.reset_index(drop=True)
+            return QueryEngine._finalize_frame(df, query, agg_measures, measure_plan)
+
+        # Apply histogram binning if requested
+        if query.is_histogram and combined_aggs:
+            col = combined_aggs[0].column
+            if col in df.columns:
+                bins = query.histogram_bins or 10
+                counts = df[col].value_counts(bins=bins, sort=False).reset_index()
+                counts.columns = [col, f"{col}_count"]
+                counts[col] = counts[col].astype(str)
+                return counts
+        
+        # Apply grouping and aggregations
+        if query.group_by and combined_aggs:
+            df = QueryEngine._apply_aggregations(df, query.group_by, combined_aggs)
+        elif combined_aggs:
+            df = QueryEngine._apply_global_aggregations(df, combined_aggs)
+        
+        return QueryEngine._finalize_frame(df, query, agg_measures, measure_plan)
+    
+    @staticmethod
+    def _plan_aggregations(
+        df: pd.DataFrame,
+        query: QueryRequest,
+        measures: List[Dict[str, Any]] = None
+    ) -> Tuple[List[Dict[str, Any]], MeasurePlan, List[AggregationRequest]]:
+        """Work out the raw aggregations a query needs, including those inside aggregate measures
+        
+        Row-level expressions inside aggregate measures (e.g. SUM(Price * Qty)) are
+        added to `df` as columns. Returns (aggregate measures, the plan for the
+        requested ones, aggregations to compute).
+        """
         # Handle aggregate measures logic
         agg_measures = []
         if measures:
             for m in measures:
-                formula = m.get("formula", "")
-                is_aggregate = any(agg in formula.upper() for agg in ["SUM(", "AVG(", "COUNT(", "MIN(", "MAX("])
-                if is_aggregate:
+                if FormulaEngine.is_aggregate(m.get("formula", ""), df.columns):
                     agg_measures.append(m)
 
         # If any requested aggregation is actually a measure, or we have aggregate measures to evaluate
@@ -49,36 +497,22 @@ class QueryEngine:
         requested_measure_names = [agg.column for agg in query.aggregations if any(m["name"] == agg.column for m in agg_measures)]
         active_agg_measures = [m for m in agg_measures if m["name"] in requested_measure_names]
         
-        # 2. Extract dependencies for active aggregate measures
-        # e.g. "SUM(Sales) / SUM(Qty)" or "SUM(Unit Price * Qty)"
-        internal_aggs = []
-        if active_agg_measures:
-             for m in active_agg_measures:
-                 # Improved regex to handle spaces and operators inside ()
-                 deps = re.findall(r'(\w+)\(([^)]+)\)', m["formula"])
-                 for func, col_expr in deps:
-                     func_lower = func.lower()
-                     if func_lower == "mean": func_lower = "avg"
-                     
-                     # If col_expr is an expression (e.g. "A * B"), eval it row-level first
-                     target_col = col_expr
-                     if col_expr not in df.columns:
-                         try:
-                             # Proactively backtick known columns in the expression
-                             safe_expr = col_expr
-                             # Sort columns by length descending to avoid partial replacement (e.g. "Total" vs "Total Sales")
-                             sorted_cols = sorted(df.columns.tolist(), key=len, reverse=True)
-                             for col in sorted_cols:
-                                 if col in safe_expr and not f"`{col}`" in safe_expr:
-                                     # Simple replacement with backticks for col names with spaces or special chars
-                                     if any(c in col for c in " %-+*/()"):
-                                         safe_expr = safe_expr.replace(col, f"`{col}`")
-                             
-                             df[col_expr] = df.eval(safe_expr)
-                         except Exception as e:
-                             print(f"Warning: could not pre-evaluate row-level expression '{col_expr}': {e}")
-                     
-                     internal_aggs.append(AggregationRequest(column=col_expr, function=AggregationType(func_lower)))
+        # 2. Plan the active aggregate measures together, e.g. "SUM(Price * Qty) / SUM(Qty)" and
+        # "SUM(Price * Qty) - SUM(Cost)": shared aggregate calls are computed once, and each
+        # distinct row-level argument becomes a single column
+        compiled_measures = []
+        for m in active_agg_measures:
+            try:
+                compiled_measures.append((m["name"], FormulaEngine.compile(m["formula"], df.columns)))
+            except FormulaError as e:
+                print(f"Warning: could not parse aggregate measure '{m['name']}': {e}")
+        measure_plan = MeasurePlan(compiled_measures)
+        measure_plan.materialize_inputs(df)
+        
+        internal_aggs = [
+            AggregationRequest(column=call.key, function=AggregationType(call.function))
+            for call in measure_plan.calls
+        ]
 
         # 3. Build the full list of aggregations (User requested + internal dependencies)
         # Filter out the measures themselves from the first pass of aggregation
@@ -90,31 +524,21 @@ class QueryEngine:
             if not any(ba.column == ia.column and ba.function == ia.function for ba in combined_aggs):
                 combined_aggs.append(ia)
 
-        # Apply histogram binning if requested
-        if query.is_histogram and combined_aggs:
-            col = combined_aggs[0].column
-            if col in df.columns:
-                bins = query.histogram_bins or 10
-                counts = df[col].value_counts(bins=bins, sort=False).reset_index()
-                counts.columns = [col, f"{col}_count"]
-                counts[col] = counts[col].astype(str)
-                return {
-                    "data": counts.to_dict(orient="records"),
-                    "total_rows": len(counts),
-                    "columns": counts.columns.tolist()
-                }
-        
-        # Apply grouping and aggregations
-        if query.group_by and combined_aggs:
-            df = QueryEngine._apply_aggregations(df, query.group_by, combined_aggs)
-        elif combined_aggs:
-            df = QueryEngine._apply_global_aggregations(df, combined_aggs)
-        
-        # 4. Evaluate Aggregate Measures on the result
-        if active_agg_measures:
-            df = QueryEngine._evaluate_aggregate_measures(df, active_agg_measures)
+        return agg_measures, measure_plan, combined_aggs
+    
+    @staticmethod
+    def _finalize_frame(
+        df: pd.DataFrame,
+        query: QueryRequest,
+        agg_measures: List[Dict[str, Any]],
+        measure_plan: MeasurePlan
+    ) -> pd.DataFrame:
+        """Evaluate aggregate measures on an aggregated frame, then project, sort and limit it"""
+        # Evaluate Aggregate Measures on the result
+        if measure_plan.measures:
+            df = measure_plan.evaluate(df)
 
-        # 5. Final projection: only keep columns requested by the user
+        # Final projection: only keep columns requested by the user
         # (group_by columns + specified aggregation results)
         final_cols = []
         if query.group_by:
@@ -145,13 +569,19 @@ class QueryEngine:
         # Apply limit
         if query.limit:
             df = df.head(query.limit)
-        
-        # Convert to response format
-        return {
+        return df
+    
+    @staticmethod
+    def to_response(df: pd.DataFrame) -> Dict[str, Any]:
+        """Convert a result frame to the JSON response format"""
+        result = {
             "data": df.to_dict(orient="records"),
             "total_rows": len(df),
             "columns": df.columns.tolist()
         }
+        if df.attrs.get("metadata"):
+            result["metadata"] = df.attrs["metadata"]
+        return result
     
     @staticmethod
     def _apply_aggregations(
@@ -190,8 +620,10 @@ class QueryEngine:
                 func_map[column].append(p_func)
         
         # Group and aggregate
-        # Result has a MultiIndex for columns if we used lists in func_map
-        grouped = df.groupby(group_by).agg(func_map)
+        # Result has a MultiIndex for columns if we used lists in func_map.
+        # Categorical keys are grouped on their integer codes; observed=True skips
+        # dictionary values that don't occur in the (filtered) data
+        grouped = df.groupby(group_by, observed=True).agg(func_map)
         
         # Flatten the MultiIndex columns and rename to f"{column}_{function}"
         new_columns = []
@@ -203,14 +635,27 @@ class QueryEngine:
             new_columns.append(f"{col_name}_{display_func}")
             
         grouped.columns = new_columns
-        
+        return QueryEngine._format_grouped(grouped, group_by, aggregations)
+    
+    @staticmethod
+    def _format_grouped(
+        grouped: pd.DataFrame,
+        group_by: List[str],
+        aggregations: List[Any]
+    ) -> pd.DataFrame:
+        """Turn aggregates indexed by group keys into the response frame"""
         # Reset index to pull group_by columns into the dataframe
         # Now name clashes like 'Job Title' vs 'Job Title_count' are avoided
         df_result = grouped.reset_index()
         
+        # Turn categorical codes back into labels only on the (small) result
+        for col in group_by:
+            if isinstance(df_result[col].dtype, pd.CategoricalDtype):
+                df_result[col] = df_result[col].astype(df_result[col].cat.categories.dtype)
+        
         # If we have 2 group_by columns, pivot them for charts (Stacked/Grouped)
         if len(group_by) == 2 and len(aggregations) == 1:
-            val_col = new_columns[0] # The only aggregation result
+            val_col = grouped.columns[0] # The only aggregation result
             # Pivot: rows=group_by[0], columns=group_by[1], values=agg_result
             pivot_df = df_result.pivot(index=group_by[0], columns=group_by[1], values=val_col).reset_index()
             # Fill NaN with 0 for charts
@@ -251,38 +696,6 @@ class QueryEngine:
         
         return pd.DataFrame(results)
     
-    @staticmethod
-    def _evaluate_aggregate_measures(df: pd.DataFrame, measures: List[Dict[str, Any]]) -> pd.DataFrame:
-        """Evaluate aggregate formulas on the aggregated result"""
-        for m in measures:
-            name = m["name"]
-            formula = m["formula"]
-            
-            # Map "SUM(Profit)" to "`Profit_sum`" in the formula
-            # Using backticks for columns that have spaces or special characters
-            def replacer(match):
-                func, col_expr = match.groups()
-                func_lower = func.lower()
-                if func_lower == "mean": func_lower = "avg"
-                
-                target = f"{col_expr}_{func_lower}"
-                # If name has spaces or special chars, backtick it for df.eval
-                if any(c in target for c in " %-+*/()"):
-                    return f"`{target}`"
-                return target
-            
-            # Improved regex for multi-word or expressions
-            clean_formula = re.sub(r'(\w+)\(([^)]+)\)', replacer, formula)
-            
-            try:
-                # Handle raw columns in formula that aren't inside aggregations (unlikely but possible)
-                # We prioritize the mapped aggregate results
-                df[name] = df.eval(clean_formula)
-            except Exception as e:
-                print(f"Error evaluating aggregate measure {name}: {e}")
-                
-        return df
-
     @staticmethod
     def preview_data(
         file_path: str,
@@ -291,10 +704,17 @@ class QueryEngine:
         measures: List[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Preview first N rows of a dataset"""
-        df = pd.read_csv(file_path)
-        
-        if transformations:
-            df = TransformationService.apply_transformations(df, transformations)
+        return QueryEngine.to_response(QueryEngine.preview_frame(file_path, limit, transformations, measures))
+    
+    @staticmethod
+    def preview_frame(
+        file_path: str,
+        limit: int = 100,
+        transformations: List[Dict[str, Any]] = None,
+        measures: List[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        """First N rows of a dataset with transformations and measures applied"""
+        df = QueryEngine._preview_rows(file_path, limit, transformations)
         
         if measures:
             df = ModelingService.apply_measures(df, measures)
@@ -303,39 +723,83 @@ class QueryEngine:
 
         # Handle aggregate measures in preview
         if measures:
-            agg_measures = [m for m in measures if any(agg in m.get("formula", "").upper() for agg in ["SUM(", "AVG(", "COUNT(", "MIN(", "MAX("])]
+            agg_measures = [m for m in measures if FormulaEngine.is_aggregate(m.get("formula", ""), df_preview.columns)]
             if agg_measures:
+                compiled_measures = []
                 for m in agg_measures:
-                    # Improved regex
-                    deps = re.findall(r'(\w+)\(([^)]+)\)', m["formula"])
-                    for func, col_expr in deps:
-                        # Pre-evaluate row-level part if expression
-                        if col_expr not in df_preview.columns:
-                            try:
-                                safe_expr = col_expr
-                                sorted_cols = sorted(df_preview.columns.tolist(), key=len, reverse=True)
-                                for col in sorted_cols:
-                                    if col in safe_expr and not f"`{col}`" in safe_expr:
-                                        if any(c in col for c in " %-+*/()"):
-                                            safe_expr = safe_expr.replace(col, f"`{col}`")
-                                df_preview[col_expr] = df_preview.eval(safe_expr)
-                            except:
-                                pass
-
-                        if col_expr in df_preview.columns:
-                            func_lower = func.lower()
-                            if func_lower == "mean": func_lower = "avg"
-                            target_col = f"{col_expr}_{func_lower}"
-                            if func_lower == "sum": df_preview[target_col] = df_preview[col_expr].sum()
-                            elif func_lower == "avg": df_preview[target_col] = df_preview[col_expr].mean()
-                            elif func_lower == "count": df_preview[target_col] = df_preview[col_expr].count()
-                            elif func_lower == "min": df_preview[target_col] = df_preview[col_expr].min()
-                            elif func_lower == "max": df_preview[target_col] = df_preview[col_expr].max()
+                    try:
+                        compiled_measures.append((m["name"], FormulaEngine.compile(m["formula"], df_preview.columns)))
+                    except FormulaError:
+                        continue
+                plan = MeasurePlan(compiled_measures)
                 
-                df_preview = QueryEngine._evaluate_aggregate_measures(df_preview, agg_measures)
+                # Pre-evaluate row-level parts of expressions, then each aggregate once over the preview rows
+                plan.materialize_inputs(df_preview)
+                for call in plan.calls:
+                    if call.key in df_preview.columns:
+                        values = df_preview[call.key]
+                        target_col = call.result_column
+                        if call.function == "sum": df_preview[target_col] = values.sum()
+                        elif call.function == "avg": df_preview[target_col] = values.mean()
+                        elif call.function == "count": df_preview[target_col] = values.count()
+                        elif call.function == "min": df_preview[target_col] = values.min()
+                        elif call.function == "max": df_preview[target_col] = values.max()
+                        elif call.function == "median": df_preview[target_col] = values.median()
+                        elif call.function == "std": df_preview[target_col] = values.std()
+                
+                df_preview = plan.evaluate(df_preview)
         
-        return {
-            "data": df_preview.to_dict(orient="records"),
-            "total_rows": len(df_preview),
-            "columns": df_preview.columns.tolist()
-        }
+        return df_preview
+    
+    @staticmethod
+    def _preview_rows(
+        file_path: str,
+        limit: int,
+        transformations: List[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        """First `limit` rows of a dataset after a list of transformation steps
+        
+        Steps up to the last filter or sort run on the full frame and are
+        checkpointed per step prefix, so editing step N replays from step N.
+        The row-local steps after that only ever see the sample.
+        """
+        transformations = transformations or []
+        full_steps = 0
+        for i, step in enumerate(transformations):
+            if step.get("type") not in TransformationService.ROW_LOCAL_STEPS:
+                full_steps = i + 1
+        
+        if full_steps == 0:
+            # No step drops or reorders rows, so the preview starts from the first rows of the file
+            chunks = DatasetManager.iter_chunks(file_path, chunk_rows=limit)
+            try:
+                df = next(chunks)
+            finally:
+                chunks.close()
+        else:
+            dataset_key = DatasetManager.get_dataset_key(file_path)
+            version = (dataset_key, *DatasetManager.get_file_version(file_path))
+            prefix_keys = []
+            digest = hashlib.sha256()
+            for step in transformations[:full_steps]:
+                digest.update(json.dumps(step, sort_keys=True, default=str).encode("utf-8"))
+                prefix_keys.append((*version, digest.hexdigest()))
+            
+            # Resume from the longest prefix already materialized
+            start, df = 0, None
+            for i in range(full_steps, 0, -1):
+                df = preview_cache.get(prefix_keys[i - 1])
+                if df is not None:
+                    start = i
+                    break
+            if df is None:
+                df = DatasetManager.load_dataframe(file_path)
+                # Checkpoints of older versions of the file are never read again
+                preview_cache.invalidate(lambda key: key[0] == dataset_key and key[:-1] != version)
+            
+            for i in range(start, full_steps):
+                df = TransformationService.apply_transformations(df.copy(deep=False), [transformations[i]])
+                preview_cache.put(prefix_keys[i], df)
+            df = df.head(limit)
+        
+        return TransformationService.apply_transformations(df.copy(), transformations[full_steps:])
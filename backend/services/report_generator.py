@@ -16,6 +16,7 @@ from config import settings
 from models.schemas import ChartRequest
 from services.chart_formatter import ChartFormatter
 from utils.validators import apply_filters
+from utils.dataset_manager import DatasetManager
 
 class ReportGenerator:
     """Service for generating professional PDF and CSV reports"""
@@ -27,11 +28,11 @@ class ReportGenerator:
         filters: List[Any] = None
     ) -> str:
         """Generate CSV export of filtered data"""
-        df = pd.read_csv(file_path)
+        df = DatasetManager.load_dataframe(file_path)
         
         # Apply filters if provided
         if filters:
-            df = apply_filters(df, filters)
+            df = apply_filters(df, DatasetManager.parse_filter_values(file_path, filters))
         
         # Save to reports directory
         output_path = os.path.join(settings.REPORT_DIR, output_filename)
@@ -91,10 +92,10 @@ class ReportGenerator:
         
         # Dataset Summary Section
         story.append(Paragraph("Dataset Summary", heading_style))
-        df = pd.read_csv(file_path)
+        df = DatasetManager.load_dataframe(file_path)
         
         if filters:
-            df = apply_filters(df, filters)
+            df = apply_filters(df, DatasetManager.parse_filter_values(file_path, filters))
         
         summary_data = [
             ["Metric", "Value"],
@@ -203,10 +204,17 @@ class ReportGenerator:
     def _generate_chart_image(file_path: str, chart_config: ChartRequest, filename: str) -> str:
         """Generate chart image for PDF embedding"""
         try:
-            df = pd.read_csv(file_path)
+            columns = None
+            if chart_config.x_column and chart_config.y_column:
+                columns = [chart_config.x_column, chart_config.y_column]
+                if chart_config.category_column:
+                    columns.append(chart_config.category_column)
+                if chart_config.filters:
+                    columns.extend(f.column for f in chart_config.filters)
+            df = DatasetManager.load_dataframe(file_path, columns=columns)
             
             if chart_config.filters:
-                df = apply_filters(df, chart_config.filters)
+                df = apply_filters(df, DatasetManager.parse_filter_values(file_path, chart_config.filters))
             
             plt.figure(figsize=(10, 6))
             
@@ -214,11 +222,11 @@ class ReportGenerator:
             if chart_config.x_column and chart_config.y_column:
                 if chart_config.category_column:
                     # Grouped bar chart
-                    grouped = df.groupby([chart_config.x_column, chart_config.category_column])[chart_config.y_column].sum().unstack()
+                    grouped = df.groupby([chart_config.x_column, chart_config.category_column], observed=True)[chart_config.y_column].sum().unstack()
                     grouped.plot(kind='bar', ax=plt.gca())
                 else:
                     # Simple bar or line chart
-                    df_plot = df.groupby(chart_config.x_column)[chart_config.y_column].sum()
+                    df_plot = df.groupby(chart_config.x_column, observed=True)[chart_config.y_column].sum()
                     df_plot.plot(kind='bar', ax=plt.gca())
                 
                 plt.xlabel(chart_config.x_column)
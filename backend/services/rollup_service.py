@@ -0,0 +1,166 @@
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional, Set, Tuple
+import pandas as pd
+from config import settings
+from models.schemas import QueryRequest, AggregationRequest
+from utils.cache import LRUCache
+from utils.validators import apply_filters
+
+# Aggregations a cube's sum/count/min/max cells can be rolled up into
+ROLLUP_FUNCTIONS = ("sum", "count", "avg", "min", "max")
+
+# Materialized cubes, keyed by (dataset id, file version, pipeline version, dimensions, measures)
+cube_cache = LRUCache(settings.ROLLUP_CACHE_MAX_BYTES)
+
+# Query shapes seen per dataset version: {version: Counter({(dimensions, measures): hits})}
+_shape_hits: Dict[tuple, Counter] = {}
+# Dimension sets whose cube came out too large to be worth keeping, per dataset version
+_oversized: Set[tuple] = set()
+_lock = threading.Lock()
+
+
+class RollupService:
+    """Pre-aggregated cubes for frequent group-by/aggregation query shapes
+
+    A shape is the set of dimensions a query groups or filters by plus the
+    columns it aggregates. Once a shape has been seen ROLLUP_MIN_HITS times, a
+    cube holding sum/count/min/max of its measures per combination of its
+    dimensions is built from the prepared frame. Later queries whose dimensions
+    and measures are covered by a cube, including coarser group-bys and filters
+    on cube dimensions, are answered by rolling the cube up instead of
+    aggregating the base rows.
+    """
+
+    @staticmethod
+    def shape(query: QueryRequest, aggregations: List[AggregationRequest]) -> Optional[Tuple[frozenset, frozenset]]:
+        """(dimensions, measures) of a query, or None if a cube can't answer it"""
+        if not aggregations or query.is_histogram or query.approximate:
+            return None
+        if any(agg.function.value not in ROLLUP_FUNCTIONS for agg in aggregations):
+            return None
+        dimensions = frozenset(query.group_by or []) | frozenset(f.column for f in query.filters or [])
+        return dimensions, frozenset(agg.column for agg in aggregations)
+
+    @staticmethod
+    def answer(
+        version: tuple,
+        query: QueryRequest,
+        aggregations: List[AggregationRequest],
+        base: Optional[pd.DataFrame] = None
+    ) -> Optional[pd.DataFrame]:
+        """Aggregates for a query from a covering cube, indexed by the group keys
+
+        Records the query's shape, and builds its cube from `base` (the prepared,
+        unfiltered frame) once the shape is hot. Returns None when no cube applies.
+        """
+        shape = RollupService.shape(query, aggregations)
+        if shape is None:
+            return None
+        dimensions, measures = shape
+
+        with _lock:
+            for stale in [v for v in _shape_hits if v[0] == version[0] and v != version]:
+                del _shape_hits[stale]
+            hits = _shape_hits.setdefault(version, Counter())
+            hits[shape] += 1
+            hot = hits[shape] >= settings.ROLLUP_MIN_HITS and (version, dimensions) not in _oversized
+            # A cube over these dimensions also carries the measures of every finer-or-equal shape seen
+            cube_measures = frozenset().union(*(m for d, m in hits if d <= dimensions))
+
+        def covers(key) -> bool:
+            return key[:-2] == version and dimensions <= key[-2] and measures <= key[-1]
+
+        cube = cube_cache.find(covers)
+        if cube is None and hot and base is not None:
+            cube = RollupService._build(version, base, dimensions, cube_measures)
+        if cube is None:
+            return None
+        return RollupService._roll_up(cube, query, aggregations)
+
+    @staticmethod
+    def invalidate(dataset_id: str) -> None:
+        """Drop the cubes and recorded shapes of a dataset"""
+        cube_cache.invalidate(lambda key: key[0] == str(dataset_id))
+        with _lock:
+            for version in [v for v in _shape_hits if v[0] == str(dataset_id)]:
+                del _shape_hits[version]
+            _oversized.difference_update({k for k in _oversized if k[0][0] == str(dataset_id)})
+
+    @staticmethod
+    def _build(
+        version: tuple,
+        base: pd.DataFrame,
+        dimensions: frozenset,
+        measures: frozenset
+    ) -> Optional[pd.DataFrame]:
+        if not dimensions <= set(base.columns):
+            return None
+        measures = [c for c in base.columns if c in measures]
+        dims = [c for c in base.columns if c in dimensions]
+
+        # Missing dimension values are cells of their own, so coarser roll-ups still count those rows
+        grouped = base.groupby(dims, observed=True, dropna=False, sort=False) if dims else None
+        cells = {}
+        for column in measures:
+            values = base[column]
+            target = grouped[column] if grouped is not None else values
+            numeric = pd.api.types.is_numeric_dtype(values)
+            cells[f"{column}__count"] = target.count()
+            if numeric:
+                cells[f"{column}__sum"] = target.sum()
+            if numeric or pd.api.types.is_datetime64_any_dtype(values):
+                cells[f"{column}__min"] = target.min()
+                cells[f"{column}__max"] = target.max()
+
+        if grouped is not None:
+            cube = pd.DataFrame(cells).reset_index()
+        else:
+            cube = pd.DataFrame({name: [value] for name, value in cells.items()})
+
+        with _lock:
+            oversized = len(cube) > max(1, len(base) * settings.ROLLUP_MAX_CELLS_RATIO)
+            if oversized:
+                _oversized.add((version, dimensions))
+                # Only the newest version of a dataset is ever queried
+                _oversized.difference_update({k for k in _oversized if k[0][0] == version[0] and k[0] != version})
+        if oversized:
+            return None
+
+        cube_cache.invalidate(lambda key: key[0] == version[0] and key[:-2] != version)
+        cube_cache.put((*version, dimensions, frozenset(measures)), cube)
+        return cube
+
+    @staticmethod
+    def _roll_up(cube: pd.DataFrame, query: QueryRequest, aggregations: List[AggregationRequest]) -> Optional[pd.DataFrame]:
+        """Re-aggregate cube cells to the query's group keys"""
+        needed = {
+            "sum": ("sum",), "count": ("count",), "avg": ("sum", "count"), "min": ("min",), "max": ("max",)
+        }
+        if any(f"{agg.column}__{stat}" not in cube.columns
+               for agg in aggregations for stat in needed[agg.function.value]):
+            return None
+
+        if query.filters:
+            cube = apply_filters(cube, query.filters)
+
+        group_by = list(query.group_by or [])
+        source = cube.groupby(group_by, observed=True, sort=True) if group_by else cube
+        result = {}
+        for agg in aggregations:
+            column, function = agg.column, agg.function.value
+            name = f"{column}_{function}"
+            if function in ("sum", "count"):
+                result[name] = source[f"{column}__{function}"].sum()
+            elif function == "min":
+                result[name] = source[f"{column}__min"].min()
+            elif function == "max":
+                result[name] = source[f"{column}__max"].max()
+            else:
+                total, count = source[f"{column}__sum"].sum(), source[f"{column}__count"].sum()
+                result[name] = total / count.where(count > 0) if group_by else (total / count if count else float("nan"))
+
+        if group_by:
+            return pd.DataFrame(result)
+        # Global aggregations always produce exactly one row
+        return pd.DataFrame({name: [value] for name, value in result.items()})
@@ -1,8 +1,15 @@
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Any
+from utils.validators import condition_mask
+from utils.type_inference import TypeInference
+from services.formula_engine import FormulaEngine
 
 class TransformationService:
+    # Steps that work row by row without dropping or reordering rows, so running
+    # them on the first N rows gives the first N rows of running them on all
+    ROW_LOCAL_STEPS = {"rename", "drop", "type_convert", "derived_column"}
+    
     @staticmethod
     def apply_transformations(df: pd.DataFrame, transformations: List[Dict[str, Any]]) -> pd.DataFrame:
         """Apply a sequence of transformations to a DataFrame"""
@@ -22,10 +29,12 @@ class TransformationService:
                     column = params.get("column")
                     new_type = params.get("dtype")
                     if column in df.columns:
+                        # Columns typed at ingest are already converted; text is parsed with an explicit format
                         if new_type == "datetime":
-                            df[column] = pd.to_datetime(df[column], errors='coerce')
+                            df[column] = TypeInference.to_datetime(df[column])
                         elif new_type == "numeric":
-                            df[column] = pd.to_numeric(df[column], errors='coerce')
+                            if not pd.api.types.is_numeric_dtype(df[column]):
+                                df[column] = pd.to_numeric(df[column], errors='coerce')
                         else:
                             df[column] = df[column].astype(new_type)
                 
@@ -35,16 +44,7 @@ class TransformationService:
                     value = params.get("value")
                     
                     if column in df.columns:
-                        if operator == "eq":
-                            df = df[df[column] == value]
-                        elif operator == "ne":
-                            df = df[df[column] != value]
-                        elif operator == "gt":
-                            df = df[df[column] > value]
-                        elif operator == "lt":
-                            df = df[df[column] < value]
-                        elif operator == "contains":
-                            df = df[df[column].astype(str).str.contains(str(value), case=False, na=False)]
+                        df = df[condition_mask(df[column], operator, value)]
                 
                 elif step_type == "sort":
                     column = params.get("column")
@@ -54,23 +54,11 @@ class TransformationService:
                 
                 elif step_type == "derived_column":
                     name = params.get("name")
-                    formula = params.get("formula") # Simple: "col1 + col2" or "col1 * 0.1"
+                    formula = params.get("formula") # e.g. "col1 + col2" or "col1 * 0.1"
                     
-                    # Basic evaluation for simple arithmetic
-                    # WARNING: eval can be dangerous, but for this POC we use a restricted environment
-                    # in a real app, we'd use a proper parser
+                    # Parsed once per formula and evaluated vectorized over the frame
                     try:
-                        # Proactively backtick known columns in the expression for robust evaluation
-                        safe_expr = formula
-                        sorted_cols = sorted(df.columns.tolist(), key=len, reverse=True)
-                        for col in sorted_cols:
-                            if col in safe_expr and not f"`{col}`" in safe_expr:
-                                # If name has spaces or special chars, backtick it
-                                if any(c in col for c in " %-+*/()"):
-                                     safe_expr = safe_expr.replace(col, f"`{col}`")
-                        
-                        # df.eval for arithmetic transformations
-                        df[name] = df.eval(safe_expr)
+                        df[name] = FormulaEngine.compile(formula, df.columns).evaluate(df)
                     except Exception as e:
                         print(f"Error in derived column {name}: {e}")
                         
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Services import the database module; tests never touch it, so any reachable URL will do
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
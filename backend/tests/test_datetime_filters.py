@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+from models.schemas import ChartRequest, FilterCondition, QueryRequest
+from services.chart_formatter import ChartFormatter
+from services.query_engine import QueryEngine
+from utils.dataset_manager import DatasetManager
+from utils.ingest import CSVIngest
+
+
+@pytest.fixture
+def day_first_dataset(tmp_path):
+    """A dataset whose date column is stored with %d/%m/%Y, and its source rows"""
+    dates = ["03/04/2023", "04/03/2023", "25/12/2023", "03/04/2023", "01/02/2024", "04/03/2023", "03/04/2023"]
+    source = pd.DataFrame({"day": dates, "amount": range(len(dates))})
+    csv_path = tmp_path / "sales.csv"
+    source.to_csv(csv_path, index=False)
+    columnar_path = CSVIngest.ingest_file(str(csv_path))["columnar_path"]
+    assert DatasetManager.load_schema(columnar_path)["columns"]["day"]["format"] == "%d/%m/%Y"
+    return columnar_path, source
+
+
+def count_rows(file_path, filters):
+    query = QueryRequest(filters=[FilterCondition(**f) for f in filters], limit=100)
+    return QueryEngine.execute_query(file_path, query)["total_rows"]
+
+
+def test_eq_filter_reads_values_day_first(day_first_dataset):
+    file_path, source = day_first_dataset
+    expected = int((source["day"] == "03/04/2023").sum())
+    assert count_rows(file_path, [{"column": "day", "operator": "eq", "value": "03/04/2023"}]) == expected
+
+
+def test_range_filters_read_values_day_first(day_first_dataset):
+    file_path, source = day_first_dataset
+    days = pd.to_datetime(source["day"], format="%d/%m/%Y")
+    assert count_rows(file_path, [{"column": "day", "operator": "lt", "value": "01/04/2023"}]) == \
+        int((days < pd.Timestamp(2023, 4, 1)).sum())
+    assert count_rows(file_path, [{"column": "day", "operator": "between", "value": ["01/03/2023", "03/04/2023"]}]) == \
+        int(days.between(pd.Timestamp(2023, 3, 1), pd.Timestamp(2023, 4, 3)).sum())
+    assert count_rows(file_path, [{"column": "day", "operator": "in", "value": ["04/03/2023", "01/02/2024"]}]) == 3
+
+
+def test_iso_filter_values_still_parse(day_first_dataset):
+    file_path, _ = day_first_dataset
+    assert count_rows(file_path, [{"column": "day", "operator": "eq", "value": "2023-04-03"}]) == 3
+
+
+def test_chart_filters_read_values_day_first(day_first_dataset):
+    file_path, _ = day_first_dataset
+    request = ChartRequest(
+        x_column="day", y_column="amount", aggregation="count",
+        filters=[FilterCondition(column="day", operator="eq", value="04/03/2023")]
+    )
+    chart = ChartFormatter.prepare_bar_chart(file_path, request)
+    assert list(chart["datasets"][0]["data"]) == [2]
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+from models.schemas import AggregationRequest, QueryRequest
+from services.dependency_resolver import DependencyResolver
+from services.query_engine import QueryEngine
+from services.transformation_service import TransformationService
+
+RENAME = [{"type": "rename", "params": {"columns": {"Cost": "Unit cost"}}}]
+
+
+def frame():
+    return pd.DataFrame({"Region": ["N", "S", "N"], "Cost": [1.0, 2.0, 4.0], "Qty": [3, 5, 7]})
+
+
+def pruned_and_full(needed, steps):
+    df = frame()
+    full = TransformationService.apply_transformations(df.copy(), steps)
+    input_columns, kept_steps, _ = DependencyResolver.resolve_pipeline(list(df.columns), needed, steps)
+    pruned = TransformationService.apply_transformations(df[input_columns].copy(), kept_steps)
+    return pruned, full
+
+
+@pytest.mark.parametrize("needed", [{"Region", "Cost"}, {"Region", "Unit cost"}, {"Region", "Qty"}])
+def test_pruned_pipeline_matches_full_pipeline_around_renames(needed):
+    pruned, full = pruned_and_full(needed, RENAME)
+    for column in needed:
+        assert (column in pruned.columns) == (column in full.columns)
+        if column in full.columns:
+            pd.testing.assert_series_equal(pruned[column], full[column])
+
+
+def outcome(run):
+    try:
+        return run().reset_index(drop=True)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("column, measures, answerable", [
+    ("Cost", [], False),
+    ("Unit cost", [], True),
+    ("Total cost", [{"name": "Total cost", "formula": "SUM(Cost)"}], False),
+    ("Total cost", [{"name": "Total cost", "formula": "SUM(Unit cost)"}], True)
+])
+def test_pruned_query_matches_full_pipeline_around_renames(tmp_path, column, measures, answerable):
+    file_path = str(tmp_path / "costs.csv")
+    frame().to_csv(file_path, index=False)
+    query = QueryRequest(group_by=["Region"], aggregations=[AggregationRequest(column=column, function="sum")])
+
+    pruned = outcome(lambda: QueryEngine.execute_query_frame(file_path, query, RENAME, measures))
+    full = outcome(lambda: QueryEngine.run_query(
+        QueryEngine.prepare_dataset(file_path, RENAME, measures, columns=None), query, measures
+    ))
+    assert isinstance(full, pd.DataFrame) == answerable
+    if answerable:
+        pd.testing.assert_frame_equal(pruned, full)
+    else:
+        # The renamed-away name no longer exists, so neither pipeline may answer from it
+        assert pruned is full
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+from config import settings
+from models.schemas import AggregationRequest, QueryRequest
+from services.query_engine import QueryEngine
+
+
+@pytest.fixture
+def streamed(monkeypatch):
+    # Every aggregation runs out of core, in small chunks
+    monkeypatch.setattr(settings, "STREAMING_THRESHOLD_BYTES", 0)
+    monkeypatch.setattr(settings, "STREAMING_CHUNK_ROWS", 500)
+
+
+def run(tmp_path, rows, measures=None, column="Price"):
+    rng = np.random.default_rng(0)
+    file_path = str(tmp_path / "prices.csv")
+    pd.DataFrame({
+        "Region": np.where(np.arange(rows) % 2, "N", "S"),
+        "Price": rng.gamma(2.0, 10.0, rows).round(3)
+    }).to_csv(file_path, index=False)
+    query = QueryRequest(group_by=["Region"], aggregations=[AggregationRequest(column=column, function="median")])
+    exact = QueryEngine.run_query(QueryEngine.prepare_dataset(file_path, None, measures), query, measures)
+    return QueryEngine.execute_query_frame(file_path, query, None, measures), exact
+
+
+def test_small_groups_give_exact_unflagged_medians(tmp_path, streamed):
+    streamed_df, exact = run(tmp_path, 1_500)
+    pd.testing.assert_frame_equal(streamed_df.reset_index(drop=True), exact.reset_index(drop=True))
+    assert "metadata" not in QueryEngine.to_response(streamed_df)
+
+
+def test_sketched_medians_are_flagged_approximate(tmp_path, streamed):
+    streamed_df, exact = run(tmp_path, 20_000)
+    metadata = QueryEngine.to_response(streamed_df)["metadata"]
+    assert metadata == {"approximate": True, "estimated": ["Price_median"]}
+    np.testing.assert_allclose(streamed_df["Price_median"], exact["Price_median"], rtol=0.01)
+
+
+def test_measures_over_sketched_medians_are_flagged(tmp_path, streamed):
+    measures = [{"name": "Typical price", "formula": "MEDIAN(Price) * 2"}]
+    streamed_df, _ = run(tmp_path, 20_000, measures, column="Typical price")
+    assert QueryEngine.to_response(streamed_df)["metadata"]["estimated"] == ["Typical price"]
@@ -0,0 +1,132 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+import pandas as pd
+
+
+def estimate_size(value: Any) -> int:
+    """Estimate the in-memory size of a cached value in bytes"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by an approximate memory budget
+
+    Optionally entries also expire `ttl_seconds` after they were stored, and
+    the number of entries can be capped with `max_entries`.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        sizeof: Callable[[Any], int] = estimate_size,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._sizeof = sizeof
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._expires: Dict[Hashable, float] = {}
+        self._current_bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a cached value and mark it as recently used"""
+        with self._lock:
+            if key not in self._entries or self._expire(key):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def find(self, predicate: Callable[[Hashable], bool]) -> Optional[Any]:
+        """Return the most recently used value whose key matches the predicate"""
+        with self._lock:
+            for key in reversed(list(self._entries)):
+                if predicate(key) and not self._expire(key):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting least recently used entries to stay within budget"""
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            # Values larger than the whole budget are never cached
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._current_bytes += size
+            if self.ttl_seconds is not None:
+                self._expires[key] = time.monotonic() + self.ttl_seconds
+
+            while self._current_bytes > self.max_bytes or (
+                self.max_entries is not None and len(self._entries) > self.max_entries
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches the predicate"""
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                self._remove(key)
+            return len(stale)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._expires.clear()
+            self._current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring cache effectiveness"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+    def _expire(self, key: Hashable) -> bool:
+        """Remove an entry if its TTL has passed"""
+        expires_at = self._expires.get(key)
+        if expires_at is None or time.monotonic() < expires_at:
+            return False
+        self._remove(key)
+        self.expirations += 1
+        return True
+
+    def _remove(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+        self._expires.pop(key, None)
+        self._current_bytes -= self._sizes.pop(key, 0)
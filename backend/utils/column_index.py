@@ -0,0 +1,331 @@
+import os
+import json
+import shutil
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from config import settings
+from models.schemas import FilterCondition
+
+DICTIONARY_OPERATORS = ("eq", "in")
+RANGE_OPERATORS = ("eq", "gt", "lt", "gte", "lte", "between")
+
+_loaded: Dict[str, Tuple[Tuple[int, int], Optional["ColumnIndex"]]] = {}
+_loaded_guard = threading.Lock()
+
+
+def _to_python(value: Any) -> Any:
+    """Convert a NumPy scalar into a JSON-serializable Python value"""
+    return value.item() if hasattr(value, "item") else value
+
+
+class ColumnIndex:
+    """Persistent secondary indexes for one columnar dataset file
+
+    Low-cardinality columns get a dictionary index: for every distinct value the
+    sorted row ids that hold it, for eq/in filters (and range filters when the
+    values are numbers). Other numeric and date columns get a sorted permutation
+    for range/between filters. Lookups return row positions
+    of the stored file, so they cost time proportional to the number of matches.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, index_dir: str, manifest: Dict[str, Any]):
+        self.index_dir = index_dir
+        self.columns = manifest["columns"]
+        self._dictionaries: Dict[str, Dict[Any, int]] = {
+            column: {key: code for code, key in enumerate(entry["keys"])}
+            for column, entry in self.columns.items()
+            if entry["kind"] == "dictionary"
+        }
+        # Dictionary indexes over numbers can also answer range filters
+        self._numeric_keys: Dict[str, np.ndarray] = {
+            column: np.asarray(entry["keys"], dtype=float)
+            for column, entry in self.columns.items()
+            if entry["kind"] == "dictionary" and entry["keys"]
+            and all(isinstance(k, (int, float)) and not isinstance(k, bool) for k in entry["keys"])
+        }
+
+    @staticmethod
+    def get_index_dir(columnar_path: str) -> str:
+        """Get the directory holding the indexes of a dataset file"""
+        return os.path.splitext(columnar_path)[0] + ".index"
+
+    @staticmethod
+    def build(df: pd.DataFrame, columnar_path: str) -> None:
+        """Build and persist indexes for a freshly written columnar file"""
+        builder = ColumnIndexBuilder()
+        builder.add(df)
+        builder.write(columnar_path)
+
+    @staticmethod
+    def load(columnar_path: str) -> Optional["ColumnIndex"]:
+        """Load the indexes of a dataset file, or None if missing or out of date"""
+        index_dir = ColumnIndex.get_index_dir(columnar_path)
+        try:
+            stat = os.stat(columnar_path)
+        except OSError:
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with _loaded_guard:
+            cached = _loaded.get(index_dir)
+            if cached and cached[0] == version:
+                return cached[1]
+
+        index = None
+        manifest_path = os.path.join(index_dir, ColumnIndex.MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if tuple(manifest.get("version", ())) == version:
+                index = ColumnIndex(index_dir, manifest)
+
+        with _loaded_guard:
+            _loaded[index_dir] = (version, index)
+        return index
+
+    @staticmethod
+    def delete(columnar_path: str) -> None:
+        """Remove the indexes of a dataset file"""
+        index_dir = ColumnIndex.get_index_dir(columnar_path)
+        shutil.rmtree(index_dir, ignore_errors=True)
+        with _loaded_guard:
+            _loaded.pop(index_dir, None)
+
+    def lookup(
+        self,
+        filters: List[FilterCondition],
+        columns: Optional[set] = None
+    ) -> Tuple[Optional[np.ndarray], List[FilterCondition]]:
+        """Resolve the filters an index can answer
+
+        Returns the sorted matching row ids (None if no filter was indexable) and
+        the filters that still have to be evaluated on those rows. Only columns in
+        `columns` are considered when it is given.
+        """
+        rows = None
+        remaining = []
+
+        for f in filters:
+            matched = None
+            if columns is None or f.column in columns:
+                try:
+                    matched = self._match(f)
+                except Exception:
+                    # e.g. a value of the wrong type; the regular filter path reports it
+                    matched = None
+
+            if matched is None:
+                remaining.append(f)
+                continue
+
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+            if len(rows) == 0:
+                # Nothing matches; remaining filters can't add rows back
+                return rows, []
+
+        return rows, remaining
+
+    def _rows(self, entry: Dict[str, Any]) -> np.ndarray:
+        return np.load(os.path.join(self.index_dir, entry["rows"]), mmap_mode="r")
+
+    def _match(self, f: FilterCondition) -> Optional[np.ndarray]:
+        entry = self.columns.get(f.column)
+        if entry is None:
+            return None
+
+        if entry["kind"] == "dictionary" and f.operator in DICTIONARY_OPERATORS:
+            mapping = self._dictionaries[f.column]
+            values = f.value if f.operator == "in" else [f.value]
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            codes = sorted({mapping[v] for v in values if v in mapping})
+            offsets = entry["offsets"]
+            rows = self._rows(entry)
+            parts = [rows[offsets[c]:offsets[c + 1]] for c in codes]
+            if not parts:
+                return np.empty(0, dtype=np.int64)
+            matched = np.concatenate(parts).astype(np.int64)
+            return np.sort(matched) if len(parts) > 1 else matched
+
+        if entry["kind"] == "dictionary" and f.operator in RANGE_OPERATORS and f.column in self._numeric_keys:
+            # Keys are sorted and rows are grouped by key, so a key range is one contiguous slice
+            lo, hi = ColumnIndex._range_bounds(self._numeric_keys[f.column], f.operator, f.value)
+            offsets = entry["offsets"]
+            lo, hi = offsets[lo], offsets[hi]
+        elif entry["kind"] == "range" and f.operator in RANGE_OPERATORS:
+            values = np.load(os.path.join(self.index_dir, entry["values"]), mmap_mode="r")[:entry["valid"]]
+            lo, hi = ColumnIndex._range_bounds(values, f.operator, f.value)
+        else:
+            return None
+
+        if hi <= lo:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(self._rows(entry)[lo:hi].astype(np.int64))
+
+    @staticmethod
+    def _range_bounds(values: np.ndarray, operator: str, value: Any) -> Tuple[int, int]:
+        """Positions [lo, hi) of the sorted values that satisfy a comparison"""
+        def bound(v):
+            if np.issubdtype(values.dtype, np.datetime64):
+                return pd.Timestamp(v).to_datetime64()
+            if isinstance(v, bool) or not isinstance(v, (int, float)):
+                # Let the regular filter path decide how to compare other types
+                raise TypeError(f"Unindexable value {v!r}")
+            return v
+
+        lo, hi = 0, len(values)
+        if operator == "eq":
+            lo = np.searchsorted(values, bound(value), side="left")
+            hi = np.searchsorted(values, bound(value), side="right")
+        elif operator == "gt":
+            lo = np.searchsorted(values, bound(value), side="right")
+        elif operator == "gte":
+            lo = np.searchsorted(values, bound(value), side="left")
+        elif operator == "lt":
+            hi = np.searchsorted(values, bound(value), side="left")
+        elif operator == "lte":
+            hi = np.searchsorted(values, bound(value), side="right")
+        elif operator == "between":
+            if not isinstance(value, list) or len(value) != 2:
+                raise ValueError("Between operator requires a list of two values")
+            lo = np.searchsorted(values, bound(value[0]), side="left")
+            hi = np.searchsorted(values, bound(value[1]), side="right")
+        return int(lo), int(hi)
+
+
+class ColumnIndexBuilder:
+    """Indexes of a columnar file, built from its rows a chunk at a time as they are written
+
+    Dictionary candidates keep one integer code per row, numbered in order of
+    first appearance, until they pass INDEX_MAX_CARDINALITY distinct values;
+    numeric and date columns that may still get a range index keep their values.
+    write() sorts the dictionaries and persists the same indexes ColumnIndex.build
+    would make from the whole frame.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.columns: List[str] = []
+        self._dtypes: Dict[str, Any] = {}
+        # Distinct values -> code per dictionary candidate, None once it has too many
+        self._keys: Dict[str, Optional[Dict[Any, int]]] = {}
+        self._codes: Dict[str, List[np.ndarray]] = {}
+        # Value chunks of columns that may still get a range index, None once they can't
+        self._values: Dict[str, Optional[List[np.ndarray]]] = {}
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        """Add the next rows of the file"""
+        if not self.columns:
+            self.columns = list(chunk.columns)
+            for column in self.columns:
+                series = chunk[column]
+                self._dtypes[column] = series.dtype
+                if not pd.api.types.is_datetime64_any_dtype(series):
+                    self._keys[column] = {}
+                    self._codes[column] = []
+                if ColumnIndexBuilder._is_range_type(series):
+                    self._values[column] = []
+
+        for column in self.columns:
+            series = chunk[column]
+            dtype = self._dtypes[column]
+            if isinstance(dtype, np.dtype) and isinstance(series.dtype, np.dtype) \
+                    and dtype.kind in "iuf" and series.dtype.kind in "iuf":
+                # e.g. integers with missing values read as floats, as in the whole column
+                self._dtypes[column] = np.result_type(dtype, series.dtype)
+
+            keys = self._keys.get(column)
+            if keys is not None:
+                codes, uniques = pd.factorize(series)
+                mapping = np.array([keys.setdefault(value, len(keys)) for value in uniques], dtype=np.int64)
+                if len(keys) > settings.INDEX_MAX_CARDINALITY:
+                    self._keys[column] = self._codes[column] = None
+                else:
+                    # Missing values keep code -1
+                    self._codes[column].append(np.where(codes >= 0, mapping[np.maximum(codes, 0)], -1).astype(np.int32))
+
+            if self._values.get(column) is not None:
+                self._values[column].append(series.to_numpy())
+
+        self.rows += len(chunk)
+        self._drop_range_candidates()
+
+    def write(self, columnar_path: str) -> None:
+        """Persist the indexes next to the finished columnar file"""
+        index_dir = ColumnIndex.get_index_dir(columnar_path)
+        tmp_dir = f"{index_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        stat = os.stat(columnar_path)
+        manifest = {"version": [stat.st_mtime_ns, stat.st_size], "rows": self.rows, "columns": {}}
+        row_dtype = np.int32 if self.rows < np.iinfo(np.int32).max else np.int64
+        range_columns = 0
+
+        for position, column in enumerate(self.columns):
+            try:
+                keys = self._keys.get(column)
+                if keys is not None:
+                    # Renumber the codes so keys are sorted, as pd.factorize(sort=True) of the whole column would
+                    dtype = self._dtypes[column]
+                    values = np.array(list(keys), dtype=dtype) if isinstance(dtype, np.dtype) else pd.array(list(keys), dtype=dtype)
+                    ranks, uniques = pd.factorize(values, sort=True)
+                    codes = np.concatenate(self._codes[column]) if self._codes[column] else np.empty(0, dtype=np.int32)
+                    codes = np.where(codes >= 0, ranks[np.maximum(codes, 0)], -1)
+                    order = np.argsort(codes, kind="stable")
+                    # Null rows have code -1 and sort first; they never match eq/in
+                    offsets = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+                    rows_file = f"{position}_rows.npy"
+                    np.save(os.path.join(tmp_dir, rows_file), order.astype(row_dtype))
+                    manifest["columns"][column] = {
+                        "kind": "dictionary",
+                        "rows": rows_file,
+                        "keys": [_to_python(u) for u in uniques],
+                        "offsets": offsets.tolist()
+                    }
+                elif self._values.get(column) is not None and range_columns < settings.INDEX_MAX_RANGE_COLUMNS:
+                    values = np.concatenate(self._values[column])
+                    # Stable argsort puts NaN/NaT last, so valid values form a prefix
+                    order = np.argsort(values, kind="stable")
+                    rows_file = f"{position}_rows.npy"
+                    values_file = f"{position}_values.npy"
+                    np.save(os.path.join(tmp_dir, rows_file), order.astype(row_dtype))
+                    np.save(os.path.join(tmp_dir, values_file), values[order])
+                    manifest["columns"][column] = {
+                        "kind": "range",
+                        "rows": rows_file,
+                        "values": values_file,
+                        "valid": int(pd.notna(values).sum())
+                    }
+                    range_columns += 1
+            except Exception as e:
+                print(f"Warning: could not index column '{column}': {e}")
+
+        with open(os.path.join(tmp_dir, ColumnIndex.MANIFEST), "w") as f:
+            json.dump(manifest, f)
+
+        shutil.rmtree(index_dir, ignore_errors=True)
+        os.replace(tmp_dir, index_dir)
+        with _loaded_guard:
+            _loaded.pop(index_dir, None)
+
+    def _drop_range_candidates(self) -> None:
+        """Stop keeping values of columns past the first INDEX_MAX_RANGE_COLUMNS that are sure to get a range index"""
+        settled = 0
+        for column in self.columns:
+            if column not in self._values:
+                continue
+            if settled >= settings.INDEX_MAX_RANGE_COLUMNS:
+                self._values[column] = None
+            elif self._keys.get(column) is None:
+                settled += 1
+
+    @staticmethod
+    def _is_range_type(series: pd.Series) -> bool:
+        return (
+            pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        ) or pd.api.types.is_datetime64_dtype(series)
@@ -1,19 +1,391 @@
 import os
 import json
-from typing import Optional, List, Dict
+import hashlib
+import threading
+import weakref
+from typing import Optional, List, Dict, Tuple, Any, Callable, Iterator
+import pandas as pd
+from pandas.api.types import CategoricalDtype
+import pyarrow as pa
+import pyarrow.parquet as pq
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from models.db_models import Dataset, User
 from config import settings
+from utils.cache import LRUCache
+from utils.column_index import ColumnIndex
+from utils.sketches import ReservoirSample
+from utils.type_inference import TypeInference
+
+# Process-wide cache of loaded frames, keyed by (dataset id, mtime, size)
+dataframe_cache = LRUCache(settings.DATAFRAME_CACHE_MAX_BYTES)
+# Dropped once no load of the dataset holds or waits for them
+_load_locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+_load_locks_guard = threading.Lock()
 
 class DatasetManager:
     """Manage dataset access and metadata"""
     
+    # Uploaded CSVs are kept as the original source; every read goes through
+    # a typed columnar copy stored next to them
+    COLUMNAR_EXTENSION = ".parquet"
+    
     @staticmethod
     def get_dataset_path(dataset_id: str) -> str:
         """Get the file path for a dataset"""
         return os.path.join(settings.UPLOAD_DIR, f"{dataset_id}.csv")
     
+    @staticmethod
+    def get_columnar_path(file_path: str) -> str:
+        """Get the columnar (Parquet) path that belongs to a source CSV"""
+        return os.path.splitext(file_path)[0] + DatasetManager.COLUMNAR_EXTENSION
+    
+    @staticmethod
+    def convert_to_columnar(file_path: str) -> str:
+        """Parse a source CSV once and store it as a typed Parquet file"""
+        columnar_path = DatasetManager.get_columnar_path(file_path)
+        df = pd.read_csv(file_path)
+        
+        # Type columns once; numbers, booleans and datetimes are then stored natively
+        df, types = TypeInference.infer_frame(df)
+        df = DatasetManager.write_columnar(df, columnar_path)
+        
+        # Detected types and formats, and dictionaries for low-cardinality text columns reapplied on every load
+        DatasetManager.save_schema(columnar_path, DatasetManager.infer_schema(df, types))
+        
+        # Secondary indexes for selective filters, stored next to the columnar file
+        ColumnIndex.build(df, columnar_path)
+        
+        # Uniform row sample for approximate queries
+        sample = ReservoirSample(settings.SAMPLE_ROWS)
+        sample.add(df)
+        DatasetManager.write_columnar(sample.result(), DatasetManager.get_sample_path(columnar_path))
+        return columnar_path
+    
+    @staticmethod
+    def infer_schema(df: pd.DataFrame, types: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Build the stored schema of a dataset, including detected types and categorical dictionaries"""
+        columns = {}
+        for column in df.columns:
+            series = df[column]
+            info = {"dtype": str(series.dtype), **(types or {}).get(column, {})}
+            
+            if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+                unique_count = series.nunique(dropna=True)
+                if unique_count <= settings.CATEGORICAL_MAX_UNIQUE and \
+                        unique_count <= max(1, len(series) * settings.CATEGORICAL_MAX_UNIQUE_RATIO):
+                    try:
+                        info["categories"] = sorted(series.dropna().unique().tolist())
+                        info["type"] = "categorical"
+                    except TypeError:
+                        # Mixed value types have no natural order; keep the column as text
+                        pass
+            
+            columns[column] = info
+        
+        return {"columns": columns}
+    
+    @staticmethod
+    def get_schema_path(file_path: str) -> str:
+        """Get the path of the stored schema that belongs to a dataset file"""
+        return os.path.splitext(file_path)[0] + ".schema.json"
+    
+    @staticmethod
+    def get_sample_path(file_path: str) -> str:
+        """Get the path of the stored row sample that belongs to a dataset file"""
+        return os.path.splitext(file_path)[0] + ".sample" + DatasetManager.COLUMNAR_EXTENSION
+    
+    @staticmethod
+    def save_schema(file_path: str, schema: Dict[str, Any]) -> None:
+        """Store a dataset schema next to its data file"""
+        schema_path = DatasetManager.get_schema_path(file_path)
+        tmp_path = f"{schema_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(schema, f, default=str)
+        os.replace(tmp_path, schema_path)
+    
+    @staticmethod
+    def load_schema(file_path: str) -> Dict[str, Any]:
+        """Load the stored schema of a dataset file (empty if it was never inferred)"""
+        schema_path = DatasetManager.get_schema_path(file_path)
+        if not os.path.exists(schema_path):
+            return {"columns": {}}
+        with open(schema_path) as f:
+            return json.load(f)
+    
+    @staticmethod
+    def parse_filter_values(file_path: str, filters: Optional[List[Any]]) -> List[Any]:
+        """Filters with their values on datetime columns parsed with the formats recorded for the dataset file
+        
+        pandas would read a value such as "03/04/2023" month-first, whatever format
+        the column was stored with. Values that don't fit the recorded format (e.g.
+        ISO dates) are left for pandas to parse as before.
+        """
+        if not filters:
+            return filters or []
+        schema_columns = DatasetManager.load_schema(file_path).get("columns", {})
+        parsed = []
+        for f in filters:
+            info = schema_columns.get(f.column, {})
+            if info.get("type") == "datetime" and info.get("format") and f.operator != "contains":
+                f = f.copy(update={"value": DatasetManager._parse_datetime_value(f.value, info["format"])})
+            parsed.append(f)
+        return parsed
+    
+    @staticmethod
+    def _parse_datetime_value(value: Any, fmt: str) -> Any:
+        if isinstance(value, (list, tuple)):
+            return [DatasetManager._parse_datetime_value(v, fmt) for v in value]
+        if not isinstance(value, str):
+            return value
+        parsed = TypeInference.to_datetime(pd.Series([value]), fmt).iloc[0]
+        return value if pd.isna(parsed) else parsed
+    
+    @staticmethod
+    def write_columnar(df: pd.DataFrame, columnar_path: str) -> pd.DataFrame:
+        """Write a DataFrame to Parquet atomically so readers never see a partial file
+        
+        Returns the frame as it was stored.
+        """
+        tmp_path = f"{columnar_path}.tmp"
+        try:
+            df.to_parquet(tmp_path, engine="pyarrow", index=False, row_group_size=settings.PARQUET_ROW_GROUP_ROWS)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type text columns (e.g. ints and strings in one column) can't be
+            # stored as a single Arrow type, so keep them as strings
+            df = df.copy()
+            for column in df.select_dtypes(include=["object"]).columns:
+                df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+            df.to_parquet(tmp_path, engine="pyarrow", index=False, row_group_size=settings.PARQUET_ROW_GROUP_ROWS)
+        os.replace(tmp_path, columnar_path)
+        return df
+    
+    @staticmethod
+    def get_read_path(file_path: str) -> str:
+        """Get the path services should read a dataset's source file from, converting older uploads on first use
+        
+        Checks the disk (and may convert the whole file), so call it from a worker, not the event loop.
+        """
+        columnar_path = DatasetManager.get_columnar_path(file_path)
+        if not os.path.exists(columnar_path):
+            if not os.path.exists(file_path):
+                raise HTTPException(status_code=404, detail="Dataset file not found")
+            DatasetManager.convert_to_columnar(file_path)
+        return columnar_path
+    
+    @staticmethod
+    def on_read_path(file_path: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """Call fn with the read path of a dataset's source file and args; pass to a worker to run both off the event loop"""
+        return fn(DatasetManager.get_read_path(file_path), *args)
+    
+    @staticmethod
+    def get_columns(file_path: str) -> List[str]:
+        """Get the column names of a dataset file without loading its rows"""
+        if file_path.endswith(DatasetManager.COLUMNAR_EXTENSION):
+            return list(pq.read_schema(file_path).names)
+        return pd.read_csv(file_path, nrows=0).columns.tolist()
+    
+    @staticmethod
+    def get_dataset_key(file_path: str) -> str:
+        """Get the dataset id a stored file belongs to"""
+        return os.path.splitext(os.path.basename(file_path))[0]
+    
+    @staticmethod
+    def get_file_version(file_path: str) -> Tuple[int, int]:
+        """Get a cheap version stamp (mtime, size) for a dataset file"""
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size
+    
+    @staticmethod
+    def load_dataframe(file_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Load a dataset file through the shared cache, optionally reading only the given columns
+        
+        The returned frame is a shallow copy, so callers may add or replace
+        columns without affecting the cached data.
+        """
+        available = DatasetManager.get_columns(file_path)
+        if columns is None:
+            needed = available
+        else:
+            wanted = set(columns)
+            needed = [c for c in available if c in wanted]
+        
+        dataset_key = DatasetManager.get_dataset_key(file_path)
+        cache_key = (dataset_key, file_path, *DatasetManager.get_file_version(file_path))
+        
+        # Concurrent requests for the same dataset wait for one load instead of parsing in parallel
+        with _load_locks_guard:
+            lock = _load_locks.setdefault(dataset_key, threading.Lock())
+        
+        with lock:
+            cached = dataframe_cache.get(cache_key)
+            missing = [c for c in needed if cached is None or c not in cached.columns]
+            
+            if missing:
+                loaded = DatasetManager._read_file(file_path, missing)
+                if cached is not None:
+                    loaded = pd.concat([cached, loaded], axis=1)
+                    loaded = loaded[[c for c in available if c in loaded.columns]]
+                    
+                # A newer version of the file replaces any older cached copies
+                dataframe_cache.invalidate(lambda key: key[:2] == cache_key[:2] and key != cache_key)
+                dataframe_cache.put(cache_key, loaded)
+                cached = loaded
+        
+        if len(needed) == len(cached.columns):
+            return cached.copy(deep=False)
+        return cached[needed].copy(deep=False)
+    
+    @staticmethod
+    def _read_file(file_path: str, columns: List[str]) -> pd.DataFrame:
+        """Read columns straight from a dataset file, reapplying the stored categorical dictionaries"""
+        categorical = DatasetManager._categorical_dtypes(file_path, columns)
+        
+        if not file_path.endswith(DatasetManager.COLUMNAR_EXTENSION):
+            df = pd.read_csv(file_path, usecols=columns, dtype=categorical)[columns]
+            return TypeInference.apply_types(df, DatasetManager.load_schema(file_path).get("columns", {}))
+        
+        # Arrow decodes dictionary columns straight into categoricals; set_categories
+        # then lines their codes up with the stored dictionary
+        df = pd.read_parquet(
+            file_path,
+            engine="pyarrow",
+            columns=columns,
+            read_dictionary=list(categorical) or None
+        )
+        return DatasetManager._apply_categoricals(df, categorical)
+    
+    @staticmethod
+    def load_sample(file_path: str) -> Tuple[pd.DataFrame, int]:
+        """Load the stored uniform row sample of a dataset and the number of rows it was drawn from
+        
+        Datasets stored before samples were kept get theirs on first use.
+        """
+        sample_path = DatasetManager.get_sample_path(file_path)
+        if not os.path.exists(sample_path):
+            sample = ReservoirSample(settings.SAMPLE_ROWS)
+            sample.add(DatasetManager.load_dataframe(file_path))
+            DatasetManager.write_columnar(sample.result(), sample_path)
+        
+        if file_path.endswith(DatasetManager.COLUMNAR_EXTENSION):
+            population_rows = pq.read_metadata(file_path).num_rows
+        else:
+            # One column is enough to count the rows (an empty selection would read nothing)
+            population_rows = len(DatasetManager.load_dataframe(file_path, columns=DatasetManager.get_columns(file_path)[:1]))
+        
+        dataset_key = DatasetManager.get_dataset_key(file_path)
+        cache_key = (dataset_key, sample_path, *DatasetManager.get_file_version(sample_path))
+        sample = dataframe_cache.get(cache_key)
+        if sample is None:
+            # Same dtypes and categorical dictionaries as the full dataset
+            categorical = DatasetManager._categorical_dtypes(file_path, DatasetManager.get_columns(sample_path))
+            sample = pd.read_parquet(sample_path, engine="pyarrow", read_dictionary=list(categorical) or None)
+            sample = DatasetManager._apply_categoricals(sample, categorical)
+            dataframe_cache.invalidate(lambda key: key[:2] == cache_key[:2] and key != cache_key)
+            dataframe_cache.put(cache_key, sample)
+        return sample.copy(deep=False), population_rows
+    
+    @staticmethod
+    def iter_chunks(
+        file_path: str,
+        columns: Optional[List[str]] = None,
+        chunk_rows: Optional[int] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Read a dataset file in chunks of rows without going through the cache
+        
+        Chunks carry the same dtypes (and categorical dictionaries) as a full
+        load. At least one, possibly empty, chunk is always yielded.
+        """
+        available = DatasetManager.get_columns(file_path)
+        if columns is not None:
+            wanted = set(columns)
+            available = [c for c in available if c in wanted]
+        chunk_rows = chunk_rows or settings.STREAMING_CHUNK_ROWS
+        categorical = DatasetManager._categorical_dtypes(file_path, available)
+        
+        if not file_path.endswith(DatasetManager.COLUMNAR_EXTENSION):
+            schema_columns = DatasetManager.load_schema(file_path).get("columns", {})
+            reader = pd.read_csv(file_path, usecols=available, dtype=categorical, chunksize=chunk_rows)
+            yielded = False
+            with reader:
+                for chunk in reader:
+                    yielded = True
+                    yield TypeInference.apply_types(chunk[available], schema_columns)
+            if not yielded:
+                yield DatasetManager._read_file(file_path, available)
+            return
+        
+        parquet_file = pq.ParquetFile(file_path, read_dictionary=list(categorical) or None)
+        yielded = False
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=available):
+            yielded = True
+            yield DatasetManager._apply_categoricals(batch.to_pandas(), categorical)
+        if not yielded:
+            empty = parquet_file.schema_arrow.empty_table().select(available).to_pandas()
+            yield DatasetManager._apply_categoricals(empty, categorical)
+    
+    @staticmethod
+    def estimate_frame_bytes(file_path: str, columns: Optional[List[str]] = None) -> int:
+        """Estimate the memory a full load of the given columns would take, without reading rows"""
+        if not file_path.endswith(DatasetManager.COLUMNAR_EXTENSION):
+            # Parsed CSVs are roughly as large as the text they came from
+            available = DatasetManager.get_columns(file_path)
+            share = len(columns) / max(1, len(available)) if columns is not None else 1
+            return int(os.path.getsize(file_path) * share)
+        
+        metadata = pq.ParquetFile(file_path).metadata
+        wanted = set(columns) if columns is not None else None
+        total = 0
+        for rg in range(metadata.num_row_groups):
+            row_group = metadata.row_group(rg)
+            for i in range(row_group.num_columns):
+                chunk = row_group.column(i)
+                if wanted is None or chunk.path_in_schema in wanted:
+                    total += chunk.total_uncompressed_size
+        return total
+    
+    @staticmethod
+    def _categorical_dtypes(file_path: str, columns: List[str]) -> Dict[str, CategoricalDtype]:
+        """Categorical dtypes of the given columns, from the stored schema dictionaries"""
+        schema_columns = DatasetManager.load_schema(file_path).get("columns", {})
+        return {
+            column: CategoricalDtype(schema_columns[column]["categories"], ordered=True)
+            for column in columns
+            if "categories" in schema_columns.get(column, {})
+        }
+    
+    @staticmethod
+    def _apply_categoricals(df: pd.DataFrame, categorical: Dict[str, CategoricalDtype]) -> pd.DataFrame:
+        for column, dtype in categorical.items():
+            if isinstance(df[column].dtype, CategoricalDtype):
+                df[column] = df[column].cat.set_categories(dtype.categories, ordered=True)
+            else:
+                df[column] = df[column].astype(dtype)
+        return df
+    
+    @staticmethod
+    def get_pipeline_version(
+        transformations: Optional[List[Dict[str, Any]]],
+        measures: Optional[List[Dict[str, Any]]]
+    ) -> str:
+        """Content hash of a dataset's saved transformation and measure definitions"""
+        payload = json.dumps(
+            {"transformations": transformations or [], "measures": measures or []},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+    
+    @staticmethod
+    def invalidate_cached_data(dataset_id: str) -> None:
+        """Drop every cached frame of a dataset"""
+        dataframe_cache.invalidate(lambda key: key[0] == str(dataset_id))
+    
+    @staticmethod
+    def get_cache_stats() -> Dict[str, Any]:
+        """Hit/miss/eviction counters of the dataset caches"""
+        return {"dataframes": dataframe_cache.stats()}
+    
     @staticmethod
     def verify_dataset_access(db: Session, dataset_id: str, user: User) -> Dataset:
         """Verify user has access to dataset"""
@@ -40,10 +412,20 @@ class DatasetManager:
         """Delete a dataset and its file"""
         dataset = DatasetManager.verify_dataset_access(db, dataset_id, user)
         
-        # Delete file
+        # Delete source file, its columnar copy, schema, sample and indexes
         file_path = dataset.file_path
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        columnar_path = DatasetManager.get_columnar_path(file_path)
+        for path in (
+            file_path,
+            columnar_path,
+            DatasetManager.get_schema_path(columnar_path),
+            DatasetManager.get_sample_path(columnar_path)
+        ):
+            if os.path.exists(path):
+                os.remove(path)
+        ColumnIndex.delete(columnar_path)
+        
+        DatasetManager.invalidate_cached_data(dataset_id)
         
         # Delete database record
         db.delete(dataset)
@@ -0,0 +1,99 @@
+from typing import Tuple
+import numpy as np
+
+
+def _bucket_ids(length: int, buckets: int) -> np.ndarray:
+    """Split positions 0..length-1 into `buckets` contiguous runs of (nearly) equal size"""
+    return np.arange(length, dtype=np.int64) * buckets // length
+
+
+def _first_argmax(values: np.ndarray, bucket_ids: np.ndarray) -> np.ndarray:
+    """Position of the largest value of every (contiguous, non-empty) bucket, first one on ties"""
+    starts = np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]])
+    maxima = np.maximum.reduceat(values, starts)
+    hits = np.flatnonzero(values == np.repeat(maxima, np.diff(np.r_[starts, len(values)])))
+    first = np.r_[True, bucket_ids[hits[1:]] != bucket_ids[hits[:-1]]]
+    return hits[first]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Positions of the points kept by Largest-Triangle-Three-Buckets
+
+    `x` must be sorted and both arrays free of NaN. The first and last points are
+    always kept; the ones between are split into n_out - 2 equal buckets and each
+    bucket keeps the point spanning the largest triangle with the point kept in
+    the previous bucket and the average of the next one.
+
+    The triangle area is linear in the previous kept point, so its coefficients
+    are computed for all points at once; only the argmax per bucket, which
+    depends on the previous bucket's choice, runs once per output point.
+    """
+    length = len(y)
+    if n_out >= length or n_out < 3:
+        return np.arange(length)
+
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    buckets = n_out - 2
+    inner = _bucket_ids(length - 2, buckets)
+    counts = np.bincount(inner, minlength=buckets)
+    mean_x = np.bincount(inner, weights=x[1:-1], minlength=buckets) / counts
+    mean_y = np.bincount(inner, weights=y[1:-1], minlength=buckets) / counts
+
+    # Next bucket's average for every point; the last point for the final bucket
+    cx = np.r_[mean_x[1:], x[-1]][inner]
+    cy = np.r_[mean_y[1:], y[-1]][inner]
+    px, py = x[1:-1], y[1:-1]
+    # Twice the area with previous kept point (ax, ay) is |ax * u + ay * v + w|
+    u, v, w = py - cy, cx - px, px * cy - cx * py
+
+    bounds = np.r_[0, np.cumsum(counts)]
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, length - 1
+    ax, ay = x[0], y[0]
+    for bucket in range(buckets):
+        start, end = bounds[bucket], bounds[bucket + 1]
+        best = start + int(np.abs(ax * u[start:end] + ay * v[start:end] + w[start:end]).argmax())
+        kept[bucket + 1] = best + 1
+        ax, ay = px[best], py[best]
+    return kept
+
+
+def minmax(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Positions of the smallest and largest value of n_out / 2 equal buckets, in order
+
+    Keeps every peak and trough of a series, at the cost of some shape detail
+    between them. `y` must be free of NaN.
+    """
+    length = len(y)
+    buckets = n_out // 2
+    if n_out >= length or buckets < 1:
+        return np.arange(length)
+
+    y = np.asarray(y, dtype=float)
+    ids = _bucket_ids(length, buckets)
+    keep = np.r_[0, _first_argmax(y, ids), _first_argmax(-y, ids), length - 1]
+    return np.unique(keep)
+
+
+def grid_density(x: np.ndarray, y: np.ndarray, n_out: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bin points into a grid of about n_out cells
+
+    Returns the centroid x and y and the number of points of every occupied cell.
+    Both arrays must be free of NaN.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    side = max(1, int(np.sqrt(n_out)))
+
+    def cells(values: np.ndarray) -> np.ndarray:
+        low, high = values.min(), values.max()
+        if high <= low:
+            return np.zeros(len(values), dtype=np.int64)
+        return np.minimum(((values - low) / (high - low) * side).astype(np.int64), side - 1)
+
+    cell = cells(x) * side + cells(y)
+    counts = np.bincount(cell, minlength=side * side)
+    sum_x = np.bincount(cell, weights=x, minlength=side * side)
+    sum_y = np.bincount(cell, weights=y, minlength=side * side)
+    occupied = counts > 0
+    counts = counts[occupied]
+    return sum_x[occupied] / counts, sum_y[occupied] / counts, counts
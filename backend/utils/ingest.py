@@ -0,0 +1,260 @@
+import io
+import os
+from typing import Any, BinaryIO, Callable, Dict, Optional, Sequence, Set
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import HTTPException
+from config import settings
+from utils.column_index import ColumnIndexBuilder
+from utils.dataset_manager import DatasetManager
+from utils.sketches import ReservoirSample
+from utils.type_inference import TypeInference
+
+
+class _TypeConflict(Exception):
+    """A chunk doesn't fit the column types detected on the first one"""
+
+
+class _CountingReader(io.RawIOBase):
+    """Raw stream over a file object that counts the bytes read, for progress reports"""
+
+    def __init__(self, source: BinaryIO):
+        self.source = source
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.source.read(len(buffer))
+        self.bytes_read += len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class CSVIngest:
+    """Streaming ingest of uploaded CSVs
+
+    An upload is first copied to the dataset's source CSV, failing as soon as
+    it passes MAX_UPLOAD_SIZE. The source is then parsed once, in chunks of
+    STREAMING_CHUNK_ROWS rows: every chunk is typed, counted, added to the
+    column statistics, indexes and row sample (and any accumulators of the
+    caller, such as a profile), and appended to the columnar file. Nothing is
+    read back once the columnar file is written.
+
+    Column types are detected on the first chunk. If a later chunk doesn't fit
+    them (e.g. text in a column that looked numeric) the CSV is converted as a
+    whole instead.
+    """
+
+    @staticmethod
+    def save_upload(source: BinaryIO, file_path: str, max_bytes: int) -> int:
+        """Copy an upload to file_path a buffer at a time, rejecting it once it passes max_bytes; returns its size"""
+        size = 0
+        try:
+            with open(file_path, "wb") as copy:
+                while True:
+                    data = source.read(settings.INGEST_BUFFER_BYTES)
+                    if not data:
+                        break
+                    size += len(data)
+                    if size > max_bytes:
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"File size exceeds {max_bytes // (1024 * 1024)}MB limit"
+                        )
+                    copy.write(data)
+        except Exception:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+        return size
+
+    @staticmethod
+    def ingest_file(
+        file_path: str,
+        progress: Optional[Callable[[float, str], None]] = None,
+        accumulators: Sequence[Any] = ()
+    ) -> Dict[str, Any]:
+        """Convert a source CSV to its columnar copy, schema, indexes and sample in one streaming pass
+
+        `progress` is called with the fraction of the file parsed so far and the
+        current step. Every typed chunk is also passed to the add() of each of
+        `accumulators`; they are reset() if the file has to be converted in one
+        piece. Returns the columnar path and the row count.
+        """
+        columnar_path = DatasetManager.get_columnar_path(file_path)
+        size = max(1, os.path.getsize(file_path))
+        with open(file_path, "rb") as source:
+            reader = _CountingReader(source)
+
+            def report(step: str) -> None:
+                if progress:
+                    progress(reader.bytes_read / size, step)
+
+            try:
+                rows = CSVIngest._convert(
+                    io.BufferedReader(reader, settings.INGEST_BUFFER_BYTES), columnar_path, report, accumulators
+                )
+            except _TypeConflict:
+                rows = None
+
+        if rows is None:
+            print(f"Warning: column types of {file_path} changed after the first chunk; converting it in one piece")
+            DatasetManager.convert_to_columnar(file_path)
+            rows = pq.ParquetFile(columnar_path).metadata.num_rows
+            if accumulators:
+                df = DatasetManager.load_dataframe(columnar_path)
+                for accumulator in accumulators:
+                    accumulator.reset()
+                for start in range(0, len(df), settings.STREAMING_CHUNK_ROWS):
+                    for accumulator in accumulators:
+                        accumulator.add(df.iloc[start:start + settings.STREAMING_CHUNK_ROWS])
+
+        return {"columnar_path": columnar_path, "rows": rows}
+
+    @staticmethod
+    def _convert(
+        stream: BinaryIO,
+        columnar_path: str,
+        progress: Callable[[str], None],
+        accumulators: Sequence[Any] = ()
+    ) -> int:
+        """Parse, type and write a CSV stream chunk by chunk; returns the number of rows"""
+        tmp_path = f"{columnar_path}.tmp"
+        writer: Optional[pq.ParquetWriter] = None
+        schema: Optional[pa.Schema] = None
+        types: Dict[str, Dict[str, Any]] = {}
+        dtypes: Dict[str, Any] = {}
+        # Distinct values of text columns, until there are too many for a dictionary
+        distinct: Dict[str, Optional[Set[Any]]] = {}
+        sample = ReservoirSample(settings.SAMPLE_ROWS)
+        index = ColumnIndexBuilder()
+        rows = 0
+
+        try:
+            try:
+                with pd.read_csv(stream, chunksize=settings.STREAMING_CHUNK_ROWS) as chunks:
+                    for chunk in chunks:
+                        if writer is None:
+                            chunk, types = TypeInference.infer_frame(chunk)
+                            # Booleans are stored nullable, so later chunks with missing values fit the same type
+                            chunk = chunk.assign(**{
+                                column: chunk[column].astype("boolean")
+                                for column, info in types.items() if info["type"] == "boolean"
+                            })
+                            table = CSVIngest._to_table(chunk)
+                            schema = table.schema
+                            writer = pq.ParquetWriter(tmp_path, schema)
+                            dtypes = chunk.dtypes.to_dict()
+                            distinct = {column: set() for column, info in types.items() if info["type"] == "text"}
+                        else:
+                            chunk = CSVIngest._conform(chunk, types)
+                            table = CSVIngest._to_table(chunk, schema)
+                            CSVIngest._widen_dtypes(dtypes, chunk)
+
+                        writer.write_table(table, row_group_size=settings.PARQUET_ROW_GROUP_ROWS)
+                        rows += len(chunk)
+                        sample.add(chunk)
+                        index.add(chunk)
+                        for accumulator in accumulators:
+                            accumulator.add(chunk)
+                        for column, values in distinct.items():
+                            if values is not None:
+                                values.update(chunk[column].dropna().unique())
+                                if len(values) > settings.CATEGORICAL_MAX_UNIQUE:
+                                    distinct[column] = None
+                        progress("Converting")
+            except (HTTPException, _TypeConflict):
+                raise
+            except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+                raise HTTPException(status_code=400, detail=f"Invalid CSV file: {str(e)}")
+            finally:
+                if writer is not None:
+                    writer.close()
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, columnar_path)
+
+        DatasetManager.save_schema(columnar_path, CSVIngest._schema(types, dtypes, distinct, rows))
+        progress("Building indexes")
+        index.write(columnar_path)
+        DatasetManager.write_columnar(sample.result(), DatasetManager.get_sample_path(columnar_path))
+        return rows
+
+    @staticmethod
+    def _conform(chunk: pd.DataFrame, types: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+        """Convert a later chunk to the column types detected on the first one
+
+        Raises _TypeConflict if a value doesn't parse as its column's type, or a
+        text column came out of the parser as numbers (their original text is lost).
+        """
+        typed = TypeInference.apply_types(chunk, types)
+        for column, info in types.items():
+            present = chunk[column].notna()
+            if not present.any():
+                continue
+            if info["type"] == "text":
+                if not (pd.api.types.is_object_dtype(chunk[column]) or pd.api.types.is_string_dtype(chunk[column])):
+                    raise _TypeConflict(column)
+            elif typed[column][present].isna().any():
+                raise _TypeConflict(column)
+        if any(info["type"] == "boolean" for info in types.values()):
+            typed = typed.assign(**{
+                column: typed[column].astype("boolean")
+                for column, info in types.items() if info["type"] == "boolean"
+            })
+        return typed
+
+    @staticmethod
+    def _to_table(chunk: pd.DataFrame, schema: Optional[pa.Schema] = None) -> pa.Table:
+        """Arrow table of a chunk, cast to the schema of the first one; raises _TypeConflict if it can't be cast safely"""
+        try:
+            if schema is None:
+                return pa.Table.from_pandas(chunk, preserve_index=False)
+            arrays = []
+            for field in schema:
+                array = pa.array(chunk[field.name], from_pandas=True)
+                if array.null_count == len(array):
+                    array = pa.nulls(len(array), field.type)
+                elif array.type != field.type:
+                    array = array.cast(field.type)
+                arrays.append(array)
+            return pa.Table.from_arrays(arrays, schema=schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            raise _TypeConflict(str(e))
+
+    @staticmethod
+    def _widen_dtypes(dtypes: Dict[str, Any], chunk: pd.DataFrame) -> None:
+        """Promote recorded numeric dtypes as a whole-file parse would, e.g. integers with missing values to float"""
+        for column, dtype in chunk.dtypes.items():
+            current = dtypes[column]
+            if isinstance(dtype, np.dtype) and isinstance(current, np.dtype) \
+                    and dtype.kind in "iuf" and current.kind in "iuf":
+                dtypes[column] = np.result_type(current, dtype)
+
+    @staticmethod
+    def _schema(
+        types: Dict[str, Dict[str, Any]],
+        dtypes: Dict[str, Any],
+        distinct: Dict[str, Optional[Set[Any]]],
+        rows: int
+    ) -> Dict[str, Any]:
+        """Stored schema from the streamed statistics, as DatasetManager.infer_schema builds it from a whole frame"""
+        columns = {}
+        for column, info in types.items():
+            entry = {"dtype": str(dtypes[column]), **info}
+            values = distinct.get(column)
+            if values is not None and len(values) <= max(1, rows * settings.CATEGORICAL_MAX_UNIQUE_RATIO):
+                try:
+                    entry["categories"] = sorted(values)
+                    entry["type"] = "categorical"
+                except TypeError:
+                    # Mixed value types have no natural order; keep the column as text
+                    pass
+            columns[column] = entry
+        return {"columns": columns}
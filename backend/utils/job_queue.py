@@ -0,0 +1,150 @@
+import json
+import uuid
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from database import SessionLocal
+from models.db_models import Job
+from config import settings
+
+# Job states; jobs found queued or running at startup were interrupted and are run again
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class JobContext:
+    """Handle a running job reports its progress through"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+
+    def progress(self, percent: float, step: Optional[str] = None) -> None:
+        """Record how far the job has got (0-100) and, optionally, what it is doing now"""
+        values = {"progress": round(min(100.0, max(0.0, percent)), 1)}
+        if step:
+            values["step"] = step
+        JobQueue.update(self.job_id, values)
+
+
+class JobQueue:
+    """Background jobs on worker threads, tracked in the persistent jobs table
+
+    Long-running work (ingesting an upload, profiling, building indexes,
+    rendering a report) is submitted here instead of running inside the request,
+    which returns 202 Accepted with the job id; clients poll GET /jobs/{id} for
+    its status and percent complete. Handlers are registered per job kind and
+    called with a JobContext and the job's JSON parameters; what they return is
+    stored as the job's result. Jobs still queued or running when the process
+    stopped are run again on startup, so handlers must be safe to rerun.
+    Threads (not processes) keep the in-process dataset caches shared.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._handlers: Dict[str, Callable[..., Any]] = {}
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+
+    def register(self, kind: str, handler: Callable[..., Any]) -> None:
+        """Set the function that runs jobs of a kind"""
+        self._handlers[kind] = handler
+
+    def submit(self, db: Session, kind: str, user_id: Any, params: Dict[str, Any]) -> Job:
+        """Record a job and queue it; returns the committed job row"""
+        job = Job(
+            id=str(uuid.uuid4()),
+            user_id=str(user_id),
+            kind=kind,
+            status=QUEUED,
+            progress=0,
+            params=json.dumps(params, default=str)
+        )
+        db.add(job)
+        db.commit()
+        self._queue.put(job.id)
+        return job
+
+    def start(self) -> None:
+        """Requeue jobs interrupted by a restart and start the worker threads"""
+        if self._threads:
+            return
+        db = SessionLocal()
+        try:
+            interrupted = db.query(Job).filter(Job.status.in_([QUEUED, RUNNING])).order_by(Job.created_at).all()
+            for job in interrupted:
+                job.status = QUEUED
+                self._queue.put(str(job.id))
+            db.commit()
+        finally:
+            db.close()
+
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self) -> None:
+        """Stop the workers once their current jobs finish; jobs still queued run after the next start"""
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Worker count and queue depth for monitoring"""
+        return {"workers": len(self._threads), "queued": self._queue.qsize()}
+
+    @staticmethod
+    def update(job_id: str, values: Dict[str, Any]) -> None:
+        """Write fields of a job row in a session of its own"""
+        db = SessionLocal()
+        try:
+            db.query(Job).filter(Job.id == job_id).update(values, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            self._run(job_id)
+
+    def _run(self, job_id: str) -> None:
+        """Run one job, recording its outcome; a job another worker already took is skipped"""
+        db = SessionLocal()
+        try:
+            claimed = db.query(Job).filter(Job.id == job_id, Job.status == QUEUED).update(
+                {"status": RUNNING, "progress": 0, "step": None, "started_at": func.now()},
+                synchronize_session=False
+            )
+            db.commit()
+            if not claimed:
+                return
+            job = db.query(Job).filter(Job.id == job_id).first()
+            kind, params = job.kind, json.loads(job.params or "{}")
+        finally:
+            db.close()
+
+        try:
+            handler = self._handlers.get(kind)
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {kind}")
+            result = handler(JobContext(job_id), **params)
+        except Exception as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            print(f"Warning: {kind} job {job_id} failed: {error}")
+            JobQueue.update(job_id, {"status": FAILED, "error": error, "finished_at": func.now()})
+        else:
+            JobQueue.update(job_id, {
+                "status": SUCCEEDED,
+                "progress": 100,
+                "step": None,
+                "result": json.dumps(result, default=str),
+                "finished_at": func.now()
+            })
+
+
+job_queue = JobQueue(settings.JOB_WORKERS)
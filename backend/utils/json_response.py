@@ -0,0 +1,97 @@
+import uuid
+from typing import Any, List
+import numpy as np
+import pandas as pd
+import orjson
+from fastapi.responses import JSONResponse
+
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def json_array(values: Any) -> Any:
+    """A column in a form orjson writes in one pass, without a Python object per value
+
+    Numeric arrays are passed through (NaN becomes null), datetimes become
+    epoch milliseconds (NaT becomes null); only text and other object columns
+    fall back to a list.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in "iub":
+        return series.to_numpy()
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        return series.to_numpy(dtype="float64", na_value=np.nan)
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        stamps = series.dt.tz_localize(None) if getattr(series.dt, "tz", None) is not None else series
+        millis = stamps.to_numpy(dtype="datetime64[ms]").astype("int64").astype("float64")
+        millis[stamps.isna().to_numpy()] = np.nan
+        return millis
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+class RawJSON:
+    """Already serialized JSON, written into the response as is"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def point_objects(points: np.ndarray) -> RawJSON:
+    """An (n, 2) array of finite points as a JSON array of {"x": ..., "y": ...} objects
+
+    orjson writes the array as [x, y] pairs in one pass; a few byte replacements
+    then turn the pairs into objects, so no dict is built per point. Numbers never
+    contain brackets or commas, so the replacements only touch the structure.
+    """
+    pairs = orjson.dumps(np.ascontiguousarray(points, dtype="float64"), option=orjson.OPT_SERIALIZE_NUMPY)
+    if len(points) == 0:
+        return RawJSON(b"[]")
+    inner = pairs[2:-2].replace(b"],[", b"}\n").replace(b",", b',"y":').replace(b"\n", b',{"x":')
+    return RawJSON(b'[{"x":' + inner + b"}]")
+
+
+def _default(obj: Any) -> Any:
+    """Fallback for values orjson doesn't serialize natively"""
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return json_array(pd.Series(obj))
+    if isinstance(obj, np.ndarray):
+        # Arrays of text or objects
+        return obj.tolist()
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, pd.Timedelta):
+        return str(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON bytes; NumPy arrays are written directly and NaN/NaT become null"""
+    fragments: List[bytes] = []
+    token = uuid.uuid4().hex
+
+    def default(obj: Any) -> Any:
+        if isinstance(obj, RawJSON):
+            # Written as a placeholder string and swapped for the fragment below
+            fragments.append(obj.data)
+            return f"{token}:{len(fragments) - 1}"
+        return _default(obj)
+
+    body = orjson.dumps(content, default=default, option=_OPTIONS)
+    for number, data in enumerate(fragments):
+        body = body.replace(f'"{token}:{number}"'.encode(), data, 1)
+    return body
+
+
+class NumpyJSONResponse(JSONResponse):
+    """JSON response rendered by orjson, for payloads holding NumPy arrays and pandas values
+
+    Returning it from a route skips the pydantic response model, so the content
+    is encoded exactly once.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
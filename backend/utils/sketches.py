@@ -0,0 +1,316 @@
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """Mergeable approximate quantiles over a stream of numbers
+
+    Keeps at most `max_centroids` (value, weight) pairs. While fewer values
+    than that have been seen the sketch is exact; afterwards neighbouring values
+    are merged into centroids of roughly equal weight, so the rank error of a
+    quantile stays around 1 / max_centroids.
+    """
+
+    def __init__(self, max_centroids: int = 1000):
+        self.max_centroids = max_centroids
+        self.values = np.empty(0, dtype=float)
+        self.weights = np.empty(0, dtype=float)
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    @property
+    def exact(self) -> bool:
+        """True while every value seen is still kept as is, so quantiles are exact"""
+        return len(self.values) == self.count
+
+    def add(self, values) -> None:
+        """Add a batch of values; NaNs are ignored"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self._absorb(values, np.ones(len(values)))
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Fold another sketch into this one"""
+        if len(other.values):
+            self._absorb(other.values, other.weights)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate q-quantile (linear interpolation, like pandas), or None if empty"""
+        if not len(self.values):
+            return None
+        total = self.weights.sum()
+        # Centre rank of every centroid; for unit weights these are 0.5, 1.5, ...
+        centres = np.cumsum(self.weights) - self.weights / 2
+        target = q * (total - 1) + 0.5
+        return float(np.interp(target, centres, self.values))
+
+    def _absorb(self, values: np.ndarray, weights: np.ndarray) -> None:
+        values = np.concatenate([self.values, values])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(values, kind="stable")
+        values, weights = values[order], weights[order]
+
+        if len(values) > self.max_centroids:
+            # Bucket neighbours by cumulative weight and replace each bucket by its weighted mean
+            total = weights.sum()
+            midpoints = np.cumsum(weights) - weights / 2
+            buckets = np.minimum(
+                (midpoints / total * self.max_centroids).astype(np.int64), self.max_centroids - 1
+            )
+            bucket_weights = np.bincount(buckets, weights=weights, minlength=self.max_centroids)
+            bucket_sums = np.bincount(buckets, weights=values * weights, minlength=self.max_centroids)
+            occupied = bucket_weights > 0
+            weights = bucket_weights[occupied]
+            values = bucket_sums[occupied] / weights
+
+        self.values, self.weights = values, weights
+
+
+class ReservoirSample:
+    """Uniform random sample of at most `capacity` rows over a stream of row chunks
+
+    Algorithm R, vectorized per chunk: the i-th row seen replaces a random slot
+    with probability capacity / (i + 1), so after any number of chunks every
+    row read so far is in the sample with the same probability.
+    """
+
+    def __init__(self, capacity: int, seed: Optional[int] = None):
+        self.capacity = capacity
+        self.seen = 0
+        self.rows: Optional[pd.DataFrame] = None
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        """Offer a chunk of rows to the sample"""
+        chunk = chunk.reset_index(drop=True)
+        fill = max(0, min(self.capacity - self.seen, len(chunk)))
+        if self.rows is None:
+            self.rows = chunk.iloc[:fill]
+        elif fill:
+            self.rows = pd.concat([self.rows, chunk.iloc[:fill]], ignore_index=True)
+
+        candidates = np.arange(fill, len(chunk))
+        if len(candidates):
+            slots = self._rng.integers(0, self.seen + candidates + 1)
+            kept = slots < self.capacity
+            candidates, slots = candidates[kept], slots[kept]
+            # When several rows of the chunk draw the same slot the last one wins, as in the sequential algorithm
+            slots, last = np.unique(slots[::-1], return_index=True)
+            candidates = candidates[::-1][last]
+
+            positions = np.arange(len(self.rows))
+            positions[slots] = len(self.rows) + np.arange(len(candidates))
+            self.rows = pd.concat([self.rows, chunk.iloc[candidates]], ignore_index=True).iloc[positions]
+            self.rows = self.rows.reset_index(drop=True)
+
+        self.seen += len(chunk)
+
+    def result(self) -> pd.DataFrame:
+        """The sampled rows in random order, so any prefix (also within a group) is itself a uniform sample"""
+        if self.rows is None:
+            return pd.DataFrame()
+        order = self._rng.permutation(len(self.rows))
+        return self.rows.iloc[order].reset_index(drop=True)
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    """Stable 64-bit hashes of the non-missing values of a series
+
+    Equal values hash equally in every chunk and process, whatever the dtype of
+    the chunk they came in (categorical or not), so sketches built from
+    separate chunks can be merged.
+    """
+    values = values.dropna()
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(values.cat.categories.dtype)
+    # Hash every value directly; factorizing first (categorize=True) builds a hash table of the chunk
+    return pd.util.hash_pandas_object(values, index=False, categorize=False).to_numpy()
+
+
+class HyperLogLog:
+    """Mergeable distinct-count estimate in 2^precision one-byte registers
+
+    Each hash picks a register by its top `precision` bits and records the
+    position of the first set bit of the rest; the harmonic mean of the
+    registers estimates the number of distinct hashes, with a standard error of
+    about 1.04 / sqrt(2^precision).
+    """
+
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values: pd.Series) -> None:
+        """Add the non-missing values of a chunk"""
+        self.add_hashes(hash_values(values))
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        if not len(hashes):
+            return
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.int64)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # Leading zeros of the remaining bits + 1; float64 represents them exactly (width <= 53)
+        rank = np.full(len(rest), width + 1, dtype=np.uint8)
+        nonzero = rest > 0
+        rank[nonzero] = width - np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Fold another sketch of the same precision into this one"""
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        """Estimated number of distinct values added"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small cardinalities: linear counting over the empty registers is more accurate
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class SpaceSaving:
+    """Mergeable heavy-hitters summary keeping at most `capacity` counters
+
+    Counters are keyed by value hash. `counts` are upper bounds of each kept
+    hash's frequency and `errors` how far above the true frequency they may be;
+    any value not kept occurred at most `floor` times. Chunks are counted
+    exactly on their hashes, cut to `capacity` counters, and merged with the
+    summary (Agarwal et al., Mergeable Summaries).
+    """
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype="int64", index=pd.Index([], dtype="uint64"))
+        self.errors = self.counts.copy()
+        self.floor = 0
+        self.labels: Dict[int, object] = {}  # A value for every kept hash
+
+    def add(self, values: pd.Series) -> None:
+        """Add the non-missing values of a chunk"""
+        values = values.dropna()
+        self.add_hashes(hash_values(values), values)
+
+    def add_hashes(self, hashes: np.ndarray, values: pd.Series) -> None:
+        """Add a chunk's value hashes, with the (non-missing) values they were computed from"""
+        chunk = SpaceSaving(self.capacity)
+        keys, counts = np.unique(hashes, return_counts=True)
+        if len(keys) > self.capacity:
+            order = np.argpartition(-counts, self.capacity)
+            chunk.floor = int(counts[order[self.capacity]])
+            keys, counts = keys[order[:self.capacity]], counts[order[:self.capacity]]
+        chunk.counts = pd.Series(counts.astype("int64"), index=keys)
+        chunk.errors = pd.Series(0, index=keys, dtype="int64")
+        # First row of every kept hash, for its value
+        kept = np.flatnonzero(pd.Series(hashes).isin(keys).to_numpy())
+        first = pd.Series(kept, index=hashes[kept])
+        first = first[~first.index.duplicated()]
+        chunk.labels = dict(zip(first.index.tolist(), values.iloc[first.to_numpy()].tolist()))
+        self.merge(chunk)
+
+    def merge(self, other: "SpaceSaving") -> None:
+        """Fold another summary into this one"""
+        keys = self.counts.index.union(other.counts.index)
+        counts = self.counts.reindex(keys, fill_value=self.floor) + other.counts.reindex(keys, fill_value=other.floor)
+        errors = self.errors.reindex(keys, fill_value=self.floor) + other.errors.reindex(keys, fill_value=other.floor)
+        counts = counts.sort_values(ascending=False, kind="stable")
+        dropped = int(counts.iloc[self.capacity]) if len(counts) > self.capacity else 0
+        self.floor = max(self.floor + other.floor, dropped)
+        self.counts = counts.iloc[:self.capacity]
+        self.errors = errors.reindex(self.counts.index)
+        labels = {**other.labels, **self.labels}
+        self.labels = {key: labels[key] for key in self.counts.index.tolist()}
+
+
+class CountMinSketch:
+    """Mergeable frequency estimates in a depth x width table of counters
+
+    Every value increments one counter per row; its estimate is the smallest of
+    its counters, which never undercounts and overcounts by at most
+    e / width of the total with probability 1 - exp(-depth).
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def _columns(self, hashes: np.ndarray) -> np.ndarray:
+        # Double hashing: row i uses h1 + i * h2 over the two halves of the 64-bit hash
+        low = hashes & np.uint64(0xFFFFFFFF)
+        high = (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((low[None, :] + rows * high[None, :]) % np.uint64(self.width)).astype(np.int64)
+
+    def add(self, values: pd.Series) -> None:
+        """Add the non-missing values of a chunk"""
+        self.add_hashes(hash_values(values))
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        if not len(hashes):
+            return
+        for row, columns in enumerate(self._columns(hashes)):
+            self.table[row] += np.bincount(columns, minlength=self.width)
+
+    def merge(self, other: "CountMinSketch") -> None:
+        """Fold another sketch of the same shape into this one"""
+        self.table += other.table
+
+    def estimate(self, values: pd.Series) -> np.ndarray:
+        """Estimated frequency of each of the given (non-missing) values"""
+        return self.estimate_hashes(hash_values(values))
+
+    def estimate_hashes(self, hashes: np.ndarray) -> np.ndarray:
+        columns = self._columns(hashes)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+
+class ColumnSketch:
+    """Distinct count and top values of one column, built chunk by chunk
+
+    Combines a HyperLogLog for the distinct count with a Space-Saving summary
+    for the candidate top values, whose counts are tightened with a Count-Min
+    sketch. Values are hashed once per chunk and all three work on the hashes,
+    so no hash table of the column's values is ever built. Sketches of separate
+    chunks of the same column can be merged.
+    """
+
+    def __init__(self, precision: int = 14, capacity: int = 200, track_top: bool = True):
+        self.distinct = HyperLogLog(precision)
+        self.heavy = SpaceSaving(capacity) if track_top else None
+        self.frequency = CountMinSketch() if track_top else None
+
+    def add(self, values: pd.Series) -> None:
+        """Add a chunk of the column"""
+        values = values.dropna()
+        hashes = hash_values(values)
+        self.distinct.add_hashes(hashes)
+        if self.heavy is not None:
+            self.heavy.add_hashes(hashes, values)
+            self.frequency.add_hashes(hashes)
+
+    def merge(self, other: "ColumnSketch") -> None:
+        """Fold the sketch of another chunk of the column into this one"""
+        self.distinct.merge(other.distinct)
+        if self.heavy is not None and other.heavy is not None:
+            self.heavy.merge(other.heavy)
+            self.frequency.merge(other.frequency)
+
+    def unique_count(self) -> int:
+        return self.distinct.count()
+
+    def top_values(self, n: int = 10) -> pd.Series:
+        """Estimated counts of the (approximately) n most frequent values, highest first"""
+        if self.heavy is None or not len(self.heavy.counts):
+            return pd.Series(dtype="int64")
+        hashes = self.heavy.counts.index.to_numpy()
+        counts = np.minimum(self.heavy.counts.to_numpy(), self.frequency.estimate_hashes(hashes))
+        labels = [self.heavy.labels[key] for key in hashes.tolist()]
+        return pd.Series(counts, index=labels).sort_values(ascending=False, kind="stable").iloc[:n]
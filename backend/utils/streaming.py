@@ -0,0 +1,48 @@
+import io
+from typing import Iterator, Optional
+import pandas as pd
+import pyarrow as pa
+from fastapi.responses import StreamingResponse
+from config import settings
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def negotiate_format(accept: Optional[str]) -> Optional[str]:
+    """Streaming media type requested by an Accept header, or None for the regular JSON response"""
+    if not accept:
+        return None
+    for part in accept.split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in (NDJSON_MEDIA_TYPE, ARROW_MEDIA_TYPE):
+            return media_type
+    return None
+
+
+def iter_ndjson(df: pd.DataFrame, chunk_rows: int) -> Iterator[bytes]:
+    """One JSON object per line, encoded a chunk of rows at a time by pandas' C writer"""
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        yield chunk.to_json(orient="records", lines=True, date_format="iso").rstrip("\n").encode("utf-8") + b"\n"
+
+
+def iter_arrow(df: pd.DataFrame, chunk_rows: int) -> Iterator[bytes]:
+    """Arrow IPC stream: the schema message, then one record batch per chunk of rows"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            writer.write_batch(batch)
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    # Schema of an empty result, or the end-of-stream marker
+    yield sink.getvalue()
+
+
+def stream_frame(df: pd.DataFrame, media_type: str) -> StreamingResponse:
+    """Stream a result frame as NDJSON or Arrow without building per-row Python objects"""
+    chunk_rows = settings.RESPONSE_CHUNK_ROWS
+    body = iter_arrow(df, chunk_rows) if media_type == ARROW_MEDIA_TYPE else iter_ndjson(df, chunk_rows)
+    return StreamingResponse(body, media_type=media_type, headers={"X-Total-Rows": str(len(df))})
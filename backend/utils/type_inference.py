@@ -0,0 +1,151 @@
+import warnings
+from typing import Dict, Any, List, Optional, Tuple
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+from config import settings
+
+# Text tokens stored as booleans; anything else (e.g. Yes/No) stays text so filters on it keep working
+BOOLEAN_VALUES = {"true": True, "false": False}
+
+# Formats tried after the ones pandas guesses from the values (it doesn't guess two-digit years);
+# month-first before day-first, as pandas does, unless the data rules it out
+COMMON_DATETIME_FORMATS = [
+    "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y/%m/%d",
+    "%m/%d/%Y", "%d/%m/%Y", "%m/%d/%y", "%d/%m/%y", "%m/%d/%Y %H:%M", "%d/%m/%Y %H:%M",
+    "%m-%d-%Y", "%d-%m-%Y", "%d.%m.%Y", "%d-%b-%Y", "%d-%b-%y", "%b %d, %Y"
+]
+
+# A detected format must carry a year and a month, so codes like "10-20" aren't read as dates
+_YEAR_DIRECTIVES = ("%Y", "%y")
+_MONTH_DIRECTIVES = ("%m", "%b", "%B")
+
+
+class TypeInference:
+    """Ingest-time column type detection with explicit datetime formats
+
+    Columns are typed once, when a dataset is converted to columnar storage,
+    and the detected type (and datetime format) is recorded in the dataset
+    schema; loaders and transformations then convert with that format instead
+    of letting pandas guess it per value on every request.
+    """
+
+    @staticmethod
+    def _sample(series: pd.Series) -> pd.Series:
+        """Distinct non-missing values of a column (labels of a categorical) as text, at most TYPE_INFERENCE_SAMPLE_ROWS"""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = pd.Series(series.cat.categories)
+        else:
+            values = series.dropna().drop_duplicates()
+        return values.head(settings.TYPE_INFERENCE_SAMPLE_ROWS).astype(str).str.strip()
+
+    @staticmethod
+    def detect_datetime_format(series: pd.Series) -> Optional[str]:
+        """strptime format that parses every sampled value of a text column, or None"""
+        sample = TypeInference._sample(series)
+        if not len(sample):
+            return None
+
+        head = sample.head(20)
+        candidates: List[str] = []
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for value in head:
+                for dayfirst in (False, True):
+                    fmt = guess_datetime_format(value, dayfirst=dayfirst)
+                    if fmt and fmt not in candidates \
+                            and any(d in fmt for d in _YEAR_DIRECTIVES) and any(d in fmt for d in _MONTH_DIRECTIVES):
+                        candidates.append(fmt)
+        candidates += [fmt for fmt in COMMON_DATETIME_FORMATS if fmt not in candidates]
+
+        for fmt in candidates:
+            # Rule formats out on a few values before parsing the whole sample
+            if pd.to_datetime(head, format=fmt, errors="coerce").notna().all() \
+                    and pd.to_datetime(sample, format=fmt, errors="coerce").notna().all():
+                return fmt
+        return None
+
+    @staticmethod
+    def to_datetime(series: pd.Series, fmt: Optional[str] = None) -> pd.Series:
+        """Parse a column as datetimes with an explicit format (detected if not given); unparseable values become NaT
+
+        Categorical columns are parsed once per label and expanded by their codes.
+        """
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series
+        fmt = fmt or TypeInference.detect_datetime_format(series)
+        # Without a format every value shares, fall back to pandas' per-value parsing
+        options = {"format": fmt} if fmt else {"format": "mixed"}
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            labels = pd.DatetimeIndex(pd.to_datetime(series.cat.categories.astype(str), errors="coerce", **options))
+            values = labels.take(series.cat.codes.to_numpy(), allow_fill=True, fill_value=pd.NaT)
+            return pd.Series(values, index=series.index, name=series.name)
+        return pd.to_datetime(series, errors="coerce", **options)
+
+    @staticmethod
+    def infer_column(series: pd.Series) -> Tuple[pd.Series, Dict[str, Any]]:
+        """Detect the type of a column, returning it converted together with its schema entry
+
+        Text columns are only converted when every value fits the detected type.
+        """
+        if pd.api.types.is_bool_dtype(series):
+            return series, {"type": "boolean"}
+        if pd.api.types.is_numeric_dtype(series):
+            return series, {"type": "numeric"}
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series, {"type": "datetime"}
+
+        present = int(series.notna().sum())
+        if not present:
+            return series, {"type": "text"}
+        sample = TypeInference._sample(series)
+
+        if set(sample.str.lower()) <= set(BOOLEAN_VALUES):
+            return TypeInference.to_boolean(series), {"type": "boolean"}
+
+        if pd.to_numeric(sample, errors="coerce").notna().all():
+            converted = pd.to_numeric(series, errors="coerce")
+            if converted.notna().sum() == present:
+                return converted, {"type": "numeric"}
+
+        fmt = TypeInference.detect_datetime_format(series)
+        if fmt:
+            converted = TypeInference.to_datetime(series, fmt)
+            if converted.notna().sum() == present:
+                return converted, {"type": "datetime", "format": fmt}
+
+        return series, {"type": "text"}
+
+    @staticmethod
+    def infer_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Dict[str, Any]]]:
+        """Type every column of a freshly parsed frame; returns the converted frame and the per-column types"""
+        types = {}
+        converted = {}
+        for column in df.columns:
+            series, info = TypeInference.infer_column(df[column])
+            types[column] = info
+            if series is not df[column]:
+                converted[column] = series
+        if converted:
+            df = df.assign(**converted)
+        return df, types
+
+    @staticmethod
+    def apply_types(df: pd.DataFrame, schema_columns: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+        """Convert the text columns of a re-parsed CSV to their recorded types, with the recorded formats"""
+        converted = {}
+        for column in df.columns:
+            info = schema_columns.get(column, {})
+            series = df[column]
+            if info.get("type") == "datetime" and not pd.api.types.is_datetime64_any_dtype(series):
+                converted[column] = TypeInference.to_datetime(series, info.get("format"))
+            elif info.get("type") == "numeric" and not pd.api.types.is_numeric_dtype(series):
+                converted[column] = pd.to_numeric(series, errors="coerce")
+            elif info.get("type") == "boolean" and not pd.api.types.is_bool_dtype(series):
+                converted[column] = TypeInference.to_boolean(series)
+        return df.assign(**converted) if converted else df
+
+    @staticmethod
+    def to_boolean(series: pd.Series) -> pd.Series:
+        """true/false text (any case) as a nullable boolean column"""
+        return series.astype(str).str.strip().str.lower().map(BOOLEAN_VALUES).astype("boolean")
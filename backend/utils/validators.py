@@ -1,7 +1,9 @@
 import pandas as pd
-from typing import Any, List
+import numpy as np
+from typing import Any, List, Optional, Set, Tuple
 from fastapi import HTTPException
 from models.schemas import FilterCondition
+from utils.column_index import ColumnIndex
 
 def validate_csv_file(file_path: str, max_size_mb: int = 50) -> bool:
     """Validate CSV file size and format"""
@@ -29,55 +31,125 @@ def validate_csv_file(file_path: str, max_size_mb: int = 50) -> bool:
             detail=f"Invalid CSV file: {str(e)}"
         )
 
-def apply_filters(df: pd.DataFrame, filters: List[FilterCondition]) -> pd.DataFrame:
-    """Apply filters to a DataFrame"""
-    if not filters:
-        return df
+# Operators understood by the filter compiler
+FILTER_OPERATORS = ("eq", "ne", "gt", "lt", "gte", "lte", "in", "between", "contains")
+
+def condition_mask(series: pd.Series, operator: str, value: Any) -> np.ndarray:
+    """Evaluate one filter condition on a column as a NumPy boolean array (nulls never match)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if operator in ("eq", "ne", "in"):
+            # Compare integer codes against the dictionary positions of the values
+            categories = series.cat.categories
+            values = value if operator == "in" and isinstance(value, (list, tuple, set)) else [value]
+            positions = [categories.get_loc(v) for v in values if v in categories]
+            codes = series.cat.codes.to_numpy()
+            matched = np.isin(codes, positions)
+            if operator == "ne":
+                return ~matched
+            return matched
+        # Order comparisons compare labels, as they would on plain text
+        series = series.astype(series.cat.categories.dtype)
+    
+    if operator == "eq":
+        result = series.eq(value)
+    elif operator == "ne":
+        result = series.ne(value)
+    elif operator == "gt":
+        result = series.gt(value)
+    elif operator == "lt":
+        result = series.lt(value)
+    elif operator == "gte":
+        result = series.ge(value)
+    elif operator == "lte":
+        result = series.le(value)
+    elif operator == "in":
+        result = series.isin(value if isinstance(value, (list, tuple, set)) else [value])
+    elif operator == "between":
+        if not isinstance(value, list) or len(value) != 2:
+            raise ValueError("Between operator requires a list of two values")
+        result = series.ge(value[0]) & series.le(value[1])
+    elif operator == "contains":
+        result = series.astype(str).str.contains(str(value), case=False, na=False)
+    else:
+        raise ValueError(f"Unsupported operator: {operator}")
+    
+    if operator == "ne":
+        # A missing value is "not equal" to any filter value, matching pandas semantics
+        return result.to_numpy(dtype=bool, na_value=True)
+    return result.to_numpy(dtype=bool, na_value=False)
+
+def compile_filter_mask(df: pd.DataFrame, filters: List[FilterCondition]) -> np.ndarray:
+    """Combine all filter conditions into a single boolean row mask
     
-    filtered_df = df.copy()
+    Conditions are evaluated column by column and ANDed in place, so no
+    intermediate DataFrames are built.
+    """
+    mask = np.ones(len(df), dtype=bool)
     
     for filter_cond in filters:
         column = filter_cond.column
-        operator = filter_cond.operator
-        value = filter_cond.value
         
-        if column not in filtered_df.columns:
+        if column not in df.columns:
             raise HTTPException(
                 status_code=400,
                 detail=f"Column '{column}' not found in dataset"
             )
         
         try:
-            if operator == "eq":
-                filtered_df = filtered_df[filtered_df[column] == value]
-            elif operator == "ne":
-                filtered_df = filtered_df[filtered_df[column] != value]
-            elif operator == "gt":
-                filtered_df = filtered_df[filtered_df[column] > value]
-            elif operator == "lt":
-                filtered_df = filtered_df[filtered_df[column] < value]
-            elif operator == "gte":
-                filtered_df = filtered_df[filtered_df[column] >= value]
-            elif operator == "lte":
-                filtered_df = filtered_df[filtered_df[column] <= value]
-            elif operator == "in":
-                filtered_df = filtered_df[filtered_df[column].isin(value)]
-            elif operator == "between":
-                if not isinstance(value, list) or len(value) != 2:
-                    raise ValueError("Between operator requires a list of two values")
-                filtered_df = filtered_df[
-                    (filtered_df[column] >= value[0]) & 
-                    (filtered_df[column] <= value[1])
-                ]
-            else:
-                raise ValueError(f"Unsupported operator: {operator}")
+            mask &= condition_mask(df[column], filter_cond.operator, filter_cond.value)
         except Exception as e:
             raise HTTPException(
                 status_code=400,
                 detail=f"Error applying filter on column '{column}': {str(e)}"
             )
+        
+        # Nothing left to match, the remaining conditions can't change that
+        if not mask.any():
+            break
+    
+    return mask
+
+def apply_filters(
+    df: pd.DataFrame,
+    filters: List[FilterCondition],
+    index: Optional[ColumnIndex] = None,
+    index_columns: Optional[Set[str]] = None
+) -> pd.DataFrame:
+    """Apply filters to a DataFrame
+    
+    If a ColumnIndex of the stored file is given (and the frame's rows still line
+    up with it), filters on the indexed `index_columns` are answered from the
+    index and only the matching rows are scanned for the rest.
+    """
+    if not filters:
+        return df
+    
+    df, filters = apply_index_filters(df, filters, index, index_columns)
+    if not filters:
+        return df
+    
+    mask = compile_filter_mask(df, filters)
+    if mask.all():
+        return df
+    return df[mask]
+
+def apply_index_filters(
+    df: pd.DataFrame,
+    filters: List[FilterCondition],
+    index: Optional[ColumnIndex] = None,
+    index_columns: Optional[Set[str]] = None
+) -> Tuple[pd.DataFrame, List[FilterCondition]]:
+    """Apply only the filters the stored column indexes can answer
+    
+    Returns the matching rows and the filters that still have to be scanned.
+    """
+    if not filters or index is None or not index_columns:
+        return df, filters or []
     
-    return filtered_df
+    rows, remaining = index.lookup(filters, index_columns)
+    if rows is not None:
+        df = df.take(rows)
+    return df, remaining
 
 def sanitize_column_name(name: str) -> str:
     """Sanitize column names for safe usage"""
@@ -0,0 +1,97 @@
+import math
+import time
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from fastapi import HTTPException, status
+from config import settings
+
+
+class WorkerPool:
+    """Bounded pool for blocking pandas work called from async route handlers
+
+    Handlers await `run`, so the event loop keeps serving other requests while
+    a query, chart or profile is computed on a worker thread. Each user has at
+    most `max_per_user` jobs in the pool (further ones wait their turn without
+    taking a slot), and once `max_queue` jobs are waiting for a free thread new
+    work is refused with 503 and a Retry-After estimate instead of piling up.
+    Threads (not processes) keep the in-process dataset caches shared.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, max_per_user: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query-worker")
+        self._lock = threading.Lock()
+        # Held only while the user has jobs in flight, so idle users don't accumulate
+        self._user_slots: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+        self._pending = 0  # Submitted to the executor, running or queued
+        self._running = 0
+        self._avg_seconds = 1.0  # Moving average of job duration, for Retry-After
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, user_id: Any, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call on the pool on behalf of a user"""
+        with self._lock:
+            slots = self._user_slots.setdefault(str(user_id), asyncio.Semaphore(self.max_per_user))
+
+        async with slots:
+            self._admit()
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._executor, functools.partial(self._timed, func, *args, **kwargs))
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and throughput counters for monitoring"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "running": self._running,
+                "queue_depth": max(0, self._pending - self._running),
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_seconds": round(self._avg_seconds, 3)
+            }
+
+    def _admit(self) -> None:
+        with self._lock:
+            queued = self._pending - self._running
+            if self._pending >= self.max_workers and queued >= self.max_queue:
+                self.rejected += 1
+                # Time until the jobs ahead of a new request would have drained
+                retry_after = max(1, math.ceil(self._avg_seconds * (queued + 1) / self.max_workers))
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, please retry shortly",
+                    headers={"Retry-After": str(retry_after)}
+                )
+            self._pending += 1
+
+    def _timed(self, func: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self._running += 1
+        started = time.monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+
+
+worker_pool = WorkerPool(
+    max_workers=settings.WORKER_THREADS,
+    max_queue=settings.WORKER_QUEUE_MAX,
+    max_per_user=settings.WORKER_MAX_PER_USER
+)
@@ -22,7 +22,9 @@ function ChartBuilder({ datasetId, onUpdate, initialConfig, filters: externalFil
     const [isStacked, setIsStacked] = useState(false);
     const [bins, setBins] = useState(10);
     const [useConditionalFormatting, setUseConditionalFormatting] = useState(false);
+    const [approximate, setApproximate] = useState(false);
     const [chartData, setChartData] = useState([]);
+    const [resultMeta, setResultMeta] = useState(null);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState("");
     const [initialized, setInitialized] = useState(false);
@@ -58,6 +60,7 @@ function ChartBuilder({ datasetId, onUpdate, initialConfig, filters: externalFil
             if (initialConfig.chart_type) setChartType(initialConfig.chart_type);
             if (initialConfig.is_stacked !== undefined) setIsStacked(initialConfig.is_stacked);
             if (initialConfig.bins) setBins(initialConfig.bins);
+            if (initialConfig.approximate !== undefined) setApproximate(initialConfig.approximate);
 
             // If we have a valid config and title, start in View Mode
             if (initialConfig.title && initialConfig.x_axis && initialConfig.y_axis) {
@@ -87,10 +90,11 @@ function ChartBuilder({ datasetId, onUpdate, initialConfig, filters: externalFil
                 secondary_y_axis: secondaryYAxis,
                 aggregation: aggregation,
                 is_stacked: isStacked,
-                bins: bins
+                bins: bins,
+                approximate: approximate
             });
         }
-    }, [title, chartType, xAxis, yAxis, subGroup, secondaryYAxis, aggregation, isStacked, bins]);
+    }, [title, chartType, xAxis, yAxis, subGroup, secondaryYAxis, aggregation, isStacked, bins, approximate]);
 
     const generateChart = async () => {
         if (!xAxis || !yAxis) {
@@ -131,11 +135,14 @@ function ChartBuilder({ datasetId, onUpdate, initialConfig, filters: externalFil
                 })) : [],
                 limit: 1000, // Increased limit for detailed charts
                 is_histogram: chartType === "histogram",
-                histogram_bins: bins
+                histogram_bins: bins,
+                // Exact unless this tile opted into estimates from the dataset sample
+                approximate: approximate
             };
 
             const response = await api.post(`/query/${datasetId}`, payload);
             setChartData(response.data.data);
+            setResultMeta(response.data.metadata || null);
         } catch (err) {
             setError("Failed to generate chart. Ensure your data supports the selected aggregation.");
             console.error(err);
@@ -177,12 +184,25 @@ function ChartBuilder({ datasetId, onUpdate, initialConfig, filters: externalFil
     const dataKeyY = isYMeasure ? yAxis : `${yAxis}_${aggregation}`;
     const avgValue = chartData.reduce((acc, curr) => acc + (curr[dataKeyY] || 0), 0) / (chartData.length || 1);
 
+    // Widest confidence interval of the plotted estimates, relative to the estimate
+    const estimateMargin = resultMeta?.approximate
+        ? (resultMeta.intervals || []).reduce((widest, record) => {
+            const interval = record[dataKeyY];
+            if (!interval) return widest;
+            const mid = (interval[0] + interval[1]) / 2;
+            return mid ? Math.max(widest, (interval[1] - interval[0]) / 2 / Math.abs(mid)) : widest;
+        }, 0)
+        : null;
+
     return (
         <div className="chart-builder">
             {/* Header / Title Area */}
             <div style={{ display: "flex", justifyContent: "space-between", alignItems: "center", marginBottom: "15px" }}>
                 {viewMode ? (
-                    <h3 style={{ margin: 0, color: "var(--color-primary)" }}>{title}</h3>
+                    <h3 style={{ margin: 0, color: "var(--color-primary)" }}>
+                        {title}
+                        {resultMeta?.approximate && <span style={{ marginLeft: "6px", fontSize: "0.8rem", color: "#888" }}>≈</span>}
+                    </h3>
                 ) : (
                     <div style={{ flex: 1, marginRight: "10px" }}>
                         <label className="form-label" style={{ fontSize: "0.8rem" }}>Chart Title <span style={{ color: "red" }}>*</span></label>
@@ -325,6 +345,13 @@ function ChartBuilder({ datasetId, onUpdate, initialConfig, filters: externalFil
                         </label>
                     </div>
 
+                    <div className="form-group">
+                        <label className="form-label" style={{ display: 'flex', alignItems: 'center', gap: '8px' }}>
+                            <input type="checkbox" checked={approximate} onChange={e => setApproximate(e.target.checked)} />
+                            Estimate from Sample (faster)
+                        </label>
+                    </div>
+
                     <div className="form-group" style={{ display: 'flex', alignItems: 'flex-end', gap: '10px' }}>
                         <button onClick={generateChart} disabled={loading} className="btn btn-outline" style={{ flex: 1 }}>
                             {loading ? "Generating..." : "Refresh Preview"}
@@ -347,6 +374,15 @@ function ChartBuilder({ datasetId, onUpdate, initialConfig, filters: externalFil
                 borderRadius: "var(--radius-md)"
             }}>
                 {chartData.length > 0 && <div style={{ fontSize: '12px', color: 'var(--color-text-muted)', marginBottom: '10px' }}>Loaded {chartData.length} records</div>}
+                {chartData.length > 0 && resultMeta?.approximate && (
+                    <div style={{ fontSize: '12px', color: 'var(--color-text-muted)', marginBottom: '10px' }}>
+                        {resultMeta.sample_rows !== undefined
+                            ? `≈ Estimated from ${resultMeta.sample_rows} of ${resultMeta.population_rows} rows`
+                            : `≈ ${(resultMeta.estimated || []).join(", ")} approximate`}
+                        {estimateMargin > 0 && ` (±${(estimateMargin * 100).toFixed(1)}% at ${Math.round(resultMeta.confidence * 100)}% confidence)`}
+                        {(resultMeta.unscaled || []).length > 0 && ` · ${resultMeta.unscaled.join(", ")} are sample bounds`}
+                    </div>
+                )}
                 {chartData.length > 0 ? (
                     <ResponsiveContainer width="100%" height={400}>
                         {(() => {
@@ -64,7 +64,9 @@ function DatasetProfile({ datasetId }) {
                                     {col.missing_count}
                                 </td>
                                 <td>{col.missing_percentage.toFixed(2)}%</td>
-                                <td>{col.unique_count}</td>
+                                <td title={col.approximate_fields?.includes('unique_count') ? 'Estimated' : undefined}>
+                                    {col.approximate_fields?.includes('unique_count') ? '≈ ' : ''}{col.unique_count}
+                                </td>
                             </tr>
                         ))}
                     </tbody>
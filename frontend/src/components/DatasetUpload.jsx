@@ -5,11 +5,23 @@ function DatasetUpload({ onUploadSuccess }) {
     const [file, setFile] = useState(null);
     const [loading, setLoading] = useState(false);
     const [message, setMessage] = useState("");
+    const [progress, setProgress] = useState(null);
 
     const triggerFileSelect = () => {
         document.getElementById("file-upload").click();
     };
 
+    // Conversion and profiling run as a background job; poll it until it finishes
+    const waitForJob = async (jobId) => {
+        while (true) {
+            const { data } = await api.get(`/jobs/${jobId}`);
+            if (data.status === "succeeded") return data;
+            if (data.status === "failed") throw new Error(data.error || "Processing failed");
+            setProgress(Math.round(data.progress));
+            await new Promise((resolve) => setTimeout(resolve, 1000));
+        }
+    };
+
     const handleUpload = async () => {
         if (!file) {
             triggerFileSelect();
@@ -24,16 +36,19 @@ function DatasetUpload({ onUploadSuccess }) {
             setMessage(""); // Clear old messages
             // Using trailing slash to prevent 307 redirect issues with POST
             const response = await api.post("/datasets/upload/", formData);
+            setProgress(0);
+            await waitForJob(response.data.job_id);
 
             setMessage("Upload successful!");
             onUploadSuccess(response.data.dataset_id);
             setFile(null); // Reset after success
         } catch (error) {
             setMessage(
-                error.response?.data?.detail || "Upload failed. Please check the file format."
+                error.response?.data?.detail || error.message || "Upload failed. Please check the file format."
             );
         } finally {
             setLoading(false);
+            setProgress(null);
         }
     };
 
@@ -74,7 +89,7 @@ function DatasetUpload({ onUploadSuccess }) {
                         cursor: loading ? 'not-allowed' : 'pointer'
                     }}
                 >
-                    {loading ? "Uploading..." : (file ? "Upload Dataset" : "Select & Upload")}
+                    {loading ? (progress === null ? "Uploading..." : `Processing... ${progress}%`) : (file ? "Upload Dataset" : "Select & Upload")}
                 </button>
             </div>
 